@@ -0,0 +1,84 @@
+"""Archive Trees
+
+=== Module Description ===
+This module contains ArchiveTree, which models the files and folders inside
+a zip or tar archive, and read_archive, which reads one without extracting
+it.
+
+Only the index of the archive is read: the central directory at the end of
+a zip file, or the header in front of each member of a tar file. The data of
+the members is never decompressed; in an uncompressed tar file it is
+skipped by seeking, while a compressed tar file has to be decompressed to
+find the next header, though nothing is written to disk. The members are
+read one at a time as they are added to the tree; tarfile keeps the header
+of each member it read until the archive is closed, which is done as soon
+as the tree is built.
+
+The size of each file is either its uncompressed size or, for zip archives,
+the size of its compressed data in the archive. The members of a tar file
+are not compressed one by one, so only their uncompressed size is known.
+"""
+import os
+import tarfile
+import zipfile
+
+from record_tree import RecordTree, TreeBuilder
+
+
+class ArchiveTree(RecordTree):
+    """A tree of the files and folders inside an archive.
+
+    The _root attribute stores the name of the file or folder (the name of
+    the archive file for the root), and get_separator returns its path
+    inside the archive, after the name of the archive.
+    """
+    __slots__ = ()
+
+
+def read_archive(path, compressed=False):
+    """Return the ArchiveTree of the zip or tar archive at <path>.
+
+    If <compressed> is True, the size of each file of a zip archive is the
+    size of its compressed data; otherwise it is the size of the file once
+    extracted.
+
+    Links and other special members of tar archives are left out, and so
+    are members whose names lead outside of the archive ('..').
+
+    Precondition: <path> is the path of a zip or tar archive, possibly
+    compressed with gzip, bzip2 or xz.
+
+    @type path: str
+    @type compressed: bool
+    @rtype: ArchiveTree
+    """
+    builder = TreeBuilder(os.path.basename(path))
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                size = info.compress_size if compressed else info.file_size
+                _add_member(builder, info.filename, size)
+    else:
+        with tarfile.open(path, 'r:*') as archive:
+            for member in archive:
+                if member.isfile():
+                    _add_member(builder, member.name, member.size)
+                elif member.isdir():
+                    _add_member(builder, member.name, 0)
+    return builder.build(ArchiveTree)
+
+
+def _add_member(builder, name, size):
+    """Add the member of an archive with the given name, in which folders
+    are separated by '/', and size to <builder>.
+
+    @type builder: TreeBuilder
+    @type name: str
+    @type size: int
+    @rtype: None
+    """
+    names = [part for part in name.split('/') if part not in ('', '.')]
+    if not names or '..' in names:
+        builder.skipped += 1
+    else:
+        builder.add_path(names, size)
@@ -0,0 +1,617 @@
+"""Treemap Benchmarks
+
+=== Module Description ===
+This module contains benchmarks for the treemap algorithms in tree_data.py,
+run on synthetic trees and generated folders. Run it directly to print the
+results:
+
+    python benchmarks.py [number of leaves]
+
+It also contains a suite timing the main operations on trees of several
+shapes, whose results are saved as JSON so that they can be compared with
+those of an earlier run:
+
+    python benchmarks.py [number of leaves] --json results.json
+    python benchmarks.py [number of leaves] --baseline results.json
+
+The second command exits with status 1 if any time is more than the
+regression threshold (by default 25%) slower than in the baseline.
+"""
+import argparse
+from collections import deque
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from compact_tree import compact_file_system_tree
+from layout_engine import slice_and_dice, squarified
+from tree_data import AbstractTree, Batch, FileSystemTree, set_layout_engine
+
+
+# The rectangle of the treemap display in the visualiser.
+RECT = (0, 0, 1024, 738)
+
+# The fraction by which a time may exceed its baseline before it counts as
+# a regression.
+REGRESSION_THRESHOLD = 0.25
+
+
+class SyntheticTree(AbstractTree):
+    """A tree of randomly generated data, used for benchmarking."""
+    PATH_SEPARATOR = '/'
+    __slots__ = ()
+
+    def get_separator(self):
+        """Return the description of this node, separating each ancestor
+        by '/'.
+
+        @type self: SyntheticTree
+        @rtype: str
+        """
+        if self._parent_tree is None:
+            return str(self._root)
+        return self._parent_tree.get_separator() + '/' + str(self._root)
+
+
+def random_tree(leaves, max_fanout=8, seed=0):
+    """Return a random SyntheticTree with <leaves> leaves, whose internal
+    nodes have between 2 and <max_fanout> subtrees.
+
+    @type leaves: int
+    @type max_fanout: int
+    @type seed: int
+    @rtype: SyntheticTree
+    """
+    rnd = random.Random(seed)
+
+    def make(name, n):
+        if n == 1:
+            return SyntheticTree(name, [], rnd.randint(1, 10 ** 6))
+        k = min(n, rnd.randint(2, max_fanout))
+        cuts = sorted(rnd.sample(range(1, n), k - 1))
+        counts = [b - a for a, b in zip([0] + cuts, cuts + [n])]
+        return SyntheticTree(name, [make(i, counts[i]) for i in range(k)])
+
+    return make('root', leaves)
+
+
+def wide_tree(leaves, seed=0):
+    """Return a SyntheticTree whose root has <leaves> leaves as subtrees.
+
+    @type leaves: int
+    @type seed: int
+    @rtype: SyntheticTree
+    """
+    rnd = random.Random(seed)
+    return SyntheticTree('root', [SyntheticTree(i, [], rnd.randint(1, 10 ** 6))
+                                  for i in range(leaves)])
+
+
+def deep_tree(leaves, depth=200, seed=0):
+    """Return a SyntheticTree with <depth> levels, each holding an equal
+    share of <leaves> leaves and the next level.
+
+    @type leaves: int
+    @type depth: int
+    @type seed: int
+    @rtype: SyntheticTree
+    """
+    rnd = random.Random(seed)
+    per_level = max(1, leaves // depth)
+    tree = None
+    for level in range(depth - 1, -1, -1):
+        subtrees = [SyntheticTree(i, [], rnd.randint(1, 10 ** 6))
+                    for i in range(per_level)]
+        if tree is not None:
+            subtrees.append(tree)
+        tree = SyntheticTree(level, subtrees)
+    return tree
+
+
+def zipf_tree(leaves, exponent=1.2, seed=0):
+    """Return a random_tree whose leaf sizes follow Zipf's law: the k-th
+    largest leaf is k ** <exponent> times smaller than the largest.
+
+    @type leaves: int
+    @type exponent: float
+    @type seed: int
+    @rtype: SyntheticTree
+    """
+    tree = random_tree(leaves, seed=seed)
+    rnd = random.Random(seed)
+    ranks = list(range(1, leaves + 1))
+    rnd.shuffle(ranks)
+    with Batch() as batch:
+        for leaf, rank in zip(_leaves(tree), ranks):
+            batch.update_size(leaf, max(1, int(10 ** 9 / rank ** exponent)) -
+                              leaf.data_size)
+    return tree
+
+
+def sparse_tree(leaves, empty=0.5, seed=0):
+    """Return a random_tree in which a fraction <empty> of the leaves were
+    deleted, leaving many empty subtrees.
+
+    @type leaves: int
+    @type empty: float
+    @type seed: int
+    @rtype: SyntheticTree
+    """
+    tree = random_tree(leaves, seed=seed)
+    rnd = random.Random(seed)
+    with Batch() as batch:
+        for leaf in _leaves(tree):
+            if rnd.random() < empty:
+                batch.delete(leaf)
+    return tree
+
+
+# The generators of the synthetic trees timed by run_suite, by name.
+SHAPES = {
+    'random': random_tree,
+    'wide': wide_tree,
+    'deep': deep_tree,
+    'zipf': zipf_tree,
+    'sparse': sparse_tree,
+}
+
+
+def _leaves(tree):
+    """Return the leaves of <tree> that are not empty, in order.
+
+    @type tree: AbstractTree
+    @rtype: list[AbstractTree]
+    """
+    result = []
+    trees = [tree]
+    while trees:
+        node = trees.pop()
+        if node._subtrees:
+            trees.extend(reversed(node._subtrees))
+        elif node._root is not None:
+            result.append(node)
+    return result
+
+
+class ListdirFileSystemTree(FileSystemTree):
+    """A FileSystemTree built the way FileSystemTree.__init__ did before it
+    used file_scanner: recursively, with os.listdir, os.path.isdir and
+    os.path.getsize.
+    """
+    __slots__ = ()
+
+    def __init__(self, path):
+        """Store the file tree structure contained in the given file or folder.
+
+        @type self: ListdirFileSystemTree
+        @type path: str
+        @rtype: None
+        """
+        if os.path.isdir(path):
+            tree_list = [ListdirFileSystemTree(os.path.join(path, entry))
+                         for entry in os.listdir(path)]
+            AbstractTree.__init__(self, os.path.basename(path), tree_list)
+        else:
+            AbstractTree.__init__(self, os.path.basename(path),
+                                  [], os.path.getsize(path))
+
+
+def make_directory_fixture(path, files, files_per_folder=20,
+                           folders_per_folder=4, seed=0):
+    """Fill the empty folder <path> with <files> files, spread over nested
+    folders holding <files_per_folder> files and up to <folders_per_folder>
+    subfolders each.
+
+    The files are sparse, so they take up almost no disk space, but their
+    sizes as reported by os.path.getsize are random.
+
+    @type path: str
+    @type files: int
+    @type files_per_folder: int
+    @type folders_per_folder: int
+    @type seed: int
+    @rtype: None
+    """
+    rnd = random.Random(seed)
+    folders = deque([path])
+    made = 0
+    while made < files:
+        folder = folders.popleft()
+        for i in range(min(files_per_folder, files - made)):
+            with open(os.path.join(folder, 'file{}.dat'.format(i)), 'w') as f:
+                f.truncate(rnd.randint(1, 1 << 20))
+            made += 1
+        for i in range(folders_per_folder):
+            subfolder = os.path.join(folder, 'folder{}'.format(i))
+            os.mkdir(subfolder)
+            folders.append(subfolder)
+
+
+def recursive_leaf_at(tree, pos, rect):
+    """Return the leaf of <tree> at <pos> by running the treemap algorithm
+    again from <tree>, as AbstractTree.leaf_at did before it used an index.
+
+    @type tree: AbstractTree
+    @type pos: (int, int)
+    @type rect: (int, int, int, int)
+    @rtype: AbstractTree | None
+    """
+    x, y, w, h = rect
+
+    if tree.data_size == 0:
+        return None
+    elif len(tree._subtrees) == 0:
+        if x <= pos[0] <= x + w and y <= pos[1] <= y + h:
+            return tree
+        else:
+            return None
+
+    ini_x = x
+    ini_y = y
+    last_tree = (None, 0, 0)
+    result = None
+
+    for i in range(len(tree._subtrees)):
+        if result:
+            return result
+        subtree = tree._subtrees[i]
+
+        if w > h:
+            local_w = int(subtree.data_size / tree.data_size * w)
+            if subtree.data_size > 0:
+                last_tree = (subtree, x, y)
+                result = recursive_leaf_at(subtree, pos, (x, y, local_w, h))
+            if i == len(tree._subtrees) - 1:
+                local_w = w - last_tree[1] + ini_x
+                result = recursive_leaf_at(last_tree[0], pos,
+                                           (last_tree[1], last_tree[2],
+                                            local_w, h))
+            x += local_w
+        else:
+            local_h = int(subtree.data_size / tree.data_size * h)
+            if subtree.data_size > 0:
+                last_tree = (subtree, x, y)
+                result = recursive_leaf_at(subtree, pos, (x, y, w, local_h))
+            if i == len(tree._subtrees) - 1:
+                local_h = h - last_tree[2] + ini_y
+                result = recursive_leaf_at(last_tree[0], pos,
+                                           (last_tree[1], last_tree[2],
+                                            w, local_h))
+            y += local_h
+
+    return result
+
+
+def _time(func, *args):
+    """Return how long calling <func> with <args> takes, in seconds.
+
+    @type func: callable
+    @rtype: float
+    """
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def benchmark_leaf_at(leaves, queries=1000, recursive_queries=10, seed=0):
+    """Compare the indexed AbstractTree.leaf_at with recursive_leaf_at on a
+    random tree with <leaves> leaves, and print the results.
+
+    recursive_leaf_at is only timed on the first <recursive_queries>
+    positions, since it is far slower on large trees.
+
+    @type leaves: int
+    @type queries: int
+    @type recursive_queries: int
+    @type seed: int
+    @rtype: None
+    """
+    tree = random_tree(leaves, seed=seed)
+    rnd = random.Random(seed)
+    points = [(rnd.randrange(RECT[2]), rnd.randrange(RECT[3]))
+              for _ in range(queries)]
+
+    layout = _time(tree.generate_treemap, RECT)
+    build = _time(tree.leaf_at, points[0], RECT)
+    indexed = _time(lambda: [tree.leaf_at(p, RECT) for p in points])
+    recursive = _time(lambda: [recursive_leaf_at(tree, p, RECT)
+                               for p in points[:recursive_queries]])
+
+    print('leaf_at on {} leaves'.format(leaves))
+    print('  layout:          {:10.2f} ms'.format(layout * 1000))
+    print('  index build:     {:10.2f} ms'.format(build * 1000))
+    print('  indexed query:   {:10.2f} us'.format(indexed / queries * 10 ** 6))
+    print('  recursive query: {:10.2f} us'.format(
+        recursive / recursive_queries * 10 ** 6))
+
+
+def benchmark_scan(files, workers=(1, 4, 8)):
+    """Compare FileSystemTree with ListdirFileSystemTree on a generated
+    folder with <files> files, using each number of threads in <workers>,
+    and print the results.
+
+    The folder is scanned once before timing, so every scan reads the
+    operating system's cache rather than the disk.
+
+    @type files: int
+    @type workers: tuple[int]
+    @rtype: None
+    """
+    with tempfile.TemporaryDirectory() as path:
+        make_directory_fixture(path, files)
+        FileSystemTree(path)
+
+        print('scan of {} files'.format(files))
+        print('  listdir (recursive): {:10.2f} ms'.format(
+            _time(ListdirFileSystemTree, path) * 1000))
+        for n in workers:
+            print('  scandir, {} thread(s): {:8.2f} ms'.format(
+                n, _time(FileSystemTree, path, n) * 1000))
+
+
+def _memory(func, *args):
+    """Return the result of calling <func> with <args> and the number of
+    bytes it keeps allocated.
+
+    @type func: callable
+    @rtype: (object, int)
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = func(*args)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def _scan_and_use(scan, path):
+    """Return the tree scan(path) returns, once it was laid out in RECT and
+    a leaf was looked up in it, so that the caches they fill are kept.
+
+    @type scan: callable
+    @type path: str
+    @rtype: AbstractTree
+    """
+    tree = scan(path)
+    tree.generate_treemap(RECT)
+    tree.leaf_at((RECT[2] // 2, RECT[3] // 2), RECT)
+    return tree
+
+
+def benchmark_memory(files):
+    """Compare the memory used per node by a FileSystemTree and by a
+    compact tree of a generated folder with <files> files, once each was
+    laid out and a leaf was looked up in it, and print the results.
+
+    @type files: int
+    @rtype: None
+    """
+    with tempfile.TemporaryDirectory() as path:
+        make_directory_fixture(path, files)
+        tree, compact = _memory(_scan_and_use, compact_file_system_tree,
+                                path)
+        _, objects = _memory(_scan_and_use, FileSystemTree, path)
+
+    nodes = len(tree._store)
+    print('memory of {} nodes, after a layout and a leaf_at'.format(nodes))
+    print('  FileSystemTree: {:10.1f} bytes/node'.format(objects / nodes))
+    print('  compact tree:   {:10.1f} bytes/node'.format(compact / nodes))
+
+
+def benchmark_engines(leaves, seed=0):
+    """Compare the layout engines on a random tree with <leaves> leaves, and
+    print how long each takes to lay it out and the mean aspect ratio
+    (longer side over shorter side) of its visible rectangles.
+
+    @type leaves: int
+    @type seed: int
+    @rtype: None
+    """
+    print('layout engines on {} leaves'.format(leaves))
+    for engine in (slice_and_dice, squarified):
+        set_layout_engine(engine)
+        tree = random_tree(leaves, seed=seed)
+        start = time.perf_counter()
+        treemap = tree.generate_treemap(RECT)
+        layout = time.perf_counter() - start
+
+        ratios = [max(w, h) / min(w, h) for (_, _, w, h), _ in treemap
+                  if w > 0 and h > 0]
+        print('  {}:'.format(engine.__name__))
+        print('    layout:          {:10.2f} ms'.format(layout * 1000))
+        print('    mean aspect:     {:10.2f}'.format(
+            sum(ratios) / len(ratios)))
+        print('    visible rects:   {:10d}'.format(len(ratios)))
+    set_layout_engine(slice_and_dice)
+
+
+def benchmark_render(leaves, interactions=20, idle=2.0, seed=0):
+    """Time the redrawing of the treemap of a random tree with <leaves>
+    leaves after a leaf is resized, drawing everything or only what changed,
+    measure the CPU used by the event loop while no event arrives for <idle>
+    seconds, and print the results.
+
+    Without a display, pygame draws to memory instead.
+
+    @type leaves: int
+    @type interactions: int
+    @type idle: float
+    @type seed: int
+    @rtype: None
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import pygame
+    import treemap_visualiser
+
+    tree = random_tree(leaves, seed=seed)
+    pygame.init()
+    screen = pygame.display.set_mode((treemap_visualiser.WIDTH,
+                                      treemap_visualiser.HEIGHT))
+    treemap = treemap_visualiser.render_display(screen, tree, '')
+    leaf = tree.leaf_at((RECT[2] // 2, RECT[3] // 2), RECT)
+
+    def interact(incremental):
+        nonlocal treemap
+        for i in range(interactions):
+            leaf.change_prop(0.01 if i % 2 else -0.01)
+            treemap = treemap_visualiser.render_display(
+                screen, tree, leaf.get_separator(),
+                previous=treemap if incremental else None)
+
+    full = _time(interact, False)
+    incremental = _time(interact, True)
+
+    threading.Timer(idle, pygame.event.post,
+                    (pygame.event.Event(pygame.QUIT),)).start()
+    cpu = time.process_time()
+    wall = _time(treemap_visualiser.event_loop, screen, tree)
+    cpu = time.process_time() - cpu
+    pygame.quit()
+
+    print('render on {} leaves'.format(leaves))
+    print('  full frame:        {:10.2f} ms'.format(
+        full / interactions * 1000))
+    print('  incremental frame: {:10.2f} ms'.format(
+        incremental / interactions * 1000))
+    print('  idle CPU:          {:10.1f} %'.format(cpu / wall * 100))
+
+
+def run_suite(leaves, files=10000, queries=10000, repeat=3, seed=0):
+    """Time the main operations on a tree of each shape in SHAPES with
+    <leaves> leaves, and on the FileSystemTree of a generated folder with
+    <files> files, and return the times in seconds by name.
+
+    Each time is the best of <repeat> runs, each on a new tree:
+      - construct: creating the tree.
+      - layout: its first generate_treemap.
+      - leaf_at: <queries> calls to leaf_at at random positions.
+      - update: resizing a tenth of the leaves in a Batch, and laying out
+        the tree again.
+      - delete: deleting a tenth of the leaves in a Batch, and laying out
+        the tree again.
+      - render: drawing it with treemap_export.render_treemap.
+
+    @type leaves: int
+    @type files: int
+    @type queries: int
+    @type repeat: int
+    @type seed: int
+    @rtype: dict[str, float]
+    """
+    import treemap_export
+
+    rnd = random.Random(seed)
+    points = [(rnd.randrange(RECT[2]), rnd.randrange(RECT[3]))
+              for _ in range(queries)]
+
+    def update(tree):
+        with Batch() as batch:
+            for leaf in _leaves(tree)[::10]:
+                batch.change_prop(leaf, 0.5)
+        tree.generate_treemap(RECT)
+
+    def delete(tree):
+        with Batch() as batch:
+            for leaf in _leaves(tree)[::10]:
+                batch.delete(leaf)
+        tree.generate_treemap(RECT)
+
+    def time_tree(name, make):
+        times = {}
+        for _ in range(repeat):
+            start = time.perf_counter()
+            tree = make()
+            run = {'construct': time.perf_counter() - start,
+                   'layout': _time(tree.generate_treemap, RECT),
+                   'leaf_at': _time(lambda: [tree.leaf_at(p, RECT)
+                                             for p in points]),
+                   'render': _time(treemap_export.render_treemap, tree,
+                                   RECT[2:]),
+                   'update': _time(update, tree),
+                   'delete': _time(delete, tree)}
+            for operation, seconds in run.items():
+                key = name + '/' + operation
+                times[key] = min(times.get(key, seconds), seconds)
+        return times
+
+    results = {}
+    for name, generator in SHAPES.items():
+        results.update(time_tree(name, lambda: generator(leaves, seed=seed)))
+    with tempfile.TemporaryDirectory() as path:
+        make_directory_fixture(path, files, seed=seed)
+        results.update(time_tree('folder', lambda: FileSystemTree(path)))
+    return results
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Print how each time in <results> compares with the same time in
+    <baseline>, and return the names of those more than <threshold> slower.
+
+    @type results: dict[str, float]
+    @type baseline: dict[str, float]
+    @type threshold: float
+    @rtype: list[str]
+    """
+    regressions = []
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        change = results[name] / baseline[name] - 1 if baseline[name] else 0
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        print('{:20} {:10.2f} ms {:10.2f} ms {:+8.1%}{}'.format(
+            name, baseline[name] * 1000, results[name] * 1000, change,
+            '  REGRESSION' if regressed else ''))
+    return regressions
+
+
+def _main():
+    """Run the benchmarks given on the command line.
+
+    @rtype: None
+    """
+    parser = argparse.ArgumentParser(description='Treemap benchmarks.')
+    parser.add_argument('leaves', type=int, nargs='?', default=100000,
+                        help='the number of leaves of the synthetic trees')
+    parser.add_argument('--json', metavar='PATH',
+                        help='run the suite and save its results at PATH')
+    parser.add_argument('--baseline', metavar='PATH',
+                        help='run the suite and compare its results with '
+                             'those saved at PATH')
+    parser.add_argument('--threshold', type=float,
+                        default=REGRESSION_THRESHOLD,
+                        help='the largest slowdown allowed by --baseline')
+    parser.add_argument('--files', type=int, default=10000,
+                        help='the number of files of the generated folder')
+    args = parser.parse_args()
+
+    if args.json is None and args.baseline is None:
+        benchmark_leaf_at(args.leaves)
+        benchmark_engines(args.leaves)
+        benchmark_memory(args.leaves)
+        benchmark_scan(args.leaves)
+        benchmark_render(args.leaves)
+        return
+
+    results = run_suite(args.leaves, args.files)
+    if args.json is not None:
+        with open(args.json, 'w') as file:
+            json.dump({'leaves': args.leaves, 'files': args.files,
+                       'python': platform.python_version(),
+                       'results': results}, file, indent=2, sort_keys=True)
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if compare(results, baseline['results'], args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,298 @@
+"""Bounded File System Trees
+
+=== Module Description ===
+This module contains BoundedFileSystemTree, a FileSystemTree that keeps at
+most a given number of subtrees per folder, so that a volume with tens of
+millions of files can be scanned with a bounded amount of memory.
+
+The folders are walked depth first, and each folder only keeps its largest
+subtrees while it is listed: whenever it has more than the limit, the
+smallest one is folded into a single AggregateTree leaf, which only keeps
+their total size and the number of files in them. A folder is folded with
+everything inside it as soon as it is complete, so the tree never holds
+more than the limit of subtrees per folder kept, plus the folders being
+listed on the way down.
+
+Only the number of subtrees of each folder is bounded, not the size of the
+whole tree: a tree whose folders each hold at least <limit> folders, <depth>
+levels deep, still keeps about limit ** depth nodes. The limit should be
+chosen with the depth of the volume in mind.
+
+The folders being listed do not hold the names of their subfolders either:
+each one keeps its os.scandir listing open, and reads the next entry only
+once the folder before it was walked. Only the first OPEN_LIMIT levels are
+kept open, so that a deep volume cannot use up the file descriptors; the
+folders below them are listed at once, and hold the names of their
+subfolders until they are walked.
+
+Like FileSystemTree, the folders are listed through a
+file_scanner.ScanFilter, so each file and folder is counted only once and
+symbolic links to folders are not followed.
+
+The aggregate leaves are ordinary leaves of the tree: they are drawn,
+found by leaf_at, named by get_separator, deleted and resized like files.
+"""
+import heapq
+import os
+
+from file_scanner import ScanFilter
+from tree_data import AbstractTree, FileSystemTree
+
+
+# The number of subtrees a folder keeps by default; the others are folded
+# into an AggregateTree.
+CHILD_LIMIT = 256
+
+# The number of levels of folders whose listing is kept open while the
+# folders inside them are walked.
+OPEN_LIMIT = 64
+
+
+class BoundedFileSystemTree(FileSystemTree):
+    """A FileSystemTree whose folders keep their largest subtrees only.
+
+    Like FileSystemTree, symbolic links to folders are not followed, a
+    folder that cannot be listed is empty and a file whose size cannot be
+    read has size 0.
+    """
+    __slots__ = ()
+
+    def __init__(self, path, limit=CHILD_LIMIT, scan_filter=None):
+        """Store the file tree structure contained in the given file or
+        folder, keeping up to <limit> subtrees in each folder.
+
+        The files and folders listed are chosen by <scan_filter>, or by a
+        new ScanFilter if it is None, which counts those it skips.
+
+        Precondition: <path> is a valid path for this computer, and
+        <limit> >= 1.
+
+        @type self: BoundedFileSystemTree
+        @type path: str
+        @type limit: int
+        @type scan_filter: ScanFilter | None
+        @rtype: None
+        """
+        if not os.path.isdir(path):
+            FileSystemTree.__init__(self, path)
+            return
+
+        if scan_filter is None:
+            scan_filter = ScanFilter()
+        scan_filter.start(path)
+        cls = type(self)
+        stack = [_Folder(path, None, limit, scan_filter)]
+        try:
+            while True:
+                folder = stack[-1]
+                key = folder.next_folder()
+                if key is not None:
+                    subfolder = _Folder(os.path.join(folder.path, key[1]),
+                                        key, limit, scan_filter)
+                    if len(stack) >= OPEN_LIMIT:
+                        subfolder.list_all()
+                    stack.append(subfolder)
+                    continue
+
+                stack.pop()
+                subtrees = folder.subtrees(cls)
+                if not stack:
+                    break
+                seq, name = folder.key
+                stack[-1].add(folder.size, seq, name, subtrees, folder.files)
+        finally:
+            for folder in stack:
+                folder.close()
+        AbstractTree.__init__(self, os.path.basename(path), subtrees)
+
+
+class AggregateTree(FileSystemTree):
+    """A leaf standing for the files and folders a BoundedFileSystemTree
+    folded together because they were too small to be kept.
+
+    Its data_size is their total size.
+
+    === Public Attributes ===
+    @type count: int
+        The number of files folded into this tree.
+    """
+    __slots__ = ('count',)
+
+    def __init__(self, size, count):
+        """Initialize a new AggregateTree of <count> files whose total size
+        is <size>.
+
+        @type self: AggregateTree
+        @type size: int
+        @type count: int
+        @rtype: None
+        """
+        AbstractTree.__init__(self, '({} other files)'.format(count), [],
+                              size)
+        self.count = count
+
+
+class _Folder:
+    """A folder being listed by BoundedFileSystemTree.
+
+    === Public Attributes ===
+    @type path: str
+        The path of the folder.
+    @type key: (int, str) | None
+        The position of the folder in its parent's listing and its name, or
+        None for the folder scanned.
+    @type folders: list[(int, str)]
+        If list_all was called, the position and name of each folder inside
+        it that was not walked yet, the first one last; otherwise empty.
+    @type size: int
+        The total size of the files inside it listed so far.
+    @type files: int
+        The number of files inside it listed so far.
+
+    === Private Attributes ===
+    @type _entries: iterator[os.DirEntry] | None
+        The entries of the folder not read yet, or None once they all were.
+    @type _scan_filter: ScanFilter
+        The filter the entries are chosen by.
+    @type _seq: int
+        The position of the next entry kept.
+    @type _limit: int
+        The number of subtrees kept.
+    @type _kept: list[(int, int, str, list[FileSystemTree] | None)]
+        The size, position, name and subtrees (None for files) of the
+        subtrees kept, as a heap whose smallest subtree is first.
+    @type _files: dict[int, int]
+        The number of files in each folder kept, by position.
+    @type _other_size: int
+        The total size of the subtrees folded.
+    @type _other_files: int
+        The number of files in the subtrees folded.
+    """
+    def __init__(self, path, key, limit, scan_filter):
+        """Start listing the folder at <path>, keeping up to <limit> of its
+        subtrees, and only the entries <scan_filter> chooses.
+
+        A folder that cannot be listed is empty.
+
+        @type self: _Folder
+        @type path: str
+        @type key: (int, str) | None
+        @type limit: int
+        @type scan_filter: ScanFilter
+        @rtype: None
+        """
+        self.path = path
+        self.key = key
+        self.folders = []
+        self.size = 0
+        self.files = 0
+        self._scan_filter = scan_filter
+        self._seq = 0
+        self._limit = limit
+        self._kept = []
+        self._files = {}
+        self._other_size = 0
+        self._other_files = 0
+        try:
+            self._entries = os.scandir(path)
+        except OSError:
+            self._entries = None
+
+    def next_folder(self):
+        """Return the position and name of the next folder inside this
+        folder, adding the files listed before it, or None if there are no
+        more.
+
+        @type self: _Folder
+        @rtype: (int, str) | None
+        """
+        if self.folders:
+            return self.folders.pop()
+        while self._entries is not None:
+            try:
+                entry = next(self._entries)
+            except (StopIteration, OSError):
+                self.close()
+                break
+            try:
+                checked = self._scan_filter.check(entry)
+                if checked is None:
+                    continue
+                is_folder, size = checked
+            except OSError:
+                is_folder, size = False, 0
+            seq = self._seq
+            self._seq += 1
+            if is_folder:
+                return seq, entry.name
+            self.add(size, seq, entry.name, None, 1)
+        return None
+
+    def list_all(self):
+        """Read all the entries of this folder at once, keeping the names
+        of its folders in folders.
+
+        @type self: _Folder
+        @rtype: None
+        """
+        folders = []
+        key = self.next_folder()
+        while key is not None:
+            folders.append(key)
+            key = self.next_folder()
+        folders.reverse()
+        self.folders = folders
+
+    def close(self):
+        """Stop listing this folder, if it was not listed to the end.
+
+        @type self: _Folder
+        @rtype: None
+        """
+        if self._entries is not None:
+            self._entries.close()
+            self._entries = None
+
+    def add(self, size, seq, name, subtrees, files):
+        """Add a subtree of the given size, position and name, with
+        <subtrees> (None for a file) and <files> files, folding the smallest
+        subtree if there are more than the limit.
+
+        @type self: _Folder
+        @type size: int
+        @type seq: int
+        @type name: str
+        @type subtrees: list[FileSystemTree] | None
+        @type files: int
+        @rtype: None
+        """
+        self.size += size
+        self.files += files
+        if subtrees is not None:
+            self._files[seq] = files
+        item = (size, seq, name, subtrees)
+        if len(self._kept) < self._limit:
+            heapq.heappush(self._kept, item)
+            return
+        size, seq, _, subtrees = heapq.heappushpop(self._kept, item)
+        self._other_size += size
+        self._other_files += 1 if subtrees is None else self._files.pop(seq)
+
+    def subtrees(self, cls):
+        """Return the subtrees kept, as trees of class <cls>, in the order
+        they were listed, followed by the AggregateTree of those folded.
+
+        @type self: _Folder
+        @type cls: type
+        @rtype: list[FileSystemTree]
+        """
+        result = []
+        for size, _, name, subtrees in sorted(self._kept,
+                                              key=lambda item: item[1]):
+            if subtrees is None:
+                result.append(cls._leaf(name, size))
+            else:
+                result.append(cls._folder(name, subtrees))
+        if self._other_files or self._other_size:
+            result.append(AggregateTree(self._other_size, self._other_files))
+        return result
@@ -0,0 +1,486 @@
+"""Compact Trees
+
+=== Module Description ===
+This module contains a compact representation of a file system tree for
+very large scans. Instead of one Python object per file or folder, the
+tree is stored in a CompactStore: a few contiguous arrays holding the
+size, parent, subtrees, colour and name of every node.
+
+CompactFileSystemTree is a lightweight view of one node of a CompactStore
+that supports the AbstractTree interface, so it can be given to the treemap
+visualiser like any other tree. Views are created when they are needed and
+only kept while they are in use, so the number of Python objects does not
+grow with the parts of the tree visited. The treemap of a view is laid out
+from the arrays of its store and kept in arrays too, so it does not need a
+view or a tuple per node either, whether it is drawn directly or through a
+ZoomView: only leaf_at creates the view of the leaf it returns.
+"""
+from array import array
+from collections import deque
+import os
+from random import getrandbits
+import sys
+import weakref
+
+from file_scanner import ScanFilter, scan_folder
+from leaf_index import LeafIndex
+from tree_data import AbstractTree, get_layout_engine, layout_version
+
+
+class CompactStore:
+    """The nodes of a tree, stored as arrays in breadth-first order.
+
+    Since the nodes are in breadth-first order, the subtrees of node i are
+    the nodes first_child[i] up to (but not including)
+    first_child[i] + child_count[i].
+
+    === Public Attributes ===
+    @type data_size: array
+        The data_size of each node.
+    @type parent: array
+        The index of the parent of each node, or -1 for the root and for
+        deleted nodes.
+    @type first_child: array
+        The index of the first subtree of each node.
+    @type child_count: array
+        The number of subtrees of each node.
+    @type colour: array
+        The colour of each node, packed as 0xRRGGBB.
+    @type name: array
+        The index in names of the name of each node, or -1 for deleted
+        nodes.
+    @type names: list[str]
+        Every distinct node name, each stored once.
+
+    === Private Attributes ===
+    @type _name_index: dict[str, int]
+        The index of each name in names.
+    @type _views: weakref.WeakValueDictionary[int, CompactFileSystemTree]
+        The view of each node that is still in use, by index.
+    """
+    def __init__(self):
+        """Initialize a new empty CompactStore.
+
+        @type self: CompactStore
+        @rtype: None
+        """
+        self.data_size = array('q')
+        self.parent = array('l')
+        self.first_child = array('l')
+        self.child_count = array('l')
+        self.colour = array('L')
+        self.name = array('l')
+        self.names = []
+        self._name_index = {}
+        self._views = weakref.WeakValueDictionary()
+
+    def __len__(self):
+        """Return the number of nodes in this store.
+
+        @type self: CompactStore
+        @rtype: int
+        """
+        return len(self.data_size)
+
+    def add_node(self, name, parent, data_size=0):
+        """Append a node and return its index.
+
+        The subtrees of a node must be added one after the other, after
+        every node of the previous levels was added; the first_child and
+        child_count of the parent are updated accordingly.
+
+        @type self: CompactStore
+        @type name: str | None
+            The name of the node, or None for a deleted node.
+        @type parent: int
+            The index of the parent of the node, or -1 for the root.
+        @type data_size: int
+        @rtype: int
+        """
+        index = len(self.data_size)
+        if name is not None and name not in self._name_index:
+            self._name_index[name] = len(self.names)
+            self.names.append(sys.intern(name))
+        self.data_size.append(data_size)
+        self.parent.append(parent)
+        self.first_child.append(0)
+        self.child_count.append(0)
+        self.colour.append(getrandbits(24))
+        self.name.append(-1 if name is None else self._name_index[name])
+        if parent != -1:
+            if self.child_count[parent] == 0:
+                self.first_child[parent] = index
+            self.child_count[parent] += 1
+        return index
+
+    def sum_sizes(self):
+        """Add the data_size of every node to the data_size of its parent.
+
+        Precondition: the data_size of every internal node is 0.
+
+        @type self: CompactStore
+        @rtype: None
+        """
+        # Subtrees come after their parent, so going backwards adds every
+        # subtree's total before its parent's total is used.
+        for i in range(len(self.data_size) - 1, 0, -1):
+            self.data_size[self.parent[i]] += self.data_size[i]
+
+    def node(self, index):
+        """Return the view of the node at <index>.
+
+        @type self: CompactStore
+        @type index: int
+        @rtype: CompactFileSystemTree
+        """
+        view = self._views.get(index)
+        if view is None:
+            view = CompactFileSystemTree(self, index)
+            self._views[index] = view
+        return view
+
+    @staticmethod
+    def from_path(path, scan_filter=None):
+        """Return the compact store of the files and folders in <path>.
+
+        The nodes are the same as those of FileSystemTree(path, 1,
+        scan_filter), in the same order, but no Python object is created
+        per file or folder.
+
+        Precondition: <path> is a valid path for this computer.
+
+        @type path: str
+        @type scan_filter: ScanFilter | None
+        @rtype: CompactStore
+        """
+        store = CompactStore()
+        root = store.add_node(os.path.basename(path), -1)
+        if not os.path.isdir(path):
+            store.data_size[root] = os.path.getsize(path)
+            return store
+
+        if scan_filter is None:
+            scan_filter = ScanFilter()
+        scan_filter.start(path)
+        folders = deque([(root, path)])
+        while folders:
+            index, folder = folders.popleft()
+            for name, entry_path, is_folder, size in scan_folder(
+                    folder, scan_filter):
+                if is_folder:
+                    folders.append((store.add_node(name, index), entry_path))
+                else:
+                    store.add_node(name, index, size)
+        store.sum_sizes()
+        return store
+
+    @staticmethod
+    def from_tree(tree):
+        """Return the compact store of the nodes of <tree>.
+
+        @type tree: AbstractTree
+        @rtype: CompactStore
+        """
+        store = CompactStore()
+        trees = deque([(tree, -1)])
+        while trees:
+            node, parent = trees.popleft()
+            index = store.add_node(node._root, parent, node.data_size)
+            if node._root is None:
+                store.parent[index] = -1
+            r, g, b = node.colour
+            store.colour[index] = r << 16 | g << 8 | b
+            for subtree in node._subtrees:
+                trees.append((subtree, index))
+        return store
+
+
+class CompactFileSystemTree(AbstractTree):
+    """A view of one node of a CompactStore of a file system.
+
+    The attributes of AbstractTree are read from and written to the store,
+    so this tree behaves exactly like the FileSystemTree of the same path.
+
+    === Private Attributes ===
+    @type _store: CompactStore
+        The store holding this node.
+    @type _index: int
+        The index of this node in the store.
+    @type _index_layout: ((int, int, int, int), int, int,
+                          ArrayTreemap) | None
+        The rectangle, minimum area and layout_version of the last treemap
+        laid out by _layout_indices, and that treemap.
+    """
+    PATH_SEPARATOR = os.sep
+    __slots__ = ('_store', '_index', '_index_layout', '__weakref__')
+
+    def __init__(self, store, index):
+        """Initialize a new view of node <index> of <store>.
+
+        Use CompactStore.node rather than calling this directly, so that
+        there is only one view per node in use.
+
+        @type self: CompactFileSystemTree
+        @type store: CompactStore
+        @type index: int
+        @rtype: None
+        """
+        self._store = store
+        self._index = index
+        self._layout_rect = None
+        self._layout_engine = None
+        self._layout = None
+        self._layout_dirty = True
+        self._treemap = None
+        self._leaf_index = None
+        self._index_layout = None
+
+    @property
+    def data_size(self):
+        """The total size of all leaves of this tree."""
+        return self._store.data_size[self._index]
+
+    @data_size.setter
+    def data_size(self, value):
+        self._store.data_size[self._index] = value
+
+    @property
+    def colour(self):
+        """The RGB colour value of the root of this tree."""
+        packed = self._store.colour[self._index]
+        return packed >> 16, packed >> 8 & 0xFF, packed & 0xFF
+
+    @colour.setter
+    def colour(self, value):
+        r, g, b = value
+        self._store.colour[self._index] = r << 16 | g << 8 | b
+
+    @property
+    def _root(self):
+        """The name of this node, or None if this tree is empty."""
+        name = self._store.name[self._index]
+        return None if name == -1 else self._store.names[name]
+
+    @_root.setter
+    def _root(self, value):
+        # Only deletion sets _root, and only to None.
+        self._store.name[self._index] = -1
+
+    @property
+    def _subtrees(self):
+        """The views of the subtrees of this tree."""
+        store = self._store
+        first = store.first_child[self._index]
+        if store.child_count[self._index] == 0:
+            return []
+        return [store.node(i)
+                for i in range(first, first + store.child_count[self._index])]
+
+    @property
+    def _parent_tree(self):
+        """The view of the parent tree of this tree, or None."""
+        parent = self._store.parent[self._index]
+        return None if parent == -1 else self._store.node(parent)
+
+    @_parent_tree.setter
+    def _parent_tree(self, value):
+        # Only deletion sets _parent_tree, and only to None.
+        self._store.parent[self._index] = -1
+
+    def generate_treemap(self, rect, min_area=0):
+        """Return the rectangles of the treemap of this tree, like
+        AbstractTree.generate_treemap, without creating the view of any
+        node.
+
+        Unlike AbstractTree.generate_treemap, the treemap is not written to
+        the layout trace or counted in the profile.
+
+        @type self: CompactFileSystemTree
+        @type rect: (int, int, int, int)
+        @type min_area: int
+        @rtype: list[((int, int, int, int), (int, int, int))]
+        """
+        treemap = self._layout_indices(rect, min_area)
+        colours = [(packed >> 16, packed >> 8 & 0xFF, packed & 0xFF)
+                   for packed in map(self._store.colour.__getitem__,
+                                     treemap.indices)]
+        return list(zip(treemap.rectangles(), colours))
+
+    def leaf_at(self, pos, rect, min_area=0):
+        """Return the leaf at the given position, like
+        AbstractTree.leaf_at; only the view of that leaf is created.
+
+        @type self: CompactFileSystemTree
+        @type pos: (int, int)
+        @type rect: (int, int, int, int)
+        @type min_area: int
+        @rtype: CompactFileSystemTree | None
+        """
+        layout = self._layout_indices(rect, min_area)
+        if self._leaf_index is None or self._leaf_index.layout is not layout:
+            self._leaf_index = LeafIndex(rect, layout)
+        index = self._leaf_index.leaf_at(pos)
+        return None if index is None else self._store.node(index)
+
+    def _zoom_layout(self, rect, min_area):
+        """Return the treemap of this tree in <rect> as ZoomView caches it,
+        like AbstractTree._zoom_layout, with the index of each leaf rather
+        than its view.
+
+        @type self: CompactFileSystemTree
+        @type rect: (int, int, int, int)
+        @type min_area: int
+        @rtype: (ArrayTreemap, list[((int, int, int, int), (int, int, int))])
+        """
+        return (self._layout_indices(rect, min_area),
+                self.generate_treemap(rect, min_area))
+
+    def _tree_of(self, item):
+        """Return the view of the leaf at index <item>.
+
+        @type self: CompactFileSystemTree
+        @type item: int
+        @rtype: CompactFileSystemTree
+        """
+        return self._store.node(item)
+
+    def _generate_layout(self, rect, min_area=0):
+        """Return the treemap of this tree in <rect>, pairing each rectangle
+        with the view of its leaf, like AbstractTree._generate_layout.
+
+        This creates the view of every leaf drawn, so the treemap is drawn
+        and searched through _layout_indices instead.
+
+        @type self: CompactFileSystemTree
+        @type rect: (int, int, int, int)
+        @type min_area: int
+        @rtype: list[((int, int, int, int), CompactFileSystemTree)]
+        """
+        treemap = self._layout_indices(rect, min_area)
+        return list(zip(treemap.rectangles(),
+                        map(self._store.node, treemap.indices)))
+
+    def _layout_indices(self, rect, min_area):
+        """Return the (possibly cached) treemap of this tree in <rect>,
+        pairing each rectangle with the index of its leaf, in the order of
+        AbstractTree.generate_treemap.
+
+        The tree is laid out from the arrays of the store, without views.
+        The treemap is kept until the rectangle, the minimum area or the
+        layout_version changes.
+
+        @type self: CompactFileSystemTree
+        @type rect: (int, int, int, int)
+        @type min_area: int
+        @rtype: ArrayTreemap
+        """
+        version = layout_version()
+        cached = self._index_layout
+        if cached is not None and cached[0] == rect and \
+                cached[1] == min_area and cached[2] == version:
+            return cached[3]
+
+        engine = get_layout_engine()
+        store = self._store
+        sizes = store.data_size
+        first_child = store.first_child
+        child_count = store.child_count
+        result = ArrayTreemap()
+        stack = [(self._index, rect)]
+        while stack:
+            index, node_rect = stack.pop()
+            size = sizes[index]
+            count = child_count[index]
+            if size == 0:
+                continue
+            elif count == 0 or node_rect[2] * node_rect[3] < min_area:
+                result.rects.extend(node_rect)
+                result.indices.append(index)
+                continue
+            children = range(first_child[index],
+                             first_child[index] + count)
+            rects = engine(node_rect, [sizes[child] for child in children],
+                           size)
+            # The subtrees are pushed last first, so they are popped in
+            # order.
+            stack.extend(zip(reversed(children), reversed(rects)))
+        self._index_layout = (rect, min_area, version, result)
+        return result
+
+    def get_separator(self):
+        """Return the path of this node, like FileSystemTree.get_separator.
+
+        @type self: CompactFileSystemTree
+        @rtype: str
+        """
+        store = self._store
+        if store.parent[self._index] == -1:
+            return self._root
+        names = []
+        index = self._index
+        while index != -1:
+            names.append(store.names[store.name[index]])
+            index = store.parent[index]
+        return os.path.join(*reversed(names))
+
+
+class ArrayTreemap:
+    """The treemap of a CompactFileSystemTree, as a sequence of
+    (rectangle, index) pairs, where index is the index of the leaf in the
+    store, kept in arrays rather than as tuples.
+
+    === Public Attributes ===
+    @type rects: array
+        The x, y, width and height of each rectangle, one after the other.
+    @type indices: array
+        The index of the leaf of each rectangle.
+    """
+    def __init__(self):
+        """Initialize a new empty ArrayTreemap.
+
+        @type self: ArrayTreemap
+        @rtype: None
+        """
+        self.rects = array('l')
+        self.indices = array('l')
+
+    def __len__(self):
+        """Return the number of rectangles in this treemap.
+
+        @type self: ArrayTreemap
+        @rtype: int
+        """
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        """Return the rectangle at position <i> and the index of its leaf.
+
+        @type self: ArrayTreemap
+        @type i: int
+        @rtype: ((int, int, int, int), int)
+        """
+        if not 0 <= i < len(self.indices):
+            raise IndexError(i)
+        return tuple(self.rects[4 * i:4 * i + 4]), self.indices[i]
+
+    def rectangles(self):
+        """Return the rectangles of this treemap, in order.
+
+        @type self: ArrayTreemap
+        @rtype: list[(int, int, int, int)]
+        """
+        items = iter(self.rects)
+        return list(zip(items, items, items, items))
+
+
+def compact_file_system_tree(path, scan_filter=None):
+    """Return a compact tree of the files and folders in <path>, listed
+    through <scan_filter> or a new ScanFilter if it is None.
+
+    Precondition: <path> is a valid path for this computer.
+
+    @type path: str
+    @type scan_filter: ScanFilter | None
+    @rtype: CompactFileSystemTree
+    """
+    return CompactStore.from_path(path, scan_filter).node(0)
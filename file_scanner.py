@@ -0,0 +1,251 @@
+"""File System Scanner
+
+=== Module Description ===
+This module contains the functions used to list the files and folders that
+make up a FileSystemTree.
+
+Folders are listed with os.scandir, which reports whether each entry is a
+folder without another system call. The folders are walked with an
+explicit queue rather than recursion, so deep folders cannot exceed
+Python's recursion limit, and several folders can be listed at once by a
+pool of threads, which helps most on network drives and SSDs.
+
+Each scan goes through a ScanFilter, which counts each file or folder once
+however many paths lead to it, identified by its device and inode numbers:
+hard links to a file already counted and folders mounted more than once
+are skipped, and symbolic links to folders are never followed, so they
+cannot loop or count the same files again. A symbolic link to a file counts
+as a file of the size of its target, as reported by os.path.getsize.
+Optionally, the scan is also kept on one file system. The filter counts
+what it skipped, for each reason.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import os
+import threading
+
+
+# The number of threads listing folders at once by default.
+SCAN_WORKERS = 8
+
+
+class ScanFilter:
+    """The files and folders a scan skips because they were already
+    counted or are out of bounds, and how many of each it skipped.
+
+    A ScanFilter can be shared by the threads of a scan, and should only be
+    used for one scan.
+
+    === Public Attributes ===
+    @type one_file_system: bool
+        Whether folders on another file system than the folder scanned are
+        skipped.
+    @type hard_links: int
+        The number of files skipped because they are hard links to a file
+        already counted.
+    @type duplicate_folders: int
+        The number of folders skipped because they were already listed
+        through another path, e.g., a bind mount.
+    @type symlinks: int
+        The number of symbolic links to folders skipped.
+    @type mounts: int
+        The number of folders skipped because they are on another file
+        system.
+
+    === Private Attributes ===
+    @type _device: int | None
+        The device of the folder scanned, once known.
+    @type _seen: set[(int, int)]
+        The device and inode of every folder listed, and of every file
+        with several hard links counted.
+    @type _lock: threading.Lock
+        The lock held while _seen and the counts are updated.
+    """
+    def __init__(self, one_file_system=False):
+        """Initialize a new ScanFilter.
+
+        @type self: ScanFilter
+        @type one_file_system: bool
+        @rtype: None
+        """
+        self.one_file_system = one_file_system
+        self.hard_links = 0
+        self.duplicate_folders = 0
+        self.symlinks = 0
+        self.mounts = 0
+        self._device = None
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def skipped(self):
+        """Return the number of entries skipped for each reason.
+
+        @type self: ScanFilter
+        @rtype: dict[str, int]
+        """
+        return {'hard_links': self.hard_links,
+                'duplicate_folders': self.duplicate_folders,
+                'symlinks': self.symlinks, 'mounts': self.mounts}
+
+    def start(self, path):
+        """Record that the scan starts at the folder at <path>.
+
+        @type self: ScanFilter
+        @type path: str
+        @rtype: None
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        self._device = stat.st_dev
+        self._first_visit(stat)
+
+    def check_folder(self, stat):
+        """Return whether the folder with the given os.stat result should be
+        listed, i.e., whether it is on the right file system and was not
+        listed before; if so, it is recorded as listed.
+
+        @type self: ScanFilter
+        @type stat: os.stat_result
+        @rtype: bool
+        """
+        if self.one_file_system and self._device is not None and \
+                stat.st_dev != self._device:
+            with self._lock:
+                self.mounts += 1
+            return False
+        if not self._first_visit(stat):
+            with self._lock:
+                self.duplicate_folders += 1
+            return False
+        return True
+
+    def check(self, entry):
+        """Return whether the os.DirEntry <entry> is a folder and the size
+        to count for it, or None if it is skipped.
+
+        The entry is stat-ed once, without following links. Only folders
+        and files with several hard links can be reached through more than
+        one path, so only their inodes are remembered.
+
+        A symbolic link to a folder is skipped, and a symbolic link to a
+        file is followed to find its size; an OSError is raised if it is
+        broken.
+
+        @type self: ScanFilter
+        @type entry: os.DirEntry
+        @rtype: (bool, int) | None
+        """
+        if entry.is_symlink():
+            if entry.is_dir():
+                with self._lock:
+                    self.symlinks += 1
+                return None
+            return False, entry.stat().st_size
+        stat = entry.stat(follow_symlinks=False)
+        if entry.is_dir(follow_symlinks=False):
+            return (True, 0) if self.check_folder(stat) else None
+        if stat.st_nlink > 1 and not self._first_visit(stat):
+            with self._lock:
+                self.hard_links += 1
+            return None
+        return False, stat.st_size
+
+    def _first_visit(self, stat):
+        """Record the file or folder with the given os.stat result, and
+        return whether it was not recorded before.
+
+        Where inode numbers are not reported (they are 0 in the results of
+        os.scandir on Windows), every entry is a first visit.
+
+        @type self: ScanFilter
+        @type stat: os.stat_result
+        @rtype: bool
+        """
+        if stat.st_ino == 0:
+            return True
+        key = (stat.st_dev, stat.st_ino)
+        with self._lock:
+            if key in self._seen:
+                return False
+            self._seen.add(key)
+            return True
+
+
+def scan_folder(path, scan_filter=None):
+    """Return the entries of the folder at <path>.
+
+    Each entry is a tuple (name, path, is_folder, size), where size is the
+    size of the file as reported by os.path.getsize, or 0 for folders.
+    The entries are chosen by <scan_filter>, which should be shared by all
+    the folders of a scan; a new one only skips the symbolic links and the
+    hard links within this folder.
+
+    A folder that cannot be listed is treated as empty, and a file whose
+    size cannot be read has size 0.
+
+    @type path: str
+    @type scan_filter: ScanFilter | None
+    @rtype: list[(str, str, bool, int)]
+    """
+    if scan_filter is None:
+        scan_filter = ScanFilter()
+    result = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    checked = scan_filter.check(entry)
+                    if checked is not None:
+                        result.append((entry.name, entry.path) + checked)
+                except OSError:
+                    result.append((entry.name, entry.path, False, 0))
+    except OSError:
+        pass
+    return result
+
+
+def scan(path, workers=SCAN_WORKERS, scan_filter=None):
+    """Return the entries of the folder at <path> and of every folder
+    inside it, as a dictionary mapping the path of each folder to its
+    entries, as returned by scan_folder.
+
+    The folders are inserted in the order they were found, so each folder
+    comes after the folder containing it.
+
+    Up to <workers> folders are listed at once; if <workers> is 1, the
+    folders are listed one at a time by the calling thread.
+
+    The entries are chosen by <scan_filter>, or by a new ScanFilter if it
+    is None; see ScanFilter.
+
+    @type path: str
+    @type workers: int
+    @type scan_filter: ScanFilter | None
+    @rtype: dict[str, list[(str, str, bool, int)]]
+    """
+    if scan_filter is None:
+        scan_filter = ScanFilter()
+    scan_filter.start(path)
+    listing = {}
+    if workers <= 1:
+        folders = deque([path])
+        while folders:
+            folder = folders.popleft()
+            listing[folder] = scan_folder(folder, scan_filter)
+            folders.extend(entry[1] for entry in listing[folder] if entry[2])
+        return listing
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(scan_folder, path, scan_filter): path}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                folder = pending.pop(future)
+                listing[folder] = future.result()
+                for entry in listing[folder]:
+                    if entry[2]:
+                        pending[pool.submit(scan_folder, entry[1],
+                                            scan_filter)] = entry[1]
+    return listing
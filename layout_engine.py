@@ -0,0 +1,249 @@
+"""Layout Engines
+
+=== Module Description ===
+This module contains the layout engines that can be given to
+tree_data.set_layout_engine to choose how AbstractTree.generate_treemap
+divides a rectangle among the subtrees of a tree.
+
+An engine lays out a single level: it is called with the rectangle of a
+tree, the data_size of each of its subtrees and their total, and returns
+one rectangle per subtree, in the same order. Subtrees of size 0 get a
+rectangle too, which is never drawn. The rectangles of the subtrees of size
+greater than 0 cover the whole rectangle of the tree without overlapping.
+
+slice_and_dice is the default; squarified avoids thin rectangles, which are
+hard to click and to tell apart, at the cost of sorting each level.
+
+Each engine also has a version in EDGE_ENGINES that lays out a rectangle
+given by floating-point edges and returns the edges of the subtrees
+without rounding them to pixels.
+"""
+
+
+def slice_and_dice(rect, sizes, total):
+    """Divide <rect> into strips across its longer side, in order.
+
+    @type rect: (int, int, int, int)
+    @type sizes: list[int]
+    @type total: int
+        The sum of <sizes>, which is greater than 0.
+    @rtype: list[(int, int, int, int)]
+    """
+    x, y, w, h = rect
+    result = []
+
+    # If deletion occured, a tree may be empty.
+    # So, the last subtree with data_size > 0 is the one stretched
+    # to fill the rest of the rectangle, since (x, y) may not be
+    # the origin (0, 0).
+    # NOTE: Due to rounding of <local_w> or <local_h>, the
+    #       proportion of the last rectangle may not be truly
+    #       correct.
+    last = len(sizes) - 1
+    while sizes[last] == 0:
+        last -= 1
+
+    for i in range(len(sizes)):
+        # If width > height, form vertical rectangles;
+        # only width should vary.
+        if w > h:
+            if i < last:
+                local_w = int(sizes[i] / total * w)
+            elif i == last:
+                local_w = w - x + rect[0]
+            else:
+                local_w = 0
+            result.append((x, y, local_w, h))
+            x += local_w
+
+        # If width <= height, form horizontal rectangles;
+        # only height should vary.
+        else:
+            if i < last:
+                local_h = int(sizes[i] / total * h)
+            elif i == last:
+                local_h = h - y + rect[1]
+            else:
+                local_h = 0
+            result.append((x, y, w, local_h))
+            y += local_h
+    return result
+
+
+def squarified(rect, sizes, total):
+    """Divide <rect> into rectangles as close to squares as possible, using
+    the squarified treemap algorithm of Bruls, Huizing and van Wijk.
+
+    The subtrees are placed from largest to smallest, in rows along the
+    shorter side of the space left. A row is extended with the next subtree
+    as long as that does not make its worst aspect ratio worse.
+
+    @type rect: (int, int, int, int)
+    @type sizes: list[int]
+    @type total: int
+        The sum of <sizes>, which is greater than 0.
+    @rtype: list[(int, int, int, int)]
+    """
+    x, y, w, h = rect
+    result = [(x, y, 0, 0)] * len(sizes)
+    if w <= 0 or h <= 0:
+        return result
+    # Each edge is rounded the same way for the rectangles on both of its
+    # sides, so they tile <rect> exactly.
+    for i, edges in _squarify(x, y, x + w, y + h, sizes, total):
+        result[i] = _round_rect(*edges)
+    return result
+
+
+def slice_and_dice_edges(edges, sizes, total):
+    """Divide the rectangle with the given edges like slice_and_dice, but
+    without rounding.
+
+    Each strip spans the cumulative fractions of <total> before and after
+    its subtree, and neighbouring strips share the same edge value.
+
+    @type edges: (float, float, float, float)
+        The left, top, right and bottom edges.
+    @type sizes: list[int]
+    @type total: int
+        The sum of <sizes>, which is greater than 0.
+    @rtype: list[(float, float, float, float)]
+    """
+    left, top, right, bottom = edges
+    vertical = right - left > bottom - top
+    start, end = (left, right) if vertical else (top, bottom)
+
+    last = len(sizes) - 1
+    while sizes[last] == 0:
+        last -= 1
+
+    result = []
+    cumulative = 0
+    position = start
+    for i in range(len(sizes)):
+        if i < last:
+            cumulative += sizes[i]
+            following = start + (end - start) * (cumulative / total)
+        else:
+            following = end
+        if vertical:
+            result.append((position, top, following, bottom))
+        else:
+            result.append((left, position, right, following))
+        position = following
+    return result
+
+
+def squarified_edges(edges, sizes, total):
+    """Divide the rectangle with the given edges like squarified, but
+    without rounding.
+
+    @type edges: (float, float, float, float)
+        The left, top, right and bottom edges.
+    @type sizes: list[int]
+    @type total: int
+        The sum of <sizes>, which is greater than 0.
+    @rtype: list[(float, float, float, float)]
+    """
+    left, top, right, bottom = edges
+    result = [(left, top, left, top)] * len(sizes)
+    if right <= left or bottom <= top:
+        return result
+    for i, child in _squarify(left, top, right, bottom, sizes, total):
+        result[i] = child
+    return result
+
+
+# The version of each layout engine that returns unrounded edges; see
+# unit_layout.py.
+EDGE_ENGINES = {slice_and_dice: slice_and_dice_edges,
+                squarified: squarified_edges}
+
+
+def _squarify(left, top, right, bottom, sizes, total):
+    """Yield the index and the (left, top, right, bottom) edges of each
+    subtree of size greater than 0 in the squarified layout of the given
+    rectangle, which is not empty.
+
+    Rows and columns end exactly on the edges of the space they fill, so
+    the edges yielded tile the rectangle.
+
+    @type left: float
+    @type top: float
+    @type right: float
+    @type bottom: float
+    @type sizes: list[int]
+    @type total: int
+    @rtype: iterator[(int, (float, float, float, float))]
+    """
+    order = sorted((i for i in range(len(sizes)) if sizes[i] > 0),
+                   key=sizes.__getitem__, reverse=True)
+    scale = (right - left) * (bottom - top) / total
+    free_left, free_top = float(left), float(top)
+    free_right, free_bottom = float(right), float(bottom)
+    start = 0
+    while start < len(order):
+        free_w = free_right - free_left
+        free_h = free_bottom - free_top
+        side = min(free_w, free_h)
+        if side <= 0:
+            break
+        largest = sizes[order[start]] * scale
+        row_area = 0.0
+        worst = float('inf')
+        end = start
+        while end < len(order):
+            area = sizes[order[end]] * scale
+            new_area = row_area + area
+            # The row is sorted, so its worst aspect ratio is that of its
+            # largest or of its smallest (i.e., newest) rectangle.
+            new_worst = max(side * side * largest / (new_area * new_area),
+                            new_area * new_area / (side * side * area))
+            if new_worst > worst:
+                break
+            worst = new_worst
+            row_area = new_area
+            end += 1
+
+        # The last row fills all the space left.
+        columns = free_w >= free_h
+        if end == len(order):
+            edge = free_right if columns else free_bottom
+        elif columns:
+            edge = free_left + row_area / side
+        else:
+            edge = free_top + row_area / side
+        thickness = row_area / side
+        position = free_top if columns else free_left
+        for i in order[start:end]:
+            if i == order[end - 1]:
+                following = free_bottom if columns else free_right
+            else:
+                following = position + sizes[i] * scale / thickness
+            if columns:
+                # The row is a column on the left of the free space.
+                yield i, (free_left, position, edge, following)
+            else:
+                # The row is a row at the top of the free space.
+                yield i, (position, free_top, following, edge)
+            position = following
+        if columns:
+            free_left = edge
+        else:
+            free_top = edge
+        start = end
+
+
+def _round_rect(left, top, right, bottom):
+    """Return the pygame rectangle whose edges are the given coordinates,
+    rounded to the nearest pixel.
+
+    @type left: float
+    @type top: float
+    @type right: float
+    @type bottom: float
+    @rtype: (int, int, int, int)
+    """
+    x = round(left)
+    y = round(top)
+    return x, y, round(right) - x, round(bottom) - y
@@ -0,0 +1,120 @@
+"""Layout Traces
+
+=== Module Description ===
+This module contains the layout traces that can be given to
+tree_data.set_layout_trace to record the rectangles of every treemap
+generated by AbstractTree.generate_treemap.
+
+Tracing is off by default. When it is on, each top-level layout is written
+to the trace exactly once, one rectangle per line in the form
+'(x, y, width, height)'.
+"""
+
+
+class LayoutTrace:
+    """A destination for the rectangles of each generated treemap.
+
+    This is an abstract class that should not be instantiated directly.
+    """
+    def write(self, rects):
+        """Record <rects>, the rectangles of one treemap, in order.
+
+        @type self: LayoutTrace
+        @type rects: list[(int, int, int, int)]
+        @rtype: None
+        """
+        raise NotImplementedError
+
+
+class StreamTrace(LayoutTrace):
+    """A layout trace that appends every treemap to a text stream, such as
+    an io.StringIO buffer or an open file.
+
+    === Public Attributes ===
+    @type stream: io.TextIOBase
+        The stream the rectangles are written to.
+    """
+    def __init__(self, stream):
+        """Initialize a new StreamTrace writing to <stream>.
+
+        @type self: StreamTrace
+        @type stream: io.TextIOBase
+        @rtype: None
+        """
+        self.stream = stream
+
+    def write(self, rects):
+        """Append <rects> to the stream.
+
+        @type self: StreamTrace
+        @type rects: list[(int, int, int, int)]
+        @rtype: None
+        """
+        self.stream.writelines(_lines(rects))
+
+
+class FileTrace(LayoutTrace):
+    """A layout trace that rewrites a file with the latest treemap.
+
+    === Public Attributes ===
+    @type path: str
+        The path of the file holding the latest treemap.
+    @type buffer_size: int
+        The size in bytes of the buffer used to write the file.
+    """
+    def __init__(self, path='testingmaterial.txt', buffer_size=1 << 16):
+        """Initialize a new FileTrace writing to the file at <path>.
+
+        @type self: FileTrace
+        @type path: str
+        @type buffer_size: int
+        @rtype: None
+        """
+        self.path = path
+        self.buffer_size = buffer_size
+
+    def write(self, rects):
+        """Replace the contents of the file with <rects>.
+
+        @type self: FileTrace
+        @type rects: list[(int, int, int, int)]
+        @rtype: None
+        """
+        with open(self.path, 'w', buffering=self.buffer_size) as file:
+            file.writelines(_lines(rects))
+
+
+class CallbackTrace(LayoutTrace):
+    """A layout trace that passes every treemap to a function.
+
+    === Public Attributes ===
+    @type callback: (list[(int, int, int, int)]) -> object
+        The function called with the rectangles of each treemap.
+    """
+    def __init__(self, callback):
+        """Initialize a new CallbackTrace calling <callback>.
+
+        @type self: CallbackTrace
+        @type callback: (list[(int, int, int, int)]) -> object
+        @rtype: None
+        """
+        self.callback = callback
+
+    def write(self, rects):
+        """Call the callback with <rects>.
+
+        @type self: CallbackTrace
+        @type rects: list[(int, int, int, int)]
+        @rtype: None
+        """
+        self.callback(rects)
+
+
+def _lines(rects):
+    """Yield the line recording each rectangle in <rects>.
+
+    @type rects: list[(int, int, int, int)]
+    @rtype: iterator[str]
+    """
+    for rect in rects:
+        yield '({}, {}, {}, {})\n'.format(*rect)
@@ -0,0 +1,325 @@
+"""Lazy File System Trees
+
+=== Module Description ===
+This module contains LazyFileSystemTree, a FileSystemTree whose folders are
+only listed when they are needed, so that the treemap of a folder with
+millions of files can be shown before it has been scanned.
+
+Only the first few levels of folders are listed when the tree is created.
+Deeper folders are deferred: until they are expanded, they have no subtrees
+and an estimated size. A Prefetcher lists deferred folders in background
+threads, starting with those taking up the most room on the screen, and
+expands them in the thread running the visualiser. With a depth of 0, this
+scans the whole folder in the background while its treemap is shown.
+
+The background threads never touch the tree: they only append the entries
+they listed to a deque, which needs no lock, so the visualiser cannot slow
+the scan down and always sees a tree whose sizes add up. The threads only
+share a lock to make sure that each folder is listed by one of them.
+
+All the folders of a tree are listed through the same file_scanner
+ScanFilter, whichever thread lists them, so each file and folder is counted
+once and symbolic links to folders are not followed, as in FileSystemTree.
+"""
+from collections import deque
+from itertools import count
+import os
+import queue
+import threading
+import time
+
+from file_scanner import ScanFilter, scan_folder
+from tree_data import AbstractTree, FileSystemTree
+
+
+# The number of levels of folders listed when a LazyFileSystemTree is
+# created.
+LAZY_DEPTH = 2
+
+# The most folders a Prefetcher expands each time it is updated, so that
+# the visualiser stays responsive.
+EXPAND_LIMIT = 256
+
+# The least number of seconds between two times a Prefetcher lays out the
+# tree to find the deferred folders on the screen.
+PRIORITY_INTERVAL = 0.5
+
+
+class LazyFileSystemTree(FileSystemTree):
+    """A FileSystemTree whose folders are listed when they are needed.
+
+    The data_size of a deferred folder is an estimate: the average size of
+    the files in its parent folder. The data_size of every folder containing
+    deferred folders is therefore an estimate too, until they are expanded.
+
+    === Private Attributes ===
+    @type _path: str | None
+        The path of this folder if it is deferred, i.e., if it has not been
+        listed yet, or None otherwise.
+    @type _scan_filter: ScanFilter | None
+        The filter the folders of this tree are listed through, shared by
+        all its nodes, or None for a file.
+    """
+    __slots__ = ('_path', '_scan_filter')
+
+    def __init__(self, path, depth=LAZY_DEPTH, scan_filter=None):
+        """Store the first <depth> levels of the file tree structure contained
+        in the given file or folder.
+
+        The files and folders listed, now or when they are expanded, are
+        chosen by <scan_filter>, or by a new ScanFilter if it is None.
+
+        Precondition: <path> is a valid path for this computer.
+
+        @type self: LazyFileSystemTree
+        @type path: str
+        @type depth: int
+        @type scan_filter: ScanFilter | None
+        @rtype: None
+        """
+        if not os.path.isdir(path):
+            FileSystemTree.__init__(self, path)
+            self._path = None
+            self._scan_filter = None
+            return
+
+        AbstractTree.__init__(self, os.path.basename(path), [], 1)
+        self._path = path
+        if scan_filter is None:
+            scan_filter = ScanFilter()
+        scan_filter.start(path)
+        self._scan_filter = scan_filter
+        folders = [self]
+        for _ in range(depth):
+            deferred = []
+            for folder in folders:
+                folder.expand()
+                deferred.extend(subtree for subtree in folder._subtrees
+                                if subtree.is_deferred())
+            folders = deferred
+
+    @classmethod
+    def _entry(cls, name, path, size, scan_filter):
+        """Return a new LazyFileSystemTree for a file, or for a deferred
+        folder listed through <scan_filter> if <path> is not None, without
+        accessing it.
+
+        @type cls: type
+        @type name: str
+        @type path: str | None
+        @type size: int
+        @type scan_filter: ScanFilter
+        @rtype: LazyFileSystemTree
+        """
+        tree = cls.__new__(cls)
+        AbstractTree.__init__(tree, name, [], size)
+        tree._path = path
+        tree._scan_filter = scan_filter
+        return tree
+
+    def is_deferred(self):
+        """Return True if this is a folder that has not been listed yet.
+
+        @type self: LazyFileSystemTree
+        @rtype: bool
+        """
+        return self._path is not None
+
+    def expand(self, listing=None):
+        """List this folder if it is deferred, and replace its estimated size
+        by the size of its contents.
+
+        The folders inside it are deferred in turn.
+
+        @type self: LazyFileSystemTree
+        @type listing: list[(str, str, bool, int)] | None
+            The entries of this folder as returned by scan_folder, if they
+            were already listed.
+        @rtype: None
+        """
+        if self._path is None:
+            return
+        if listing is None:
+            listing = scan_folder(self._path, self._scan_filter)
+
+        sizes = [size for _, _, is_folder, size in listing if not is_folder]
+        estimate = max(1, sum(sizes) // len(sizes)) if sizes else 1
+        subtrees = []
+        for name, entry_path, is_folder, size in listing:
+            if is_folder:
+                subtree = LazyFileSystemTree._entry(
+                    name, entry_path, estimate, self._scan_filter)
+            else:
+                subtree = LazyFileSystemTree._entry(
+                    name, None, size, self._scan_filter)
+            subtree._parent_tree = self
+            subtrees.append(subtree)
+
+        self._path = None
+        self._subtrees = subtrees
+        # The layouts of this folder and its ancestors are stale since this
+        # folder now has subtrees, even if its estimated size was right.
+        self._invalidate_layouts()
+        self.update_size(sum(subtree.data_size for subtree in subtrees) -
+                         self.data_size)
+
+
+class Prefetcher:
+    """Lists the deferred folders of a LazyFileSystemTree in a background
+    thread.
+
+    The background threads only read the file system; the tree is changed
+    by update, which must be called by the thread using the tree.
+
+    Folders are listed in order of priority: first those taking up the most
+    pixels in the last treemap, then all the others, level by level, so
+    that the whole tree is eventually listed.
+
+    === Private Attributes ===
+    @type _tree: LazyFileSystemTree
+        The tree whose folders are listed.
+    @type _requests: queue.PriorityQueue
+        The folders to list, as (-priority, order, folder) tuples.
+    @type _priority: dict[LazyFileSystemTree, int]
+        The highest priority each folder that is not expanded yet was
+        requested with.
+    @type _listed: int
+        The number of folders expanded so far.
+    @type _order: iterator[int]
+        Breaks ties between requests of the same priority, first come first
+        served.
+    @type _ready: deque[(LazyFileSystemTree, list[(str, str, bool, int)])]
+        The folders listed by the background threads, with their entries.
+    @type _prioritized: float | None
+        When the deferred folders on the screen were last requested by
+        their area, or None if they never were.
+    @type _shown: ((int, int, int, int), int, LazyFileSystemTree) | None
+        The rectangle, min_area and tree of the treemap they were requested
+        from.
+    """
+    def __init__(self, tree, workers=1):
+        """Start listing the deferred folders of <tree> in <workers> threads.
+
+        @type self: Prefetcher
+        @type tree: LazyFileSystemTree
+        @type workers: int
+        @rtype: None
+        """
+        self._tree = tree
+        self._requests = queue.PriorityQueue()
+        self._priority = {}
+        self._listed = 0
+        self._order = count()
+        self._ready = deque()
+        self._prioritized = None
+        self._shown = None
+
+        folders = deque([tree])
+        while folders:
+            folder = folders.popleft()
+            if folder.is_deferred():
+                self.request(folder)
+            else:
+                folders.extend(folder._subtrees)
+
+        listed = set()
+        lock = threading.Lock()
+        for _ in range(workers):
+            threading.Thread(target=self._run, args=(listed, lock),
+                             daemon=True).start()
+
+    def request(self, folder, priority=0):
+        """Ask for <folder> to be listed with the given priority, unless it
+        was already requested with at least that priority.
+
+        @type self: Prefetcher
+        @type folder: LazyFileSystemTree
+        @type priority: int
+        @rtype: None
+        """
+        if self._priority.get(folder, -1) < priority:
+            self._priority[folder] = priority
+            self._requests.put((-priority, next(self._order), folder))
+
+    def update(self, rect, min_area=0, shown=None):
+        """Expand the folders listed since the last update, and request the
+        deferred folders in the treemap of <shown> in <rect> by their area,
+        at most once every PRIORITY_INTERVAL seconds.
+
+        <shown> is the subtree of the tree on the screen, e.g., the focus of
+        a ZoomView, or the whole tree if it is None. Laying it out with the
+        same arguments as the visualiser reuses the treemap it cached. The
+        folders are requested again at once when the rectangle or the tree
+        shown changes.
+
+        Return True if the tree changed.
+
+        @type self: Prefetcher
+        @type rect: (int, int, int, int)
+        @type min_area: int
+        @type shown: LazyFileSystemTree | None
+        @rtype: bool
+        """
+        changed = False
+        for _ in range(min(EXPAND_LIMIT, len(self._ready))):
+            folder, listing = self._ready.popleft()
+            self._priority.pop(folder, None)
+            # Deleted folders are still listed, so that they are not waited
+            # for forever, but they are not expanded.
+            if folder.is_deferred() and folder._root is not None:
+                folder.expand(listing)
+                self._listed += 1
+                for subtree in folder._subtrees:
+                    if subtree.is_deferred():
+                        self.request(subtree)
+                changed = True
+
+        if shown is None:
+            shown = self._tree
+        now = time.monotonic()
+        if self._shown != (rect, min_area, shown) or \
+                changed and now - self._prioritized >= PRIORITY_INTERVAL:
+            self._prioritized = now
+            self._shown = (rect, min_area, shown)
+            for (_, _, w, h), tree in shown._generate_layout(rect, min_area):
+                if tree.is_deferred():
+                    self.request(tree, w * h)
+        return changed
+
+    def progress(self):
+        """Return a description of how far the listing of the tree got, or
+        the empty string if every folder was listed.
+
+        @type self: Prefetcher
+        @rtype: str
+        """
+        if not self._priority:
+            return ''
+        return 'Scanning: {} folders listed, {} waiting'.format(
+            self._listed, len(self._priority))
+
+    def _run(self, listed, lock):
+        """List the requested folders, forever.
+
+        A folder requested again with a higher priority is queued more than
+        once, but only listed the first time: listing it again through the
+        same ScanFilter would find its subfolders already counted.
+
+        @type self: Prefetcher
+        @type listed: set[LazyFileSystemTree]
+            The folders listed by any thread of this Prefetcher.
+        @type lock: threading.Lock
+            Held by the threads of this Prefetcher while they check and
+            change <listed>.
+        @rtype: None
+        """
+        while True:
+            _, _, folder = self._requests.get()
+            path = folder._path
+            with lock:
+                if path is None or folder in listed:
+                    continue
+                listed.add(folder)
+            self._ready.append(
+                (folder, scan_folder(path, folder._scan_filter)))
+
@@ -0,0 +1,117 @@
+"""Leaf Index
+
+=== Module Description ===
+This module contains LeafIndex, a spatial index over the rectangles of a
+treemap. It is used by AbstractTree.leaf_at to find the leaf under the
+cursor without running the treemap algorithm again.
+"""
+from array import array
+import math
+
+
+class LeafIndex:
+    """A uniform grid over the rectangles of a treemap.
+
+    The grid has about as many cells as there are visible rectangles, and
+    each cell stores the rectangles overlapping it. Since the rectangles
+    of a treemap do not overlap and each visible one covers at least one
+    pixel, a cell never holds more rectangles than it has pixels, so a
+    query only checks a handful of rectangles.
+
+    A rectangle (x, y, width, height) covers the pixels (px, py) with
+    x <= px < x + width and y <= py < y + height, i.e., exactly the pixels
+    filled by pygame. Rectangles with no width or no height are never
+    returned, since the user cannot see them.
+
+    === Public Attributes ===
+    @type rect: (int, int, int, int)
+        The rectangle the treemap was laid out in.
+    @type layout: list[((int, int, int, int), AbstractTree)]
+        The treemap this index was built from, as (rectangle, leaf) pairs.
+
+    === Private Attributes ===
+    @type _cell_w: int
+        The width of each cell of the grid.
+    @type _cell_h: int
+        The height of each cell of the grid.
+    @type _cols: int
+        The number of columns of the grid.
+    @type _rows: int
+        The number of rows of the grid.
+    @type _cell_start: array
+        The rectangles of cell c are layout[i] for each i in
+        _cell_items[_cell_start[c]:_cell_start[c + 1]].
+    @type _cell_items: array
+        Indices into layout, grouped by cell.
+    """
+    def __init__(self, rect, layout):
+        """Build the index of <layout>, the treemap of a tree in <rect>.
+
+        @type self: LeafIndex
+        @type rect: (int, int, int, int)
+        @type layout: list[((int, int, int, int), AbstractTree)]
+        @rtype: None
+        """
+        self.rect = rect
+        self.layout = layout
+
+        x0, y0, w, h = rect
+        visible = [i for i in range(len(layout))
+                   if layout[i][0][2] > 0 and layout[i][0][3] > 0]
+
+        # Aim for about one visible rectangle per cell.
+        side = max(1, int(math.sqrt(max(w, 1) * max(h, 1) /
+                                    max(len(visible), 1))))
+        self._cell_w = side
+        self._cell_h = side
+        self._cols = max(1, -(-w // side))
+        self._rows = max(1, -(-h // side))
+
+        # Find the range of cells each visible rectangle overlaps.
+        spans = []
+        counts = array('l', [0]) * (self._cols * self._rows + 1)
+        for i in visible:
+            x, y, rw, rh = layout[i][0]
+            c0 = max(0, (x - x0) // side)
+            c1 = min(self._cols - 1, (x + rw - 1 - x0) // side)
+            r0 = max(0, (y - y0) // side)
+            r1 = min(self._rows - 1, (y + rh - 1 - y0) // side)
+            spans.append((i, c0, c1, r0, r1))
+            for row in range(r0, r1 + 1):
+                for col in range(c0, c1 + 1):
+                    counts[row * self._cols + col + 1] += 1
+
+        # Turn the counts into the start of each cell, then fill the cells.
+        for c in range(1, len(counts)):
+            counts[c] += counts[c - 1]
+        self._cell_start = counts
+        self._cell_items = array('l', [0]) * counts[-1]
+        fill = array('l', counts)
+        for i, c0, c1, r0, r1 in spans:
+            for row in range(r0, r1 + 1):
+                for col in range(c0, c1 + 1):
+                    cell = row * self._cols + col
+                    self._cell_items[fill[cell]] = i
+                    fill[cell] += 1
+
+    def leaf_at(self, pos):
+        """Return the leaf whose rectangle contains <pos>, or None if there
+        is no such leaf.
+
+        @type self: LeafIndex
+        @type pos: (int, int)
+        @rtype: AbstractTree | None
+        """
+        px, py = pos
+        x0, y0, w, h = self.rect
+        if not (x0 <= px < x0 + w and y0 <= py < y0 + h):
+            return None
+
+        col = min((px - x0) // self._cell_w, self._cols - 1)
+        row = min((py - y0) // self._cell_h, self._rows - 1)
+        cell = row * self._cols + col
+        for c in range(self._cell_start[cell], self._cell_start[cell + 1]):
+            (x, y, rw, rh), leaf = self.layout[self._cell_items[c]]
+            if x <= px < x + rw and y <= py < y + rh:
+                return leaf
+        return None
@@ -0,0 +1,183 @@
+"""Vectorized Treemap Layout
+
+=== Module Description ===
+This module contains an alternative to AbstractTree.generate_treemap that
+uses NumPy. The tree is flattened into arrays once, and then the rectangles
+of all the nodes on one level of the tree are computed together with
+cumulative sums, instead of one node at a time.
+
+The rectangles are the same as those of generate_treemap, pixel for pixel,
+as long as data sizes are below 2 ** 53 (where floats stop being exact).
+
+NOTE: You'll need NumPy installed to use this module.
+"""
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; see FlatTree.__init__.
+    np = None
+
+
+class FlatTree:
+    """A tree flattened into arrays, with its nodes in breadth-first order.
+
+    Since the nodes are in breadth-first order, the subtrees of each node
+    are consecutive, and so are the nodes of each level of the tree.
+
+    === Public Attributes ===
+    @type nodes: list[AbstractTree]
+        The nodes of the tree in breadth-first order; node i is nodes[i].
+    @type parent: numpy.ndarray
+        The index of the parent of each node, or -1 for the root.
+    @type first_child: numpy.ndarray
+        The index of the first subtree of each node.
+    @type child_count: numpy.ndarray
+        The number of subtrees of each node.
+    @type data_size: numpy.ndarray
+        The data_size of each node.
+    @type colour: numpy.ndarray
+        The colour of each node, as an (N, 3) array.
+    @type order: numpy.ndarray
+        The position of each node in a preorder traversal of the tree, which
+        is the order generate_treemap returns the leaves in.
+    @type level_start: list[int]
+        The nodes of level d are those from level_start[d] up to (but not
+        including) level_start[d + 1].
+    """
+    def __init__(self, tree):
+        """Flatten <tree>.
+
+        @type self: FlatTree
+        @type tree: AbstractTree
+        @rtype: None
+        """
+        if np is None:
+            raise ImportError('NumPy is required for the vectorized layout')
+
+        nodes = [tree]
+        parent = [-1]
+        first_child = []
+        level_start = [0]
+        i = 0
+        while i < len(nodes):
+            # Append the subtrees of the nodes of the current level, which
+            # form the next level.
+            level_start.append(len(nodes))
+            while i < level_start[-1]:
+                first_child.append(len(nodes))
+                nodes.extend(nodes[i]._subtrees)
+                parent.extend([i] * len(nodes[i]._subtrees))
+                i += 1
+
+        self.nodes = nodes
+        self.parent = np.array(parent, dtype=np.int64)
+        self.first_child = np.array(first_child, dtype=np.int64)
+        self.child_count = np.array([len(node._subtrees) for node in nodes],
+                                    dtype=np.int64)
+        self.colour = np.array([node.colour for node in nodes],
+                               dtype=np.uint8).reshape(-1, 3)
+        self.level_start = level_start
+        self.refresh_sizes()
+
+        # The preorder position of a node is one past its parent's, plus the
+        # number of nodes in the subtrees of its earlier siblings.
+        count = np.ones(len(nodes), dtype=np.int64)
+        for d in range(len(level_start) - 2, 0, -1):
+            level = slice(level_start[d], level_start[d + 1])
+            np.add.at(count, self.parent[level], count[level])
+        self.order = np.zeros(len(nodes), dtype=np.int64)
+        for d in range(1, len(level_start) - 1):
+            level = slice(level_start[d], level_start[d + 1])
+            before, _ = _segment_sums(count[level], self.parent[level])
+            self.order[level] = self.order[self.parent[level]] + 1 + before
+
+    def refresh_sizes(self):
+        """Read the data_size of every node again, e.g., after a deletion.
+
+        @type self: FlatTree
+        @rtype: None
+        """
+        self.data_size = np.fromiter((node.data_size for node in self.nodes),
+                                     dtype=np.int64, count=len(self.nodes))
+
+    def layout(self, rect):
+        """Run the treemap algorithm on the flattened tree in <rect>.
+
+        Return the rectangles of the non-empty leaves as an (N, 4) array of
+        (x, y, width, height) rows, their colours as an (N, 3) array, and
+        their indices in nodes, all in the order of generate_treemap.
+
+        @type self: FlatTree
+        @type rect: (int, int, int, int)
+        @rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+        n = len(self.nodes)
+        rects = np.zeros((n, 4), dtype=np.int64)
+        rects[0] = rect
+        size = self.data_size
+        visible = np.zeros(n, dtype=bool)
+        visible[0] = size[0] > 0
+
+        for d in range(1, len(self.level_start) - 1):
+            level = np.arange(self.level_start[d], self.level_start[d + 1])
+            par = self.parent[level]
+            visible[level] = visible[par] & (size[level] > 0)
+
+            x, y, w, h = rects[par].T
+            vertical = w > h
+            length = np.where(vertical, w, h)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                share = (size[level] / size[par] * length)
+            local = np.where(size[level] > 0, share, 0).astype(np.int64)
+
+            # The last non-empty subtree of each node fills the rest of its
+            # parent's rectangle; empty subtrees after it take up no space.
+            offset, _ = _segment_sums(local, par)
+            non_empty = (size[level] > 0).astype(np.int64)
+            before, total = _segment_sums(non_empty, par)
+            is_last = (non_empty == 1) & (before + 1 == total)
+            local = np.where(is_last, length - offset, local)
+
+            rects[level, 0] = np.where(vertical, x + offset, x)
+            rects[level, 1] = np.where(vertical, y, y + offset)
+            rects[level, 2] = np.where(vertical, local, w)
+            rects[level, 3] = np.where(vertical, h, local)
+
+        leaves = np.nonzero(visible & (self.child_count == 0))[0]
+        leaves = leaves[np.argsort(self.order[leaves], kind='stable')]
+        return rects[leaves], self.colour[leaves], leaves
+
+
+def generate_treemap_arrays(tree, rect):
+    """Run the treemap algorithm on <tree> in <rect> using NumPy.
+
+    Return the same rectangles and colours as tree.generate_treemap(rect),
+    as an (N, 4) array of (x, y, width, height) rows and an (N, 3) array
+    of (r, g, b) rows.
+
+    @type tree: AbstractTree
+    @type rect: (int, int, int, int)
+    @rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    rects, colours, _ = FlatTree(tree).layout(rect)
+    return rects, colours
+
+
+def _segment_sums(values, segments):
+    """Return, for each item of <values>, the sum of the items before it in
+    the same segment and the sum of all the items in its segment.
+
+    Precondition: equal items of <segments> are consecutive.
+
+    @type values: numpy.ndarray
+    @type segments: numpy.ndarray
+    @rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    starts = np.ones(len(segments), dtype=bool)
+    starts[1:] = segments[1:] != segments[:-1]
+    start_index = np.flatnonzero(starts)
+    segment = np.cumsum(starts) - 1
+
+    before = np.cumsum(values) - values
+    before -= before[start_index][segment]
+    total = np.add.reduceat(values, start_index)[segment]
+    return before, total
@@ -0,0 +1,274 @@
+"""Parallel Treemap Layout
+
+=== Module Description ===
+This module contains an alternative to AbstractTree.generate_treemap that
+spreads the layout of large trees over a pool of processes, since laying
+out a tree in Python only keeps one CPU busy.
+
+The first levels of the tree are laid out in the calling process, which
+splits the treemap into the rectangles of the subtrees below them. Each
+large subtree is then flattened into two arrays, its data sizes and where
+each of its nodes ends, in preorder, and laid out by a worker process, which
+sends back the rectangles of its leaves as a flat array. Small subtrees are
+laid out in the calling process like generate_treemap, so they still use
+the cached rectangles of the trees; a tree too small to be worth splitting
+is not sent to the pool at all.
+
+The rectangles are the same as those of generate_treemap, in the same order,
+with the layout engine set with tree_data.set_layout_engine. The trees are
+walked with explicit stacks, so deep trees cannot exceed Python's recursion
+limit.
+
+The treemap visualiser lays out the part of the tree on the screen, whose
+treemap it caches, so it does not use a ParallelLayout. treemap_export
+does when it is asked to, for large exports; see
+treemap_export.export_file_system, or run:
+
+    python treemap_export.py --parallel <folder> <output>
+
+A worker process only helps on a machine with several CPUs: with one CPU,
+the time spent flattening the subtrees and sending them to the workers is
+not made up for.
+"""
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+from tree_data import get_layout_engine
+
+
+# Subtrees with fewer nodes than this are laid out in the calling process.
+PARALLEL_THRESHOLD = 20000
+
+# The number of levels of the tree laid out in the calling process to find
+# the subtrees sent to the workers.
+SPLIT_DEPTH = 2
+
+
+class ParallelLayout:
+    """A pool of processes that lay out treemaps together.
+
+    A ParallelLayout can be used as a context manager, which shuts down its
+    processes on exit:
+
+        with ParallelLayout() as layout:
+            treemap = layout.generate_treemap(tree, (0, 0, 1024, 738))
+
+    === Private Attributes ===
+    @type _pool: ProcessPoolExecutor
+        The worker processes.
+    @type _threshold: int
+        The least number of nodes of a subtree laid out by a worker.
+    @type _depth: int
+        The number of levels laid out in the calling process.
+    """
+    def __init__(self, workers=None, threshold=PARALLEL_THRESHOLD,
+                 depth=SPLIT_DEPTH):
+        """Initialize a new ParallelLayout with <workers> processes (by
+        default, one per CPU).
+
+        @type self: ParallelLayout
+        @type workers: int | None
+        @type threshold: int
+        @type depth: int
+        @rtype: None
+        """
+        self._pool = ProcessPoolExecutor(max_workers=workers or
+                                         os.cpu_count() or 1)
+        self._threshold = threshold
+        self._depth = depth
+
+    def __enter__(self):
+        """Return this ParallelLayout.
+
+        @type self: ParallelLayout
+        @rtype: ParallelLayout
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Shut down the worker processes.
+
+        @type self: ParallelLayout
+        @rtype: None
+        """
+        self.close()
+
+    def close(self):
+        """Shut down the worker processes.
+
+        @type self: ParallelLayout
+        @rtype: None
+        """
+        self._pool.shutdown()
+
+    def generate_treemap(self, tree, rect, min_area=0):
+        """Return the treemap of <tree> in <rect>, like
+        tree.generate_treemap(rect, min_area).
+
+        @type self: ParallelLayout
+        @type tree: AbstractTree
+        @type rect: (int, int, int, int)
+        @type min_area: int
+        @rtype: list[((int, int, int, int), (int, int, int))]
+        """
+        if not _larger_than(tree, self._threshold):
+            return tree.generate_treemap(rect, min_area)
+
+        engine = get_layout_engine()
+        parts = []
+        self._split(tree, rect, min_area, engine, self._depth, parts)
+
+        result = []
+        for part in parts:
+            if isinstance(part, list):
+                result.extend(part)
+                continue
+            nodes, future = part
+            rects, indices = future.result()
+            result.extend(((rects[4 * i], rects[4 * i + 1], rects[4 * i + 2],
+                            rects[4 * i + 3]), nodes[index].colour)
+                          for i, index in enumerate(indices))
+        return result
+
+    def _split(self, tree, rect, min_area, engine, depth, parts):
+        """Append the parts of the treemap of <tree> in <rect> to <parts>,
+        in order.
+
+        Each part is either a list of rectangles and colours, or the nodes
+        of a subtree in preorder and the future result of its layout by a
+        worker.
+
+        @type self: ParallelLayout
+        @type tree: AbstractTree
+        @type rect: (int, int, int, int)
+        @type min_area: int
+        @type engine: callable
+        @type depth: int
+        @type parts: list
+        @rtype: None
+        """
+        if tree.data_size == 0:
+            return
+        elif not _larger_than(tree, self._threshold) or \
+                rect[2] * rect[3] < min_area:
+            # Unlike generate_treemap, this does not keep the treemap of
+            # the subtree, only the cached rectangles of its nodes.
+            layout = []
+            tree._collect_layout(rect, min_area, layout)
+            parts.append([(leaf_rect, leaf.colour)
+                          for leaf_rect, leaf in layout])
+        elif depth > 0:
+            subtrees = tree._subtrees
+            rects = engine(rect, [subtree.data_size for subtree in subtrees],
+                           tree.data_size)
+            for subtree, subtree_rect in zip(subtrees, rects):
+                self._split(subtree, subtree_rect, min_area, engine,
+                            depth - 1, parts)
+        else:
+            nodes = []
+            sizes = array('q')
+            ends = array('l')
+            _flatten(tree, nodes, sizes, ends)
+            parts.append((nodes, self._pool.submit(
+                _layout_flat, rect, min_area, engine, sizes, ends)))
+
+
+def _larger_than(tree, count):
+    """Return whether <tree> has at least <count> nodes.
+
+    Only up to <count> nodes are visited.
+
+    @type tree: AbstractTree
+    @type count: int
+    @rtype: bool
+    """
+    stack = [tree]
+    while stack and count > 0:
+        count -= 1
+        stack.extend(stack.pop()._subtrees)
+    return count <= 0
+
+
+def _flatten(tree, nodes, sizes, ends):
+    """Append the nodes of <tree> in preorder to <nodes>, with their
+    data_size and the index in <nodes> after their last descendant.
+
+    @type tree: AbstractTree
+    @type nodes: list[AbstractTree]
+    @type sizes: array
+    @type ends: array
+    @rtype: None
+    """
+    # Each item is either a tree to append, or the index of a node whose
+    # descendants were all appended, with None in place of the other.
+    stack = [(tree, None)]
+    while stack:
+        node, index = stack.pop()
+        if node is None:
+            ends[index] = len(nodes)
+            continue
+        stack.append((None, len(nodes)))
+        nodes.append(node)
+        sizes.append(node.data_size)
+        ends.append(0)
+        stack.extend((subtree, None) for subtree in reversed(node._subtrees))
+
+
+def _layout_flat(rect, min_area, engine, sizes, ends):
+    """Return the treemap in <rect> of the tree flattened into <sizes> and
+    <ends> by _flatten, as the rectangles of its leaves (four items each)
+    and their indices in preorder.
+
+    This runs in the worker processes.
+
+    @type rect: (int, int, int, int)
+    @type min_area: int
+    @type engine: callable
+    @type sizes: array
+    @type ends: array
+    @rtype: (array, array)
+    """
+    rects = array('l')
+    indices = array('l')
+    _layout_node(0, rect, min_area, engine, sizes, ends, rects, indices)
+    return rects, indices
+
+
+def _layout_node(index, rect, min_area, engine, sizes, ends, rects,
+                 indices):
+    """Append the rectangles of the leaves of the node at <index> in
+    <rect> to <rects>, and their indices to <indices>, exactly as
+    AbstractTree._generate_layout would.
+
+    @type index: int
+    @type rect: (int, int, int, int)
+    @type min_area: int
+    @type engine: callable
+    @type sizes: array
+    @type ends: array
+    @type rects: array
+    @type indices: array
+    @rtype: None
+    """
+    stack = [(index, rect)]
+    while stack:
+        index, rect = stack.pop()
+        size = sizes[index]
+        end = ends[index]
+        if size == 0:
+            continue
+        elif end == index + 1 or rect[2] * rect[3] < min_area:
+            rects.extend(rect)
+            indices.append(index)
+            continue
+
+        children = []
+        child = index + 1
+        while child < end:
+            children.append(child)
+            child = ends[child]
+        child_rects = engine(rect, [sizes[child] for child in children],
+                             size)
+        # The subtrees are pushed last first, so they are popped in order.
+        stack.extend(zip(reversed(children), reversed(child_rects)))
@@ -0,0 +1,185 @@
+"""Path Index
+
+=== Module Description ===
+This module contains PathIndex, which finds the nodes of a tree by their
+path, as returned by get_separator, and remembers the paths of folders so
+that the path of a node does not have to be rebuilt from the root each time
+it is shown.
+
+The index is a trie: for each internal node it looks through, it keeps a
+dictionary from the interned names of its subtrees to the subtrees, so a
+lookup takes one dictionary access per level of the path. The dictionary of
+a node is only built the first time a lookup goes through it, and is built
+again if a subtree is not found in it, e.g., because the node was expanded
+by LazyFileSystemTree since. Deleted trees are recognized by their empty
+root, so the index stays correct however trees are deleted.
+
+The path separator of a tree is read from its PATH_SEPARATOR class
+attribute; trees without one are looked up by walking the tree, and their
+paths are those of get_separator.
+"""
+import sys
+
+
+# The number of nodes search returns by default.
+SEARCH_LIMIT = 100
+
+
+class PathIndex:
+    """An index of the nodes of a tree by path.
+
+    === Public Attributes ===
+    @type tree: AbstractTree
+        The tree indexed.
+
+    === Private Attributes ===
+    @type _separator: str | None
+        The separator between the names in a path, or None if it is not
+        known.
+    @type _children: dict[AbstractTree, dict[str, AbstractTree]]
+        The subtrees of each node looked through, by name.
+    @type _paths: dict[AbstractTree, str]
+        The path of each internal node whose path or whose subtree's path
+        was asked for.
+    """
+    def __init__(self, tree):
+        """Initialize a new PathIndex of <tree>.
+
+        @type self: PathIndex
+        @type tree: AbstractTree
+        @rtype: None
+        """
+        self.tree = tree
+        self._separator = getattr(tree, 'PATH_SEPARATOR', None)
+        self._children = {}
+        self._paths = {}
+
+    def path_of(self, tree):
+        """Return the path of <tree>, a node of the tree indexed, equal to
+        tree.get_separator().
+
+        The paths of internal nodes are remembered, so the path of a node
+        whose parent's path is known takes a single concatenation.
+
+        @type self: PathIndex
+        @type tree: AbstractTree
+        @rtype: str
+        """
+        path = self._paths.get(tree)
+        if path is not None:
+            return path
+        parent = tree._parent_tree
+        if parent is None or self._separator is None:
+            path = tree.get_separator()
+        else:
+            path = self._join(self.path_of(parent), str(tree._root))
+        if tree._subtrees:
+            self._paths[tree] = path
+        return path
+
+    def find(self, path):
+        """Return the node of the tree indexed with the given path, or None
+        if there is no such node.
+
+        @type self: PathIndex
+        @type path: str
+        @rtype: AbstractTree | None
+        """
+        root = self.tree
+        if self._separator is None:
+            for node in _preorder(root):
+                if node.get_separator() == path:
+                    return node
+            return None
+
+        prefix = self.path_of(root)
+        if not path.startswith(prefix):
+            return None
+        rest = path[len(prefix):]
+        if not rest:
+            return root
+        if prefix and not prefix.endswith(self._separator):
+            if not rest.startswith(self._separator):
+                return None
+            rest = rest[len(self._separator):]
+
+        node = root
+        for name in rest.split(self._separator):
+            node = self._child(node, name)
+            if node is None:
+                return None
+        return node
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        """Return up to <limit> nodes of the tree indexed whose name contains
+        <text>, ignoring case, in the order of generate_treemap.
+
+        @type self: PathIndex
+        @type text: str
+        @type limit: int
+        @rtype: list[AbstractTree]
+        """
+        text = text.casefold()
+        result = []
+        for node in _preorder(self.tree):
+            if text in str(node._root).casefold():
+                result.append(node)
+                if len(result) >= limit:
+                    break
+        return result
+
+    def _join(self, path, name):
+        """Return the path of the node called <name> in the node at <path>.
+
+        Like os.path.join, no separator is added after an empty path, e.g.,
+        that of a folder scanned through a path ending with a separator.
+
+        @type self: PathIndex
+        @type path: str
+        @type name: str
+        @rtype: str
+        """
+        if not path or path.endswith(self._separator):
+            return path + name
+        return path + self._separator + name
+
+    def _child(self, tree, name):
+        """Return the subtree of <tree> called <name>, or None if there is
+        no such subtree.
+
+        @type self: PathIndex
+        @type tree: AbstractTree
+        @type name: str
+        @rtype: AbstractTree | None
+        """
+        children = self._children.get(tree)
+        child = children.get(name) if children is not None else None
+        if child is None:
+            # The subtrees may have changed since the dictionary was built.
+            children = {sys.intern(str(subtree._root)): subtree
+                        for subtree in tree._subtrees
+                        if subtree._root is not None}
+            self._children[tree] = children
+            child = children.get(name)
+        elif child._root is None:
+            # The subtree was deleted.
+            del children[name]
+            self._paths.pop(child, None)
+            child = None
+        return child
+
+
+def _preorder(tree):
+    """Yield the nodes of <tree> that were not deleted, in preorder.
+
+    @type tree: AbstractTree
+    @rtype: iterator[AbstractTree]
+    """
+    if tree._root is None:
+        return
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(subtree for subtree in reversed(node._subtrees)
+                     if subtree._root is not None)
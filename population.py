@@ -8,24 +8,56 @@ world, region, and country), because we are able to model it using an
 AbstractTree subclass, we can then run it through our treemap visualisation
 tool to get a nice interactive graphical representation of this data.
 
+The data is cached in a file for CACHE_TTL seconds, already processed and
+saved with marshal, so that it loads without parsing any JSON. When the
+cache is missing or stale, both World Bank responses are fetched at once.
+If they cannot be fetched, a stale cache is used rather than failing.
+
+set_data_source changes where the data comes from: another base URL, e.g.,
+a local HTTP server, or a folder holding the two responses as
+populations.json and regions.json, which needs no network at all.
+
 NOTE: You'll need an Internet connection to access the World Bank API
 """
+from concurrent.futures import ThreadPoolExecutor
+import http.client
 import json
-import urllib.request as request
+import marshal
+import os
+import time
+import urllib.parse
+import urllib.request
 
 from tree_data import AbstractTree
 
 
 # Constants for the World Bank API urls.
 WORLD_BANK_BASE = 'http://api.worldbank.org/countries'
-WORLD_BANK_POPULATIONS = (
-    WORLD_BANK_BASE +
+POPULATIONS_QUERY = (
     '/all/indicators/SP.POP.TOTL?format=json&date=2014:2014&per_page=270'
 )
-WORLD_BANK_REGIONS = (
-    WORLD_BANK_BASE + '?format=json&date=2014:2014&per_page=310'
-)
+REGIONS_QUERY = '?format=json&date=2014:2014&per_page=310'
+WORLD_BANK_POPULATIONS = WORLD_BANK_BASE + POPULATIONS_QUERY
+WORLD_BANK_REGIONS = WORLD_BANK_BASE + REGIONS_QUERY
+
+# The files holding the response to each query in a folder of responses.
+RESPONSE_FILES = {POPULATIONS_QUERY: 'populations.json',
+                  REGIONS_QUERY: 'regions.json'}
 
+# The file the processed data is cached in, and the number of seconds it is
+# used for before being fetched again.
+CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'treemap',
+                          'population.marshal')
+CACHE_TTL = 7 * 24 * 60 * 60
+
+# The version of the format of the cache file.
+_CACHE_VERSION = 1
+
+# The base URL or folder the data is read from, and the cache file and its
+# time to live; see set_data_source.
+_source = WORLD_BANK_BASE
+_cache_path = CACHE_PATH
+_cache_ttl = CACHE_TTL
 
 class PopulationTree(AbstractTree):
     """A tree representation of country population data.
@@ -40,6 +72,9 @@ class PopulationTree(AbstractTree):
 
     See https://datahelpdesk.worldbank.org/ for details about this API.
     """
+    PATH_SEPARATOR = ' -- '
+    __slots__ = ()
+
     def __init__(self, world, root=None, subtrees=None, data_size=0):
         """Initialize a new PopulationTree.
 
@@ -86,6 +121,28 @@ class PopulationTree(AbstractTree):
         return result
 
 
+def set_data_source(source=WORLD_BANK_BASE, cache_path=CACHE_PATH,
+                    ttl=CACHE_TTL):
+    """Read the population data from <source> from now on, caching it in
+    the file at <cache_path> (or not at all if it is None) for <ttl>
+    seconds.
+
+    <source> is either an HTTP or HTTPS base URL that the World Bank
+    queries are appended to, or a folder holding the responses, named as in
+    RESPONSE_FILES. A cache only holds the data of the source it was read
+    from.
+
+    @type source: str
+    @type cache_path: str | None
+    @type ttl: float
+    @rtype: None
+    """
+    global _source, _cache_path, _cache_ttl
+    _source = source
+    _cache_path = cache_path
+    _cache_ttl = ttl
+
+
 def _load_data():
     """Create a list of trees corresponding to different world regions.
 
@@ -94,9 +151,8 @@ def _load_data():
 
     @rtype: list[PopulationTree]
     """
-    # Get data from World Bank API.
-    country_populations = _get_population_data()
-    regions = _get_region_data()
+    # Get data from the cache or the World Bank API.
+    country_populations, regions = _get_data()
 
     # Each region tree has only two levels:
     #   - a root storing the name of the region
@@ -116,8 +172,36 @@ def _load_data():
     return lst
 
 
-def _get_population_data():
-    """Return country population data from the World Bank.
+def _get_data():
+    """Return the country population data and the country region data, as
+    returned by _get_population_data and _get_region_data.
+
+    They are read from the cache if it is fresh, and fetched from the data
+    source otherwise, falling back on a stale cache if that fails.
+
+    @rtype: (dict[str, int], dict[str, list[str]])
+    """
+    cached = _read_cache()
+    if cached is not None and time.time() - cached[0] < _cache_ttl:
+        return cached[1], cached[2]
+
+    try:
+        population_json, region_json = _get_all_json_data(
+            [POPULATIONS_QUERY, REGIONS_QUERY])
+    except (OSError, http.client.HTTPException, ValueError):
+        if cached is None:
+            raise
+        return cached[1], cached[2]
+
+    countries = _get_population_data(population_json)
+    regions = _get_region_data(region_json)
+    _write_cache(countries, regions)
+    return countries, regions
+
+
+def _get_population_data(population_json):
+    """Return country population data from the World Bank response
+    <population_json>.
 
     The return value is a dictionary, where the keys are country names,
     and the values are the corresponding populations of those countries.
@@ -125,13 +209,14 @@ def _get_population_data():
     Ignore all countries that do not have any population data,
     or population data that cannot be read as an int.
 
+    @type population_json: list
     @rtype: dict[str, int]
     """
     # We are doing some pre-processing of the data for you.
     # The first element returned is ignored because it's just metadata.
     # The second element's first 47 elements are ignored because they aren't
     # countries.
-    _, population_data = _get_json_data(WORLD_BANK_POPULATIONS)
+    _, population_data = population_json
     population_data = population_data[47:]
 
     countries = {}
@@ -143,18 +228,20 @@ def _get_population_data():
     return countries
 
 
-def _get_region_data():
-    """Return country region data from the World Bank.
+def _get_region_data(region_json):
+    """Return country region data from the World Bank response
+    <region_json>.
 
     The return value is a dictionary, where the keys are region names,
     and the values a list of country names contained in that region.
 
     Ignore all regions that do not contain any countries.
 
+    @type region_json: list
     @rtype: dict[str, list[str]]
     """
     # We ignore the first component of the returned JSON, which is metadata.
-    _, country_data = _get_json_data(WORLD_BANK_REGIONS)
+    _, country_data = region_json
 
     regions = {}
 
@@ -172,11 +259,74 @@ def _get_region_data():
     return regions
 
 
-def _get_json_data(url):
-    """Return a dictionary representing the JSON response from the given url.
+def _read_cache():
+    """Return the time the cached data was fetched, the country population
+    data and the country region data, or None if there is no valid cache of
+    the current data source.
+
+    @rtype: (float, dict[str, int], dict[str, list[str]]) | None
+    """
+    if _cache_path is None:
+        return None
+    try:
+        with open(_cache_path, 'rb') as file:
+            version, source, fetched, countries, regions = \
+                marshal.load(file)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if version != _CACHE_VERSION or source != _source:
+        return None
+    return fetched, countries, regions
+
+
+def _write_cache(countries, regions):
+    """Save the country population and region data in the cache, if any.
+
+    The file is replaced at once, so a cache is never read half written.
+
+    @type countries: dict[str, int]
+    @type regions: dict[str, list[str]]
+    @rtype: None
+    """
+    if _cache_path is None:
+        return
+    temporary = _cache_path + '.tmp'
+    try:
+        os.makedirs(os.path.dirname(_cache_path) or '.', exist_ok=True)
+        with open(temporary, 'wb') as file:
+            marshal.dump((_CACHE_VERSION, _source, time.time(), countries,
+                          regions), file)
+        os.replace(temporary, _cache_path)
+    except OSError:
+        # The data is still returned; it is only fetched again next time.
+        pass
+
+
+def _get_all_json_data(queries):
+    """Return the JSON response to each of the World Bank <queries> from the
+    data source, fetching them all at once.
+
+    @type queries: list[str]
+    @rtype: list
+    """
+    with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+        return list(pool.map(_get_json_data, queries))
+
+
+def _get_json_data(query):
+    """Return the JSON response to the World Bank <query> from the data
+    source.
+
+    Raise ValueError if the data source is neither a folder nor an HTTP or
+    HTTPS URL.
 
-    @type url: str
-    @rtype: Dict
+    @type query: str
+    @rtype: list
     """
-    response = request.urlopen(url)
-    return json.loads(response.read().decode())
\ No newline at end of file
+    if os.path.isdir(_source):
+        with open(os.path.join(_source, RESPONSE_FILES[query]), 'rb') as file:
+            return json.loads(file.read().decode())
+    if urllib.parse.urlsplit(_source).scheme not in ('http', 'https'):
+        raise ValueError('Not a folder or an HTTP URL: ' + _source)
+    with urllib.request.urlopen(_source + query) as response:
+        return json.loads(response.read().decode())
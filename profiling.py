@@ -0,0 +1,169 @@
+"""Profiling
+
+=== Module Description ===
+This module contains Profile, which measures where the treemap visualiser
+spends its time. It can be given to tree_data.set_profile, and to the
+visualiser, which shows its summary in the text display.
+
+A Profile records, for each phase (e.g., 'layout' for generate_treemap or
+'leaf_at' for hit-testing), the time spent in it, how many times it ran and
+how many nodes it visited, both in total and for the last frame drawn.
+
+Profiling is off by default, and then costs a single comparison with None
+per instrumented call.
+"""
+import json
+import time
+
+
+class Profile:
+    """The times and counts of the phases of drawing treemaps.
+
+    === Public Attributes ===
+    @type totals: dict[str, list[float | int]]
+        The time in seconds, number of runs and number of nodes visited of
+        each phase since this Profile was created.
+    @type frame: dict[str, list[float | int]]
+        The same, for the last frame drawn.
+    @type rects: int
+        The number of rectangles in the last frame drawn.
+    @type drawn: int
+        The number of rectangles actually drawn in the last frame, which is
+        less than rects if only the changed ones were.
+    @type frames: int
+        The number of frames drawn since this Profile was created.
+
+    === Private Attributes ===
+    @type _current: dict[str, list[float | int]]
+        The times and counts of each phase since the last frame was drawn.
+    @type _phases: list[(str, float)]
+        The phases running, innermost last, with the time they started.
+    @type _dump: io.TextIOBase | None
+        The stream the statistics are written to periodically, if any.
+    @type _interval: float
+        The least number of seconds between two writes to _dump.
+    @type _dumped: float
+        When the statistics were last written to _dump.
+    """
+    def __init__(self, dump=None, interval=10.0):
+        """Initialize a new Profile.
+
+        If <dump> is given, the statistics are written to it as a line of
+        JSON when a frame ends, at most once every <interval> seconds.
+
+        @type self: Profile
+        @type dump: io.TextIOBase | None
+        @type interval: float
+        @rtype: None
+        """
+        self.totals = {}
+        self.frame = {}
+        self.rects = 0
+        self.drawn = 0
+        self.frames = 0
+        self._current = {}
+        self._phases = []
+        self._dump = dump
+        self._interval = interval
+        self._dumped = time.monotonic()
+
+    def begin(self, phase):
+        """Start timing <phase>, until the matching call to end.
+
+        @type self: Profile
+        @type phase: str
+        @rtype: None
+        """
+        self._phases.append((phase, time.perf_counter()))
+
+    def end(self):
+        """Stop timing the phase started last.
+
+        @type self: Profile
+        @rtype: None
+        """
+        phase, start = self._phases.pop()
+        stats = self._stats(phase)
+        stats[0] += time.perf_counter() - start
+        stats[1] += 1
+
+    def visit(self):
+        """Count one node visited by the phase running.
+
+        @type self: Profile
+        @rtype: None
+        """
+        if self._phases:
+            self._stats(self._phases[-1][0])[2] += 1
+
+    def end_frame(self, rects, drawn):
+        """Record that a frame with <rects> rectangles, of which <drawn>
+        were drawn, was completed, and start counting the next one.
+
+        @type self: Profile
+        @type rects: int
+        @type drawn: int
+        @rtype: None
+        """
+        for phase, stats in self._current.items():
+            total = self.totals.setdefault(phase, [0.0, 0, 0])
+            for i in range(3):
+                total[i] += stats[i]
+        self.frame = self._current
+        self._current = {}
+        self.rects = rects
+        self.drawn = drawn
+        self.frames += 1
+
+        if self._dump is not None and \
+                time.monotonic() - self._dumped >= self._interval:
+            self._dumped = time.monotonic()
+            self.write(self._dump)
+
+    def summary(self):
+        """Return a one-line summary of the last frame.
+
+        @type self: Profile
+        @rtype: str
+        """
+        parts = ['{} {:.1f}ms/{}'.format(phase, stats[0] * 1000, stats[2])
+                 for phase, stats in sorted(self.frame.items())]
+        parts.append('rects {}/{}'.format(self.drawn, self.rects))
+        return ' | '.join(parts)
+
+    def write(self, stream):
+        """Write the statistics to <stream> as a line of JSON.
+
+        @type self: Profile
+        @type stream: io.TextIOBase
+        @rtype: None
+        """
+        json.dump({'time': time.time(), 'frames': self.frames,
+                   'rects': self.rects, 'drawn': self.drawn,
+                   'totals': _as_dict(self.totals),
+                   'frame': _as_dict(self.frame)}, stream, sort_keys=True)
+        stream.write('\n')
+        stream.flush()
+
+    def _stats(self, phase):
+        """Return the times and counts of <phase> for the current frame.
+
+        @type self: Profile
+        @type phase: str
+        @rtype: list[float | int]
+        """
+        stats = self._current.get(phase)
+        if stats is None:
+            stats = self._current[phase] = [0.0, 0, 0]
+        return stats
+
+
+def _as_dict(phases):
+    """Return the times and counts of <phases> with named fields.
+
+    @type phases: dict[str, list[float | int]]
+    @rtype: dict[str, dict[str, float | int]]
+    """
+    return {phase: {'seconds': stats[0], 'runs': stats[1],
+                    'visits': stats[2]}
+            for phase, stats in phases.items()}
@@ -0,0 +1,345 @@
+"""Record Trees
+
+=== Module Description ===
+This module contains RecordTree, which models any hierarchy read from a
+stream of records, such as the rows of a CSV cost report or the lines of a
+newline-delimited JSON bucket inventory, and the functions that load one.
+
+The records are read one at a time and never kept: each one only adds its
+size to a node of a TreeBuilder, which stores one entry per distinct node
+in arrays. The memory used therefore depends on the number of distinct
+nodes, not on the number of records, so files with tens of millions of rows
+can be loaded as long as their hierarchy fits in memory.
+
+Where each record goes is given either by path fields, whose values are
+the names of its node and of its ancestors (a single field can also hold a
+whole path, split at a separator), or by a key field and a parent key field,
+in which case records may come in any order.
+
+Records with the same path or key are one node, whose size is their total.
+A node that has both a size of its own and subtrees gets a leaf named
+SELF_NAME holding its own size, since the size of an internal node is the
+total of its subtrees.
+"""
+from array import array
+import csv
+import json
+import sys
+
+from tree_data import AbstractTree
+
+
+# The name of the leaf holding the size of an internal node's own records.
+SELF_NAME = '(self)'
+
+# The parent of a node whose parent key was seen, but not its record.
+_UNKNOWN = -2
+
+
+class RecordTree(AbstractTree):
+    """A tree read from a stream of records.
+
+    The _root attribute stores the name of the node, and data_size is the
+    total size of the records in it.
+    """
+    PATH_SEPARATOR = '/'
+    __slots__ = ()
+
+    def __init__(self, root, subtrees=None, data_size=0):
+        """Initialize a new RecordTree.
+
+        @type self: RecordTree
+        @type root: str
+        @type subtrees: list[RecordTree] | None
+        @type data_size: int
+        @rtype: None
+        """
+        AbstractTree.__init__(self, root, subtrees or [], data_size)
+
+    def get_separator(self):
+        """Return the names of the ancestors of this node and its own,
+        separated by '/'.
+
+        @type self: RecordTree
+        @rtype: str
+        """
+        names = []
+        tree = self
+        while tree is not None:
+            names.append(tree._root)
+            tree = tree._parent_tree
+        return '/'.join(reversed(names))
+
+
+class TreeBuilder:
+    """The nodes of a RecordTree being read, with their sizes so far.
+
+    Node 0 is the root. Nodes are added with add_path or add_record, and
+    build turns them into a RecordTree.
+
+    === Public Attributes ===
+    @type skipped: int
+        The number of records left out because their size or position
+        could not be read.
+
+    === Private Attributes ===
+    @type _names: list[str]
+        The name of each node, interned.
+    @type _parent: array
+        The index of the parent of each node, or _UNKNOWN if it is not known
+        yet.
+    @type _size: array
+        The total size of the records of each node.
+    @type _children: dict[(int, str), int]
+        The index of each node added with add_path, by parent and name.
+    @type _keys: dict[object, int]
+        The index of each node added with add_record, by key.
+    """
+    def __init__(self, root='root'):
+        """Initialize a new TreeBuilder whose root is named <root>.
+
+        @type self: TreeBuilder
+        @type root: str
+        @rtype: None
+        """
+        self.skipped = 0
+        self._names = [root]
+        self._parent = array('l', [-1])
+        self._size = array('q', [0])
+        self._children = {}
+        self._keys = {}
+
+    def __len__(self):
+        """Return the number of nodes added so far, including the root.
+
+        @type self: TreeBuilder
+        @rtype: int
+        """
+        return len(self._names)
+
+    def add_path(self, names, size):
+        """Add <size> to the node reached from the root through <names>,
+        adding the nodes on the way that do not exist yet.
+
+        @type self: TreeBuilder
+        @type names: list[str]
+        @type size: int
+        @rtype: None
+        """
+        index = 0
+        children = self._children
+        for name in names:
+            child = children.get((index, name))
+            if child is None:
+                child = self._add_node(name, index)
+                children[(index, name)] = child
+            index = child
+        self._size[index] += size
+
+    def add_record(self, key, parent_key, name, size):
+        """Add <size> to the node with the given key, named <name>, whose
+        parent is the node with key <parent_key>, or the root if it is None.
+
+        The parent does not have to be added first; a node whose parent is
+        never added becomes a subtree of the root.
+
+        @type self: TreeBuilder
+        @type key: object
+        @type parent_key: object | None
+        @type name: str
+        @type size: int
+        @rtype: None
+        """
+        if parent_key is None:
+            parent = 0
+        else:
+            parent = self._keys.get(parent_key)
+            if parent is None:
+                parent = self._add_node(str(parent_key), _UNKNOWN)
+                self._keys[parent_key] = parent
+
+        index = self._keys.get(key)
+        if index is None:
+            self._keys[key] = self._add_node(name, parent)
+            index = self._keys[key]
+        else:
+            self._names[index] = sys.intern(name)
+            self._parent[index] = parent
+        self._size[index] += size
+
+    def build(self, cls=RecordTree):
+        """Return the tree of the nodes added, whose nodes are of class
+        <cls>, RecordTree or a subclass of it.
+
+        Nodes that are not connected to the root, because their parents form
+        a cycle, are left out and counted in skipped.
+
+        @type self: TreeBuilder
+        @type cls: type
+        @rtype: RecordTree
+        """
+        n = len(self._names)
+        parent = self._parent
+        for i in range(1, n):
+            if parent[i] == _UNKNOWN:
+                parent[i] = 0
+
+        # Sort the nodes by parent, keeping the order they were added in.
+        count = array('l', bytes(array('l').itemsize * (n + 1)))
+        for i in range(1, n):
+            count[parent[i] + 1] += 1
+        for i in range(1, n + 1):
+            count[i] += count[i - 1]
+        start = array('l', count)
+        by_parent = array('l', bytes(array('l').itemsize * max(n - 1, 0)))
+        for i in range(1, n):
+            by_parent[count[parent[i]]] = i
+            count[parent[i]] += 1
+
+        # List the nodes reachable from the root, parents first, then
+        # create the trees from the last one up.
+        order = array('l', [0])
+        i = 0
+        while i < len(order):
+            node = order[i]
+            order.extend(by_parent[start[node]:start[node + 1]])
+            i += 1
+        self.skipped += n - len(order)
+
+        trees = {}
+        for node in reversed(order):
+            subtrees = [trees.pop(child)
+                        for child in by_parent[start[node]:start[node + 1]]]
+            size = self._size[node]
+            if subtrees and size:
+                subtrees.append(cls(SELF_NAME, [], size))
+            trees[node] = cls(self._names[node], subtrees, size)
+        return trees[0]
+
+    def _add_node(self, name, parent):
+        """Append a node with the given name and parent, and return its
+        index.
+
+        @type self: TreeBuilder
+        @type name: str
+        @type parent: int
+        @rtype: int
+        """
+        self._names.append(sys.intern(name))
+        self._parent.append(parent)
+        self._size.append(0)
+        return len(self._names) - 1
+
+
+def load_records(records, size_field, path_fields=None, separator=None,
+                 key_field=None, parent_field=None, name_field=None,
+                 scale=1, root='root'):
+    """Return the RecordTree of <records>, reading them one at a time.
+
+    Each record is a dictionary, e.g., a row of csv.DictReader. Its size is
+    the value of <size_field> multiplied by <scale> and rounded, so that
+    sizes with decimals, such as costs, can be kept; records without a
+    positive size are skipped.
+
+    If <path_fields> is given, the values of these fields are the names of
+    the nodes from the root to the node of the record, skipping empty ones;
+    if <separator> is also given, each value is split at it, so that one
+    field can hold a whole path. Otherwise, the node of each record is the
+    node whose key is the value of <key_field>, its parent is the node whose
+    key is the value of <parent_field> (or the root if it is empty), and
+    its name is the value of <name_field>, or else its key.
+
+    @type records: iterable[dict]
+    @type size_field: str
+    @type path_fields: list[str] | None
+    @type separator: str | None
+    @type key_field: str | None
+    @type parent_field: str | None
+    @type name_field: str | None
+    @type scale: float
+    @type root: str
+    @rtype: RecordTree
+    """
+    if path_fields is None and key_field is None:
+        raise ValueError('Either path_fields or key_field must be given')
+
+    builder = TreeBuilder(root)
+    for record in records:
+        try:
+            size = round(float(record[size_field]) * scale)
+        except (KeyError, TypeError, ValueError):
+            size = 0
+        if size <= 0:
+            builder.skipped += 1
+            continue
+
+        if path_fields is not None:
+            names = []
+            for field in path_fields:
+                value = record.get(field)
+                if value is None or value == '':
+                    continue
+                value = str(value)
+                if separator is None:
+                    names.append(value)
+                else:
+                    names.extend(name for name in value.split(separator)
+                                 if name)
+            if not names:
+                builder.skipped += 1
+                continue
+            builder.add_path(names, size)
+        else:
+            key = record.get(key_field)
+            if key is None or key == '':
+                builder.skipped += 1
+                continue
+            parent_key = record.get(parent_field) if parent_field else None
+            if parent_key == '':
+                parent_key = None
+            name = record.get(name_field) if name_field else None
+            builder.add_record(key, parent_key,
+                               str(key if name in (None, '') else name),
+                               size)
+    return builder.build()
+
+
+def read_csv(file):
+    """Yield the rows of the CSV <file>, whose first row names the fields,
+    as dictionaries.
+
+    @type file: io.TextIOBase
+    @rtype: iterator[dict[str, str]]
+    """
+    return csv.DictReader(file)
+
+
+def read_ndjson(file):
+    """Yield the records of the newline-delimited JSON <file>, one per
+    non-empty line.
+
+    @type file: io.TextIOBase
+    @rtype: iterator[dict]
+    """
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def load_file(path, size_field, **options):
+    """Return the RecordTree of the records in the file at <path>, read as
+    newline-delimited JSON if its name ends with '.json', '.jsonl' or
+    '.ndjson', and as CSV otherwise.
+
+    <options> are those of load_records.
+
+    @type path: str
+    @type size_field: str
+    @rtype: RecordTree
+    """
+    with open(path, newline='', encoding='utf-8') as file:
+        if path.lower().endswith(('.json', '.jsonl', '.ndjson')):
+            records = read_ndjson(file)
+        else:
+            records = read_csv(file)
+        return load_records(records, size_field, **options)
@@ -0,0 +1,312 @@
+"""Scan Cache
+
+=== Module Description ===
+This module contains a persistent cache of file system scans, so that the
+treemap of a large folder can be shown again without scanning every file.
+
+The scan of a folder is kept as a CompactStore together with the
+modification time of each folder, and saved in a binary file holding the
+arrays of the store as they are in memory. Loading the file maps it into
+memory and uses the arrays in place, so nothing is parsed except the names.
+
+When the cache is loaded, only the folders whose modification time changed
+are listed again; everything else is taken from the cache. Note that
+changing the contents of a file does not change the modification time of
+its folder, so such changes are only picked up by a full scan.
+
+The folders listed again go through a file_scanner.ScanFilter, like a full
+scan, and so do the folders taken from the cache: each of them is checked
+before it is copied, so a folder mounted again elsewhere since is counted
+once. A cache saved while staying on one file system is only reused by
+scans that do too.
+"""
+from array import array
+from collections import deque
+import mmap
+import os
+import struct
+
+from compact_tree import CompactStore
+from file_scanner import ScanFilter, scan_folder
+
+
+# The first bytes of every cache file.
+MAGIC = b'TREEMAP2'
+
+# The header of a cache file: the size of a 'l' array item, then the number
+# of nodes, folders, bytes of names and bytes of the scanned path, and
+# whether the scan stayed on one file system.
+_HEADER = struct.Struct('<8s6q')
+
+# The modification time stored for files, which have none.
+_FILE = -1
+
+# The typecodes of the arrays of a cache file with one item per node, in
+# the order they are saved, and of the array of folders after them.
+_NODE_ARRAYS = 'qqlllLl'
+_FOLDER_ARRAY = 'l'
+
+
+class CachedStore(CompactStore):
+    """The CompactStore of a scanned folder, with what is needed to rescan
+    only the parts that changed.
+
+    === Public Attributes ===
+    @type path: str
+        The path of the scanned folder.
+    @type mtime: array
+        The modification time of each node in nanoseconds if it is a folder,
+        or -1 if it is a file.
+    @type folders: array
+        The index of every folder, in increasing order.
+    @type one_file_system: bool
+        Whether the scan stayed on the file system of the scanned folder.
+    """
+    def __init__(self, path, one_file_system=False):
+        """Initialize a new empty CachedStore of the folder at <path>.
+
+        @type self: CachedStore
+        @type path: str
+        @type one_file_system: bool
+        @rtype: None
+        """
+        CompactStore.__init__(self)
+        self.path = path
+        self.mtime = array('q')
+        self.folders = array('l')
+        self.one_file_system = one_file_system
+
+    def add_entry(self, name, parent, is_folder, data_size=0):
+        """Append a file or folder and return its index.
+
+        See CompactStore.add_node.
+
+        @type self: CachedStore
+        @type name: str
+        @type parent: int
+        @type is_folder: bool
+        @type data_size: int
+        @rtype: int
+        """
+        index = self.add_node(name, parent, data_size)
+        if is_folder:
+            self.mtime.append(0)
+            self.folders.append(index)
+        else:
+            self.mtime.append(_FILE)
+        return index
+
+    def save(self, cache_path):
+        """Write this store to the file at <cache_path>.
+
+        The file is replaced at once, so a reader never sees half of it.
+
+        @type self: CachedStore
+        @type cache_path: str
+        @rtype: None
+        """
+        names = '\0'.join(self.names).encode('utf-8', 'surrogateescape')
+        path = self.path.encode('utf-8', 'surrogateescape')
+        header = _HEADER.pack(MAGIC, self.parent.itemsize, len(self),
+                              len(self.folders), len(names), len(path),
+                              int(self.one_file_system))
+
+        with open(cache_path + '.tmp', 'wb') as file:
+            file.write(header)
+            # The 8-byte arrays go first, so that every array is aligned.
+            for items in (self.data_size, self.mtime, self.parent,
+                          self.first_child, self.child_count, self.colour,
+                          self.name, self.folders):
+                file.write(items)
+            file.write(names)
+            file.write(path)
+        os.replace(cache_path + '.tmp', cache_path)
+
+    @staticmethod
+    def load(cache_path):
+        """Return the store saved in the file at <cache_path>, or None if
+        the file does not exist, was not written by this version, or is
+        truncated or otherwise damaged.
+
+        The arrays of the returned store are views of the file mapped into
+        memory, so its nodes cannot be added to; changing them does not
+        change the file.
+
+        @type cache_path: str
+        @rtype: CachedStore | None
+        """
+        try:
+            with open(cache_path, 'rb') as file:
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+        except (OSError, ValueError):
+            return None
+        try:
+            magic, item_size, nodes, folders, names, path, flags = \
+                _HEADER.unpack_from(data)
+        except struct.error:
+            return None
+        if magic != MAGIC or item_size != array('l').itemsize or \
+                min(nodes, folders, names, path) < 0:
+            return None
+        node_size = sum(array(typecode).itemsize
+                        for typecode in _NODE_ARRAYS)
+        if len(data) != _HEADER.size + nodes * node_size + \
+                folders * array(_FOLDER_ARRAY).itemsize + names + path:
+            return None
+
+        view = memoryview(data)
+        offset = _HEADER.size
+
+        def take(typecode, count):
+            nonlocal offset
+            size = count * array(typecode).itemsize
+            items = view[offset:offset + size].cast(typecode)
+            offset += size
+            return items
+
+        store = CachedStore('', bool(flags))
+        try:
+            (store.data_size, store.mtime, store.parent, store.first_child,
+             store.child_count, store.colour, store.name) = \
+                [take(typecode, nodes) for typecode in _NODE_ARRAYS]
+            store.folders = take(_FOLDER_ARRAY, folders)
+        except (TypeError, ValueError):
+            return None
+        store.names = bytes(view[offset:offset + names]).decode(
+            'utf-8', 'surrogateescape').split('\0')
+        offset += names
+        store.path = bytes(view[offset:offset + path]).decode(
+            'utf-8', 'surrogateescape')
+        store._name_index = None
+        return store
+
+    def is_current(self):
+        """Return True if no folder in this store was modified since it was
+        scanned.
+
+        @type self: CachedStore
+        @rtype: bool
+        """
+        paths = {0: self.path}
+        for index in self.folders:
+            if index != 0:
+                paths[index] = os.path.join(
+                    paths[self.parent[index]],
+                    self.names[self.name[index]])
+            if _mtime(paths[index]) != self.mtime[index]:
+                return False
+        return True
+
+
+def scan_with_cache(path, cache_path, scan_filter=None):
+    """Return a CachedStore of the folder at <path>, reusing the scan saved
+    at <cache_path> and listing again only the folders that changed since.
+
+    The files and folders are chosen by <scan_filter>, or by a new
+    ScanFilter if it is None; only the entries of the folders listed again
+    are counted in its skipped counts. A cache saved with another
+    one_file_system setting is not reused.
+
+    The cache file is created or updated if anything changed.
+
+    Precondition: <path> is a valid path to a folder.
+
+    @type path: str
+    @type cache_path: str
+    @type scan_filter: ScanFilter | None
+    @rtype: CachedStore
+    """
+    if scan_filter is None:
+        scan_filter = ScanFilter()
+    cached = CachedStore.load(cache_path)
+    if cached is not None and (
+            cached.path != path or
+            cached.one_file_system != scan_filter.one_file_system):
+        cached = None
+    if cached is not None and cached.is_current():
+        return cached
+
+    store = _rescan(path, cached, scan_filter)
+    store.save(cache_path)
+    return store
+
+
+def _rescan(path, cached, scan_filter):
+    """Return a new CachedStore of the folder at <path>, listed through
+    <scan_filter>.
+
+    Every folder whose modification time is the same as in <cached> is
+    copied from it, except for the folders inside it that <scan_filter>
+    skips; every other folder is listed.
+
+    @type path: str
+    @type cached: CachedStore | None
+    @type scan_filter: ScanFilter
+    @rtype: CachedStore
+    """
+    scan_filter.start(path)
+    store = CachedStore(path, scan_filter.one_file_system)
+    root = store.add_entry(os.path.basename(path), -1, True)
+
+    # Each item is (index in store, path, index in cached or None,
+    # modification time or None if it was not read yet).
+    folders = deque([(root, path, 0 if cached is not None else None,
+                      None)])
+    while folders:
+        index, folder, old, mtime = folders.popleft()
+        if mtime is None:
+            mtime = _mtime(folder)
+        store.mtime[index] = mtime
+
+        if old is not None and cached.mtime[old] == mtime:
+            first = cached.first_child[old]
+            for child in range(first, first + cached.child_count[old]):
+                name = cached.names[cached.name[child]]
+                if cached.mtime[child] == _FILE:
+                    new = store.add_entry(name, index, False,
+                                          cached.data_size[child])
+                else:
+                    # Check the folder as if its parent was listed again.
+                    child_path = os.path.join(folder, name)
+                    try:
+                        stat = os.lstat(child_path)
+                    except OSError:
+                        stat = None
+                    if stat is not None and \
+                            not scan_filter.check_folder(stat):
+                        continue
+                    new = store.add_entry(name, index, True)
+                    folders.append((new, child_path, child,
+                                    stat.st_mtime_ns if stat else 0))
+                store.colour[new] = cached.colour[child]
+        else:
+            # Folders that were already cached may still be unchanged.
+            known = {}
+            if old is not None:
+                first = cached.first_child[old]
+                for child in range(first, first + cached.child_count[old]):
+                    if cached.mtime[child] != _FILE:
+                        known[cached.names[cached.name[child]]] = child
+            for name, entry_path, is_folder, size in scan_folder(
+                    folder, scan_filter):
+                if is_folder:
+                    folders.append((store.add_entry(name, index, True),
+                                    entry_path, known.get(name), None))
+                else:
+                    store.add_entry(name, index, False, size)
+
+    store.sum_sizes()
+    return store
+
+
+def _mtime(path):
+    """Return the modification time of <path> in nanoseconds, or 0 if it
+    cannot be read.
+
+    @type path: str
+    @rtype: int
+    """
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
@@ -0,0 +1,86 @@
+"""Tests for archive_tree.
+
+The tree of an archive must hold every file of the archive at its path,
+with its uncompressed size or, for zip archives, the size of its
+compressed data.
+"""
+import tarfile
+import zipfile
+
+import pytest
+
+from archive_tree import read_archive
+
+
+# The files of the archives, by path, with their contents. The contents
+# are repeated so that they compress well.
+FILES = {'readme.txt': b'hello\n' * 200,
+         'src/main.py': b'print("treemap")\n' * 300,
+         'src/lib/util.py': b'x = 1\n' * 1000,
+         'data/empty.bin': b'\0' * 4096}
+
+
+def _files(tree):
+    """Return the size of every leaf of <tree>, by path inside the
+    archive.
+
+    @type tree: ArchiveTree
+    @rtype: dict[str, int]
+    """
+    result = {}
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node._subtrees:
+            stack.extend(node._subtrees)
+        else:
+            result[node.get_separator().split('/', 1)[1]] = node.data_size
+    return result
+
+
+def _write_files(tmp_path):
+    """Write FILES in the folder 'files' of <tmp_path>, and return it.
+
+    @type tmp_path: pathlib.Path
+    @rtype: pathlib.Path
+    """
+    folder = tmp_path / 'files'
+    for name, data in FILES.items():
+        (folder / name).parent.mkdir(parents=True, exist_ok=True)
+        (folder / name).write_bytes(data)
+    return folder
+
+
+@pytest.mark.parametrize('mode, suffix', [('w', '.tar'),
+                                          ('w:gz', '.tar.gz')])
+@pytest.mark.parametrize('compressed', [False, True])
+def test_tar(tmp_path, mode, suffix, compressed):
+    """The files of a tar archive have their uncompressed size, even when
+    the compressed sizes are asked for.
+    """
+    folder = _write_files(tmp_path)
+    path = str(tmp_path / ('archive' + suffix))
+    with tarfile.open(path, mode) as archive:
+        for name in sorted(FILES):
+            archive.add(str(folder / name), name)
+    tree = read_archive(path, compressed)
+    assert tree._root == 'archive' + suffix
+    assert _files(tree) == {name: len(data) for name, data in FILES.items()}
+
+
+@pytest.mark.parametrize('compressed', [False, True])
+def test_zip(tmp_path, compressed):
+    """The files of a zip archive have their uncompressed size or the size
+    of their compressed data.
+    """
+    path = str(tmp_path / 'archive.zip')
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in sorted(FILES.items()):
+            archive.writestr(name, data)
+    with zipfile.ZipFile(path) as archive:
+        expected = {info.filename: info.compress_size if compressed
+                    else info.file_size for info in archive.infolist()}
+    assert all(expected[name] < len(data) if compressed
+               else expected[name] == len(data)
+               for name, data in FILES.items())
+    assert _files(read_archive(path, compressed)) == expected
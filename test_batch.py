@@ -0,0 +1,103 @@
+"""Tests for tree_data.Batch.
+
+Once committed, a Batch must leave the trees exactly as if each change had
+been made directly, in the same order: the same sizes, the same deleted
+nodes, the same stale layouts and the same treemap.
+"""
+import random
+
+import pytest
+
+from benchmarks import RECT, random_tree
+from tree_data import Batch
+
+
+def _nodes(tree):
+    """Return every node of <tree>, in preorder.
+
+    @type tree: AbstractTree
+    @rtype: list[AbstractTree]
+    """
+    result = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        result.append(node)
+        stack.extend(reversed(node._subtrees))
+    return result
+
+
+def _attached(node, root):
+    """Return whether <node> is still in the tree <root>, i.e., whether
+    neither it nor any of its ancestors was deleted.
+
+    @type node: AbstractTree
+    @type root: AbstractTree
+    @rtype: bool
+    """
+    while node._parent_tree is not None:
+        node = node._parent_tree
+    return node is root
+
+
+def _rects(tree):
+    """Return the rectangles of the treemap of <tree>.
+
+    @type tree: AbstractTree
+    @rtype: list[(int, int, int, int)]
+    """
+    return [rect for rect, _ in tree.generate_treemap(RECT)]
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_batch_matches_direct_changes(seed):
+    """A random sequence of changes, made directly and through a Batch."""
+    direct = random_tree(300, seed=seed)
+    batched = random_tree(300, seed=seed)
+    direct.generate_treemap(RECT)
+    batched.generate_treemap(RECT)
+    direct_nodes = _nodes(direct)
+    batched_nodes = _nodes(batched)
+
+    rng = random.Random(seed)
+    with Batch() as batch:
+        for _ in range(rng.randint(1, 120)):
+            i = rng.randrange(1, len(direct_nodes))
+            node, other = direct_nodes[i], batched_nodes[i]
+            if not _attached(node, direct):
+                continue
+            # Like the visualiser, only leaves are resized, and never below
+            # 1, so that every folder can still be laid out.
+            choice = rng.random()
+            if choice < 0.4:
+                node.delete()
+                batch.delete(other)
+            elif node._subtrees:
+                continue
+            elif choice < 0.8:
+                proportion = rng.uniform(-0.6, 0.6)
+                node.change_prop(proportion)
+                batch.change_prop(other, proportion)
+            else:
+                size_change = rng.randint(max(-5, 1 - node.data_size), 50)
+                node.update_size(size_change)
+                batch.update_size(other, size_change)
+
+    for node, other in zip(direct_nodes, batched_nodes):
+        assert node.data_size == other.data_size
+        assert node._root == other._root
+        assert (node._parent_tree is None) == (other._parent_tree is None)
+        assert node._layout_dirty == other._layout_dirty
+    assert _rects(direct) == _rects(batched)
+
+
+def test_batch_defers_ancestor_sizes():
+    """The ancestors are only updated once the Batch is committed."""
+    tree = random_tree(50, seed=0)
+    leaf = [node for node in _nodes(tree) if not node._subtrees][0]
+    size = tree.data_size
+    batch = Batch()
+    batch.update_size(leaf, 10)
+    assert tree.data_size == size
+    batch.commit()
+    assert tree.data_size == size + 10
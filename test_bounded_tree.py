@@ -0,0 +1,93 @@
+"""Tests for bounded_tree.
+
+A BoundedFileSystemTree must hold the same files as the FileSystemTree of
+the same folder when its limit is not reached, and otherwise keep at most
+that many subtrees per folder without losing any size, however many levels
+of folders are kept open.
+"""
+import os
+
+import pytest
+
+from benchmarks import make_directory_fixture
+import bounded_tree
+from bounded_tree import AggregateTree, BoundedFileSystemTree
+from tree_data import FileSystemTree
+
+
+@pytest.fixture(scope='module')
+def folder(tmp_path_factory):
+    """A generated folder, a few levels deep."""
+    path = tmp_path_factory.mktemp('bounded')
+    make_directory_fixture(str(path), 1500, files_per_folder=6,
+                           folders_per_folder=5)
+    return str(path)
+
+
+def _nodes(tree):
+    """Return every node of <tree>, in preorder.
+
+    @type tree: AbstractTree
+    @rtype: list[AbstractTree]
+    """
+    result = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        result.append(node)
+        stack.extend(reversed(node._subtrees))
+    return result
+
+
+def _leaves(tree):
+    """Return the size of every leaf of <tree>, by path.
+
+    @type tree: AbstractTree
+    @rtype: dict[str, int]
+    """
+    return {node.get_separator(): node.data_size for node in _nodes(tree)
+            if not node._subtrees}
+
+
+def test_limit_not_reached(folder):
+    """With a limit above the size of every folder, nothing is folded."""
+    assert _leaves(BoundedFileSystemTree(folder, 100)) == \
+        _leaves(FileSystemTree(folder))
+
+
+@pytest.mark.parametrize('limit', [1, 3])
+def test_limit(folder, limit):
+    """Each folder keeps at most <limit> subtrees and one AggregateTree,
+    and the sizes and numbers of files add up.
+    """
+    expected = FileSystemTree(folder)
+    tree = BoundedFileSystemTree(folder, limit)
+    assert tree.data_size == expected.data_size
+    files = 0
+    for node in _nodes(tree):
+        assert len(node._subtrees) <= limit + 1
+        assert len([subtree for subtree in node._subtrees
+                    if isinstance(subtree, AggregateTree)]) <= 1
+        if isinstance(node, AggregateTree):
+            files += node.count
+        elif node._root.endswith('.dat'):
+            files += 1
+    assert files == sum(len(names) for _, _, names in os.walk(folder))
+
+
+@pytest.mark.parametrize('limit', [1, 3, 100])
+def test_open_limit(folder, monkeypatch, limit):
+    """Folders listed at once below OPEN_LIMIT give the same tree, and only
+    they hold the names of their folders.
+    """
+    expected = _leaves(BoundedFileSystemTree(folder, limit))
+    depths = []
+    list_all = bounded_tree._Folder.list_all
+
+    def record(self):
+        depths.append(os.path.relpath(self.path, folder).count(os.sep) + 1)
+        list_all(self)
+    monkeypatch.setattr(bounded_tree._Folder, 'list_all', record)
+    monkeypatch.setattr(bounded_tree, 'OPEN_LIMIT', 2)
+    assert _leaves(BoundedFileSystemTree(folder, limit)) == expected
+    assert depths and min(depths) >= 2
@@ -0,0 +1,99 @@
+"""Tests for compact_tree.
+
+A compact tree must lay out the same treemap as the FileSystemTree of the
+same folder, find the same leaves, and only keep the views still in use.
+"""
+import gc
+import os
+
+import pytest
+
+from benchmarks import RECT, make_directory_fixture
+from compact_tree import compact_file_system_tree
+from layout_engine import slice_and_dice, squarified
+from tree_data import FileSystemTree, ZoomView
+import tree_data
+
+
+@pytest.fixture
+def trees(tmp_path):
+    """The FileSystemTree and the compact tree of a generated folder."""
+    make_directory_fixture(str(tmp_path), 500)
+    return (FileSystemTree(str(tmp_path)),
+            compact_file_system_tree(str(tmp_path)))
+
+
+def _rects(tree, min_area=0):
+    """Return the rectangles of the treemap of <tree> in RECT.
+
+    @type tree: AbstractTree
+    @type min_area: int
+    @rtype: list[(int, int, int, int)]
+    """
+    return [rect for rect, _ in tree.generate_treemap(RECT, min_area)]
+
+
+def _path(tree):
+    """Return the path of <tree> inside the folder scanned.
+
+    @type tree: AbstractTree
+    @rtype: str
+    """
+    return tree.get_separator().split(os.sep, 1)[1]
+
+
+@pytest.mark.parametrize('engine', [slice_and_dice, squarified])
+@pytest.mark.parametrize('min_area', [0, 50])
+def test_same_treemap(trees, engine, min_area):
+    """The same rectangles as the FileSystemTree."""
+    previous = tree_data.get_layout_engine()
+    tree_data.set_layout_engine(engine)
+    try:
+        assert _rects(trees[1], min_area) == _rects(trees[0], min_area)
+    finally:
+        tree_data.set_layout_engine(previous)
+
+
+def test_same_treemap_after_changes(trees):
+    """The same leaves and rectangles once a leaf was deleted and another
+    resized."""
+    tree, compact = trees
+    _rects(compact)
+    leaf = tree.leaf_at((500, 300), RECT)
+    other = compact.leaf_at((500, 300), RECT)
+    assert _path(other) == _path(leaf)
+    leaf.delete()
+    other.delete()
+    leaf = tree.leaf_at((10, 10), RECT)
+    other = compact.leaf_at((10, 10), RECT)
+    assert _path(other) == _path(leaf)
+    leaf.change_prop(0.5)
+    other.change_prop(0.5)
+    # The views of the changed leaves are no longer needed.
+    del leaf, other
+    gc.collect()
+    assert _rects(compact) == _rects(tree)
+
+
+def test_views_not_kept(trees):
+    """Laying out and looking up leaves only keeps the views in use."""
+    compact = trees[1]
+    compact.generate_treemap(RECT)
+    leaf = compact.leaf_at((500, 300), RECT)
+    assert compact.leaf_at((500, 300), RECT) is leaf
+    gc.collect()
+    assert len(compact._store._views) == 2
+
+
+def test_zoom_view_views_not_kept(trees):
+    """A ZoomView of a compact tree finds the same leaves as the
+    FileSystemTree, and only keeps the views in use.
+    """
+    tree, compact = trees
+    view = ZoomView(compact)
+    assert _rects(view) == _rects(tree)
+    leaf = view.leaf_at((500, 300), RECT)
+    assert _path(leaf) == _path(tree.leaf_at((500, 300), RECT))
+    assert _path(view.region_at((500, 300), RECT)[0]) == _path(leaf)
+    gc.collect()
+    assert len(compact._store._views) == 2
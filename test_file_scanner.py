@@ -0,0 +1,91 @@
+"""Tests for file_scanner.
+
+A scan must count each file once however many hard links lead to it,
+follow symbolic links to files but not to folders, and stay on one file
+system when asked to.
+"""
+import os
+
+import pytest
+
+from file_scanner import ScanFilter, scan, scan_folder
+
+
+def _sizes(path, scan_filter):
+    """Return the size of every file found by a scan of <path> through
+    <scan_filter>, by path relative to <path>.
+
+    @type path: pathlib.Path
+    @type scan_filter: ScanFilter
+    @rtype: dict[str, int]
+    """
+    return {os.path.relpath(entry_path, str(path)): size
+            for entries in scan(str(path), 1, scan_filter).values()
+            for _, entry_path, is_folder, size in entries if not is_folder}
+
+
+def test_hard_link_counted_once(tmp_path):
+    """Only one of the paths to a file with two hard links is counted."""
+    (tmp_path / 'a').mkdir()
+    (tmp_path / 'a' / 'file').write_bytes(b'x' * 100)
+    (tmp_path / 'b').mkdir()
+    os.link(str(tmp_path / 'a' / 'file'), str(tmp_path / 'b' / 'file'))
+    scan_filter = ScanFilter()
+    sizes = _sizes(tmp_path, scan_filter)
+    assert list(sizes.values()) == [100]
+    assert scan_filter.hard_links == 1
+
+
+def test_folder_symlink_not_followed(tmp_path):
+    """A symbolic link to a folder is skipped, not descended into."""
+    (tmp_path / 'folder').mkdir()
+    (tmp_path / 'folder' / 'file').write_bytes(b'x' * 100)
+    os.symlink(str(tmp_path / 'folder'), str(tmp_path / 'link'))
+    scan_filter = ScanFilter()
+    found = scan(str(tmp_path), 1, scan_filter)
+    assert [name for name, _, _, _ in found[str(tmp_path)]] == ['folder']
+    assert _sizes(tmp_path, ScanFilter()) == {
+        os.path.join('folder', 'file'): 100}
+    assert scan_filter.symlinks == 1
+
+
+def test_file_symlink_followed(tmp_path):
+    """A symbolic link to a file counts as a file of the size of its
+    target, and a broken one as an empty file.
+    """
+    (tmp_path / 'file').write_bytes(b'x' * 100)
+    os.symlink(str(tmp_path / 'file'), str(tmp_path / 'link'))
+    os.symlink(str(tmp_path / 'missing'), str(tmp_path / 'broken'))
+    scan_filter = ScanFilter()
+    assert _sizes(tmp_path, scan_filter) == {
+        'file': 100, 'link': 100, 'broken': 0}
+    assert scan_filter.symlinks == 0
+
+
+@pytest.mark.parametrize('one_file_system', [False, True])
+def test_one_file_system(tmp_path, one_file_system):
+    """A folder on another device is only skipped with one_file_system."""
+    (tmp_path / 'folder').mkdir()
+    scan_filter = ScanFilter(one_file_system)
+    scan_filter.start(str(tmp_path))
+    stat = list(os.stat(str(tmp_path / 'folder')))
+    stat[2] += 1
+    assert scan_filter.check_folder(os.stat_result(stat)) != one_file_system
+    assert scan_filter.mounts == int(one_file_system)
+
+
+def test_one_file_system_mounts():
+    """The file systems mounted in the root folder, if any, are skipped."""
+    device = os.stat('/').st_dev
+    mounts = {name for name in os.listdir('/')
+              if os.path.isdir(os.path.join('/', name)) and
+              not os.path.islink(os.path.join('/', name)) and
+              os.stat(os.path.join('/', name)).st_dev != device}
+    if not mounts:
+        pytest.skip('no file system mounted in the root folder')
+    scan_filter = ScanFilter(one_file_system=True)
+    scan_filter.start('/')
+    names = {name for name, _, is_folder, _ in scan_folder('/', scan_filter)
+             if is_folder}
+    assert not names & mounts
+    assert scan_filter.mounts == len(mounts)
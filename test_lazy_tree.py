@@ -0,0 +1,107 @@
+"""Tests for lazy_tree.
+
+Once a Prefetcher has listed every folder, a LazyFileSystemTree must hold
+the same files and folders as the FileSystemTree of the same folder,
+however many threads listed it, and each folder must be listed once.
+"""
+from collections import Counter
+import os
+import time
+
+import pytest
+
+from benchmarks import make_directory_fixture
+import lazy_tree
+from lazy_tree import LazyFileSystemTree, Prefetcher
+from tree_data import FileSystemTree
+
+
+RECT = (0, 0, 800, 600)
+
+
+class _SlowSet(set):
+    """A set that lets the other threads run after it is searched, so that
+    threads checking it at about the same time race.
+    """
+    def __contains__(self, item):
+        """Return whether <item> is in this set.
+
+        @type self: _SlowSet
+        @type item: object
+        @rtype: bool
+        """
+        found = set.__contains__(self, item)
+        time.sleep(0.02)
+        return found
+
+
+def _leaves(tree):
+    """Return the size of every leaf of <tree>, by path.
+
+    @type tree: AbstractTree
+    @rtype: dict[str, int]
+    """
+    result = {}
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node._subtrees:
+            stack.extend(node._subtrees)
+        else:
+            result[node.get_separator()] = node.data_size
+    return result
+
+
+def _prefetch(tree, prefetcher):
+    """Update <prefetcher> until every folder of <tree> is expanded.
+
+    @type tree: LazyFileSystemTree
+    @type prefetcher: Prefetcher
+    @rtype: None
+    """
+    deadline = time.monotonic() + 60
+    while prefetcher.progress() or tree.is_deferred():
+        assert time.monotonic() < deadline
+        prefetcher.update(RECT)
+        time.sleep(0.001)
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_prefetched_tree_is_complete(tmp_path, workers):
+    """The tree holds every file once every folder is listed."""
+    make_directory_fixture(str(tmp_path), 2000, files_per_folder=5)
+    tree = LazyFileSystemTree(str(tmp_path), depth=0)
+    _prefetch(tree, Prefetcher(tree, workers))
+
+    expected = FileSystemTree(str(tmp_path))
+    assert _leaves(tree) == _leaves(expected)
+    assert tree.data_size == expected.data_size
+
+
+def test_folder_requested_again_listed_once(tmp_path, monkeypatch):
+    """A folder requested again with a higher priority while it is being
+    checked by another thread is still listed by only one of them.
+    """
+    for name in ('a', 'b'):
+        (tmp_path / name).mkdir()
+        make_directory_fixture(str(tmp_path / name), 20, files_per_folder=5)
+    scanned = Counter()
+    original = lazy_tree.scan_folder
+
+    def scan_folder(path, scan_filter):
+        scanned[path] += 1
+        return original(path, scan_filter)
+    monkeypatch.setattr(lazy_tree, 'scan_folder', scan_folder)
+    monkeypatch.setattr(lazy_tree, 'set', _SlowSet, raising=False)
+
+    tree = LazyFileSystemTree(str(tmp_path), depth=1)
+    prefetcher = Prefetcher(tree, workers=8)
+    # The first two threads are checking a and b while these are requested
+    # again and taken by two other threads.
+    for subtree in tree._subtrees:
+        prefetcher.request(subtree, 1)
+    _prefetch(tree, prefetcher)
+
+    assert max(scanned.values()) == 1
+    assert scanned[os.path.join(str(tmp_path), 'a')] == 1
+    assert _leaves(tree) == _leaves(FileSystemTree(str(tmp_path)))
@@ -0,0 +1,118 @@
+"""Tests for leaf_index.LeafIndex.
+
+A rectangle covers exactly the pixels pygame fills for it: its left and
+top edges, but not its right and bottom ones. A point on an edge shared by
+two rectangles therefore belongs to the rectangle on its right or below,
+a point on the outer right or bottom border belongs to none, and a
+rectangle with no width or height is never found.
+"""
+import random
+
+import pytest
+
+from benchmarks import RECT, random_tree
+from leaf_index import LeafIndex
+
+
+def _find(layout, pos):
+    """Return the item of the first rectangle of <layout> that contains
+    <pos>, by checking each one.
+
+    @type layout: list[((int, int, int, int), object)]
+    @type pos: (int, int)
+    @rtype: object | None
+    """
+    px, py = pos
+    for (x, y, w, h), item in layout:
+        if x <= px < x + w and y <= py < y + h:
+            return item
+    return None
+
+
+def test_shared_vertical_edge():
+    """A point on an edge between two rectangles side by side belongs to
+    the one on the right.
+    """
+    index = LeafIndex((0, 0, 100, 50), [((0, 0, 40, 50), 'left'),
+                                        ((40, 0, 60, 50), 'right')])
+    assert index.leaf_at((39, 0)) == 'left'
+    assert index.leaf_at((40, 0)) == 'right'
+    assert index.leaf_at((40, 49)) == 'right'
+
+
+def test_shared_horizontal_edge():
+    """A point on an edge between two stacked rectangles belongs to the one
+    below.
+    """
+    index = LeafIndex((0, 0, 50, 100), [((0, 0, 50, 30), 'top'),
+                                        ((0, 30, 50, 70), 'bottom')])
+    assert index.leaf_at((0, 29)) == 'top'
+    assert index.leaf_at((0, 30)) == 'bottom'
+    assert index.leaf_at((49, 30)) == 'bottom'
+
+
+def test_shared_corner():
+    """A point on the corner shared by four rectangles belongs to the one
+    below and on the right.
+    """
+    index = LeafIndex((0, 0, 20, 20), [((0, 0, 10, 10), 'a'),
+                                       ((10, 0, 10, 10), 'b'),
+                                       ((0, 10, 10, 10), 'c'),
+                                       ((10, 10, 10, 10), 'd')])
+    assert index.leaf_at((9, 9)) == 'a'
+    assert index.leaf_at((10, 10)) == 'd'
+
+
+@pytest.mark.parametrize('rect', [(0, 0, 100, 60), (25, 40, 100, 60)])
+def test_outer_border(rect):
+    """The right and bottom borders of the treemap are outside of it, while
+    its top and left ones are inside.
+    """
+    x, y, w, h = rect
+    index = LeafIndex(rect, [(rect, 'all')])
+    assert index.leaf_at((x, y)) == 'all'
+    assert index.leaf_at((x + w - 1, y + h - 1)) == 'all'
+    assert index.leaf_at((x + w, y)) is None
+    assert index.leaf_at((x, y + h)) is None
+    assert index.leaf_at((x + w, y + h)) is None
+    assert index.leaf_at((x - 1, y)) is None
+    assert index.leaf_at((x, y - 1)) is None
+
+
+def test_zero_area():
+    """Rectangles with no width or no height are never found, even on the
+    edges of the rectangles around them.
+    """
+    layout = [((0, 0, 40, 50), 'left'), ((40, 0, 0, 50), 'no width'),
+              ((40, 0, 60, 0), 'no height'), ((40, 0, 60, 50), 'right'),
+              ((100, 0, 0, 0), 'nothing')]
+    index = LeafIndex((0, 0, 100, 50), layout)
+    assert index.leaf_at((40, 0)) == 'right'
+    assert index.leaf_at((39, 0)) == 'left'
+    assert index.leaf_at((99, 49)) == 'right'
+    assert index.leaf_at((100, 0)) is None
+
+
+def test_only_zero_area():
+    """A treemap whose rectangles all have no area has no leaves."""
+    index = LeafIndex((0, 0, 10, 10), [((0, 0, 0, 10), 'a'),
+                                       ((0, 0, 10, 0), 'b')])
+    assert index.leaf_at((0, 0)) is None
+    assert index.leaf_at((5, 5)) is None
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_edges_of_treemap(seed):
+    """On the edges of every rectangle of a treemap, the index finds the
+    same leaf as checking each rectangle, and so does leaf_at.
+    """
+    tree = random_tree(300, seed=seed)
+    layout = tree._generate_layout(RECT)
+    index = LeafIndex(RECT, layout)
+    rng = random.Random(seed)
+    for (x, y, w, h), _ in rng.sample(layout, 50):
+        for px in (x - 1, x, x + w - 1, x + w):
+            for py in (y - 1, y, y + h - 1, y + h):
+                expected = _find(layout, (px, py))
+                assert index.leaf_at((px, py)) is expected
+                assert tree.leaf_at((px, py), RECT) is expected
@@ -0,0 +1,70 @@
+"""Tests for numpy_layout.
+
+generate_treemap_arrays must give the same rectangles and colours as
+AbstractTree.generate_treemap, in the same order, so that the treemap drawn
+from the arrays is the same pixel for pixel, including after leaves were
+deleted or resized and in degenerate rectangles.
+"""
+import random
+
+import pytest
+
+from benchmarks import random_tree
+
+np = pytest.importorskip('numpy')
+from numpy_layout import FlatTree, generate_treemap_arrays  # noqa: E402
+
+
+RECTS = [(0, 0, 1024, 738), (3, 9, 40, 300), (0, 0, 1, 1), (5, 5, 0, 10)]
+
+
+def _leaves(tree):
+    """Return the leaves of <tree>.
+
+    @type tree: AbstractTree
+    @rtype: list[AbstractTree]
+    """
+    if not tree._subtrees:
+        return [tree]
+    return [leaf for subtree in tree._subtrees for leaf in _leaves(subtree)]
+
+
+def _as_treemap(rects, colours):
+    """Return the arrays returned by generate_treemap_arrays as the list
+    returned by generate_treemap.
+
+    @type rects: numpy.ndarray
+    @type colours: numpy.ndarray
+    @rtype: list[((int, int, int, int), (int, int, int))]
+    """
+    return list(zip(map(tuple, rects.tolist()), map(tuple, colours.tolist())))
+
+
+@pytest.mark.parametrize('seed', range(100))
+def test_arrays_match_generate_treemap(seed):
+    """A random tree with random deletions and resizes."""
+    rng = random.Random(seed)
+    tree = random_tree(rng.randint(1, 400), seed=seed)
+    leaves = _leaves(tree)
+    for _ in range(rng.randint(0, len(leaves))):
+        leaf = rng.choice(leaves)
+        if leaf._parent_tree is None:
+            continue
+        if rng.random() < 0.5:
+            leaf.delete()
+        else:
+            leaf.change_prop(rng.uniform(-0.9, 0.9))
+    rect = rng.choice(RECTS)
+    assert _as_treemap(*generate_treemap_arrays(tree, rect)) == \
+        tree.generate_treemap(rect)
+
+
+def test_refresh_sizes_after_change():
+    """A FlatTree laid out again after a leaf was resized."""
+    tree = random_tree(500, seed=1)
+    flat = FlatTree(tree)
+    flat.layout(RECTS[0])
+    _leaves(tree)[7].change_prop(0.5)
+    flat.refresh_sizes()
+    rects, colours, _ = flat.layout(RECTS[0])
+    assert _as_treemap(rects, colours) == tree.generate_treemap(RECTS[0])
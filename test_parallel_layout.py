@@ -0,0 +1,79 @@
+"""Tests for parallel_layout.ParallelLayout.
+
+The treemap laid out by a pool of processes must be the same as the one
+generate_treemap lays out serially, with either layout engine, for trees of
+every shape and with or without a minimum area.
+"""
+import pytest
+
+from benchmarks import RECT, deep_tree, random_tree, wide_tree, zipf_tree
+from layout_engine import slice_and_dice, squarified
+from parallel_layout import ParallelLayout
+import tree_data
+
+
+def _leaves(tree):
+    """Yield the leaves of <tree>.
+
+    @type tree: AbstractTree
+    @rtype: Iterator[AbstractTree]
+    """
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node._subtrees:
+            stack.extend(reversed(node._subtrees))
+        else:
+            yield node
+
+
+@pytest.fixture(scope='module')
+def pool():
+    """A ParallelLayout that sends even small subtrees to its workers."""
+    with ParallelLayout(workers=2, threshold=200) as layout:
+        yield layout
+
+
+@pytest.mark.parametrize('engine', [slice_and_dice, squarified])
+@pytest.mark.parametrize('make_tree', [random_tree, deep_tree, wide_tree,
+                                       zipf_tree])
+@pytest.mark.parametrize('min_area', [0, 1, 50])
+def test_parallel_matches_serial(pool, engine, make_tree, min_area):
+    """The same treemap as generate_treemap."""
+    previous = tree_data.get_layout_engine()
+    tree_data.set_layout_engine(engine)
+    try:
+        tree = make_tree(5000)
+        assert pool.generate_treemap(tree, RECT, min_area) == \
+            tree.generate_treemap(RECT, min_area)
+    finally:
+        tree_data.set_layout_engine(previous)
+
+
+def test_parallel_after_deletion(pool):
+    """The same treemap once leaves were deleted since the last layout."""
+    tree = random_tree(5000, seed=3)
+    pool.generate_treemap(tree, RECT)
+    leaves = [leaf for _, leaf in zip(range(500), _leaves(tree))]
+    for leaf in leaves[::3]:
+        leaf.delete()
+    assert pool.generate_treemap(tree, RECT) == tree.generate_treemap(RECT)
+
+
+
+def test_parallel_deep_tree(pool):
+    """A tree deeper than the recursion limit."""
+    tree = deep_tree(3000, depth=3000)
+    assert pool.generate_treemap(tree, RECT) == tree.generate_treemap(RECT)
+
+
+def test_export_with_parallel_layout(pool, tmp_path):
+    """treemap_export gives the same SVG file with a ParallelLayout."""
+    pytest.importorskip('pygame')
+    import treemap_export
+    tree = random_tree(5000, seed=5)
+    serial = tmp_path / 'serial.svg'
+    parallel = tmp_path / 'parallel.svg'
+    treemap_export.save_svg(tree, str(serial), RECT[2:])
+    treemap_export.save_svg(tree, str(parallel), RECT[2:], layout=pool)
+    assert parallel.read_text() == serial.read_text()
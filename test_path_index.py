@@ -0,0 +1,86 @@
+"""Tests for path_index.PathIndex.
+
+Every node's indexed path must be the one get_separator returns, and find
+must bring it back to the node, including for a folder scanned through a
+path ending with a separator, whose root has an empty name.
+"""
+import os
+
+from path_index import PathIndex
+from record_tree import load_records
+from tree_data import FileSystemTree
+
+
+def _make_folder(path):
+    """Create a small folder structure at <path>.
+
+    @type path: str
+    @rtype: None
+    """
+    for folder in ('a', os.path.join('a', 'b'), 'c'):
+        os.makedirs(os.path.join(path, folder))
+    for i, name in enumerate(('f.txt', os.path.join('a', 'g.txt'),
+                              os.path.join('a', 'b', 'h.txt'),
+                              os.path.join('c', 'i.txt'))):
+        with open(os.path.join(path, name), 'w') as file:
+            file.write('x' * (100 * (i + 1)))
+
+
+def _nodes(tree):
+    """Return every node of <tree>.
+
+    @type tree: AbstractTree
+    @rtype: list[AbstractTree]
+    """
+    result = [tree]
+    for subtree in tree._subtrees:
+        result.extend(_nodes(subtree))
+    return result
+
+
+def _check_paths(tree):
+    """Check that the PathIndex of <tree> agrees with get_separator.
+
+    @type tree: AbstractTree
+    @rtype: None
+    """
+    index = PathIndex(tree)
+    for node in _nodes(tree):
+        assert index.path_of(node) == node.get_separator()
+        assert index.find(node.get_separator()) is node
+
+
+def test_file_system_paths(tmp_path):
+    """Paths of a FileSystemTree."""
+    _make_folder(str(tmp_path))
+    _check_paths(FileSystemTree(str(tmp_path)))
+
+
+def test_file_system_paths_trailing_separator(tmp_path):
+    """Paths of a folder scanned through a path ending with a separator.
+    """
+    _make_folder(str(tmp_path))
+    tree = FileSystemTree(str(tmp_path) + os.sep)
+    assert tree._root == ''
+    _check_paths(tree)
+
+
+def test_record_paths():
+    """Paths of a RecordTree."""
+    tree = load_records([{'path': 'a/b/c', 'size': 1},
+                         {'path': 'a/d', 'size': 2},
+                         {'path': 'e', 'size': 3}],
+                        'size', path_fields=['path'], separator='/')
+    _check_paths(tree)
+
+
+def test_deleted_node_not_found(tmp_path):
+    """A deleted node is not found by its path any more."""
+    _make_folder(str(tmp_path))
+    tree = FileSystemTree(str(tmp_path))
+    index = PathIndex(tree)
+    leaf = [node for node in _nodes(tree) if node._root == 'g.txt'][0]
+    path = index.path_of(leaf)
+    assert index.find(path) is leaf
+    leaf.delete()
+    assert index.find(path) is None
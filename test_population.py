@@ -0,0 +1,101 @@
+"""Tests for population.
+
+A PopulationTree must be loaded from a folder of World Bank responses
+without any network access, be cached, and refuse a data source that is
+neither a folder nor an HTTP URL.
+"""
+import json
+
+import pytest
+
+import population
+from population import PopulationTree, set_data_source
+
+
+# The countries of the responses, with their region and population; a None
+# population is missing from the World Bank data.
+COUNTRIES = [('Canada', 'North America', 35540419),
+             ('United States', 'North America', 318907401),
+             ('France', 'Europe & Central Asia', 66316100),
+             ('Nowhere', 'Europe & Central Asia', None)]
+
+
+def _write_responses(folder):
+    """Write World Bank responses for COUNTRIES in <folder>, named as in
+    population.RESPONSE_FILES.
+
+    @type folder: pathlib.Path
+    @rtype: None
+    """
+    # The first 47 items of the populations are aggregates, not countries.
+    populations = [{'country': {'value': 'Aggregate {}'.format(i)},
+                    'value': '1000'} for i in range(47)]
+    populations.extend({'country': {'value': name},
+                        'value': None if size is None else str(size)}
+                       for name, _, size in COUNTRIES)
+    regions = [{'name': 'World', 'region': {'value': 'Aggregates'}}]
+    regions.extend({'name': name, 'region': {'value': region}}
+                   for name, region, _ in COUNTRIES)
+    responses = {population.POPULATIONS_QUERY: [{'page': 1}, populations],
+                 population.REGIONS_QUERY: [{'page': 1}, regions]}
+    for query, name in population.RESPONSE_FILES.items():
+        (folder / name).write_text(json.dumps(responses[query]))
+
+
+@pytest.fixture
+def responses(tmp_path):
+    """A folder of World Bank responses, used as the data source with a
+    cache in the same folder.
+    """
+    folder = tmp_path / 'responses'
+    folder.mkdir()
+    _write_responses(folder)
+    set_data_source(str(folder), str(tmp_path / 'population.marshal'))
+    yield folder
+    set_data_source()
+
+
+def _sizes(tree):
+    """Return the size of every region and country of <tree>, by path.
+
+    @type tree: PopulationTree
+    @rtype: dict[str, int]
+    """
+    result = {}
+    for region in tree._subtrees:
+        result[region.get_separator()] = region.data_size
+        for country in region._subtrees:
+            result[country.get_separator()] = country.data_size
+    return result
+
+
+def test_load_from_folder(responses):
+    """The tree holds every country with a population, by region."""
+    tree = PopulationTree(True)
+    assert _sizes(tree) == {
+        'World -- North America': 35540419 + 318907401,
+        'World -- North America -- Canada': 35540419,
+        'World -- North America -- United States': 318907401,
+        'World -- Europe & Central Asia': 66316100,
+        'World -- Europe & Central Asia -- France': 66316100}
+    assert tree.data_size == 35540419 + 318907401 + 66316100
+
+
+def test_load_from_cache(responses):
+    """Once loaded, the data is read from the cache until it is stale."""
+    expected = _sizes(PopulationTree(True))
+    for name in population.RESPONSE_FILES.values():
+        (responses / name).unlink()
+    assert _sizes(PopulationTree(True)) == expected
+
+
+@pytest.mark.parametrize('url', [False, True])
+def test_invalid_source(tmp_path, url):
+    """A source that is neither a folder nor an HTTP URL is refused."""
+    source = 'ftp://example.com' if url else str(tmp_path / 'missing')
+    set_data_source(source, None)
+    try:
+        with pytest.raises(ValueError):
+            PopulationTree(True)
+    finally:
+        set_data_source()
@@ -0,0 +1,55 @@
+"""Tests for scan_cache.
+
+A damaged cache file must be treated as missing, so that the folder is
+scanned again instead of raising.
+"""
+import os
+
+import pytest
+
+from benchmarks import make_directory_fixture
+from scan_cache import CachedStore, scan_with_cache
+
+
+@pytest.fixture
+def scanned(tmp_path):
+    """Return the path of a scanned folder, of its cache file, and the
+    contents of that file.
+    """
+    folder = str(tmp_path / 'folder')
+    os.mkdir(folder)
+    make_directory_fixture(folder, 200)
+    cache_path = str(tmp_path / 'scan.cache')
+    scan_with_cache(folder, cache_path)
+    with open(cache_path, 'rb') as file:
+        return folder, cache_path, file.read()
+
+
+def test_load(scanned):
+    """An intact cache file is loaded."""
+    folder, cache_path, _ = scanned
+    store = CachedStore.load(cache_path)
+    assert store is not None and store.path == folder
+
+
+@pytest.mark.parametrize('length', [0, 10, 60, 0.5, -1])
+def test_truncated(scanned, length):
+    """A truncated cache file is not loaded, and the folder is rescanned.
+    """
+    folder, cache_path, data = scanned
+    if isinstance(length, float):
+        length = int(len(data) * length)
+    with open(cache_path, 'wb') as file:
+        file.write(data[:length])
+    assert CachedStore.load(cache_path) is None
+    expected = scan_with_cache(folder, str(cache_path) + '.new')
+    assert scan_with_cache(folder, cache_path).node(0).data_size == \
+        expected.node(0).data_size
+
+
+def test_too_long(scanned):
+    """A cache file with extra bytes at the end is not loaded."""
+    _, cache_path, data = scanned
+    with open(cache_path, 'wb') as file:
+        file.write(data + b'\0')
+    assert CachedStore.load(cache_path) is None
@@ -0,0 +1,58 @@
+"""Tests for treemap_export.
+
+An exported treemap must have the same pixels as the treemap the
+visualiser draws for the same tree and size, whether it is drawn on one
+surface or in strips by several processes.
+"""
+import os
+
+import pytest
+
+from benchmarks import random_tree
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+pygame = pytest.importorskip('pygame')
+import treemap_export  # noqa: E402
+from treemap_visualiser import WIDTH, HEIGHT, TREEMAP_HEIGHT, \
+    render_display  # noqa: E402
+
+SIZE = (WIDTH, TREEMAP_HEIGHT)
+
+
+@pytest.fixture(scope='module')
+def tree():
+    """A tree with enough leaves to fill the treemap."""
+    return random_tree(5000, seed=2)
+
+
+@pytest.fixture(scope='module')
+def shown(tree):
+    """The pixels of the treemap of <tree> drawn by the visualiser."""
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    render_display(screen, tree, '')
+    pixels = pygame.image.tostring(screen.subsurface((0, 0) + SIZE), 'RGB')
+    pygame.quit()
+    return pixels
+
+
+def test_render_matches_visualiser(tree, shown):
+    """A treemap drawn on one surface."""
+    surface = treemap_export.render_treemap(tree, SIZE)
+    assert pygame.image.tostring(surface, 'RGB') == shown
+
+
+def test_png_matches_visualiser(tree, shown, tmp_path):
+    """A PNG file drawn on one surface."""
+    path = str(tmp_path / 'treemap.png')
+    treemap_export.save_png(tree, path, SIZE)
+    assert pygame.image.tostring(pygame.image.load(path), 'RGB') == shown
+
+
+def test_png_strips_match_visualiser(tree, shown, tmp_path, monkeypatch):
+    """A PNG file drawn in strips by several processes."""
+    monkeypatch.setattr(treemap_export, 'MAX_SURFACE_PIXELS', 1000)
+    monkeypatch.setattr(treemap_export, 'STRIP_HEIGHT', 100)
+    path = str(tmp_path / 'treemap.png')
+    treemap_export.save_png(tree, path, SIZE, workers=2)
+    assert pygame.image.tostring(pygame.image.load(path), 'RGB') == shown
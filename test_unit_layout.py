@@ -0,0 +1,35 @@
+"""Tests for unit_layout.UnitLayout.
+
+A UnitLayout must hold the same leaves as the treemap of its tree, in the
+same order, and lay out trees of any depth.
+"""
+import pytest
+
+from benchmarks import RECT, deep_tree, random_tree
+
+pytest.importorskip('numpy')
+from unit_layout import UnitLayout  # noqa: E402
+
+
+def _leaves(tree):
+    """Return the leaves of the treemap of <tree> in RECT, in order.
+
+    @type tree: AbstractTree
+    @rtype: list[AbstractTree]
+    """
+    return [leaf for _, leaf in tree._generate_layout(RECT)]
+
+
+def test_same_leaves_as_treemap():
+    """The leaves of generate_treemap, in the same order."""
+    tree = random_tree(2000, seed=4)
+    layout = UnitLayout(tree, RECT[2] / RECT[3])
+    assert layout.leaves == _leaves(tree)
+    assert len(layout.generate_treemap(RECT)) <= len(layout.leaves)
+
+
+def test_deep_tree():
+    """A tree deeper than the recursion limit."""
+    tree = deep_tree(3000, depth=3000)
+    layout = UnitLayout(tree, RECT[2] / RECT[3])
+    assert layout.leaves == _leaves(tree)
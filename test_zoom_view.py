@@ -0,0 +1,145 @@
+"""Tests for tree_data.ZoomView.
+
+A ZoomView must lay out and search its focus like the focus itself, move
+its focus one level at a time, keep only its last treemaps, and never
+return a treemap laid out before a tree changed size.
+"""
+import pytest
+
+from benchmarks import RECT, random_tree
+from tree_data import ZoomView
+
+
+@pytest.fixture
+def tree():
+    """A tree with a few levels."""
+    return random_tree(500, seed=3)
+
+
+def _deepest_leaf(tree):
+    """Return a leaf of <tree> with the most ancestors.
+
+    @type tree: AbstractTree
+    @rtype: AbstractTree
+    """
+    deepest, depth = tree, 0
+    stack = [(tree, 0)]
+    while stack:
+        node, node_depth = stack.pop()
+        if node_depth > depth:
+            deepest, depth = node, node_depth
+        stack.extend((subtree, node_depth + 1) for subtree in node._subtrees)
+    return deepest
+
+
+def _ancestors(tree):
+    """Return the ancestors of <tree>, starting with its root.
+
+    @type tree: AbstractTree
+    @rtype: list[AbstractTree]
+    """
+    result = []
+    while tree._parent_tree is not None:
+        tree = tree._parent_tree
+        result.append(tree)
+    result.reverse()
+    return result
+
+
+def _zoomed(tree):
+    """Return a ZoomView of <tree> focused on the parent of its deepest
+    leaf, and that leaf.
+
+    @type tree: AbstractTree
+    @rtype: (ZoomView, AbstractTree)
+    """
+    leaf = _deepest_leaf(tree)
+    view = ZoomView(tree)
+    while view.zoom_in(leaf):
+        pass
+    return view, leaf
+
+
+def test_zoom_in_and_out(tree):
+    """Zooming in goes down one level towards the tree, and zooming out
+    goes back up the same way.
+    """
+    leaf = _deepest_leaf(tree)
+    ancestors = _ancestors(leaf)
+    assert len(ancestors) > 2
+    view = ZoomView(tree)
+    for ancestor in ancestors[1:]:
+        assert view.zoom_in(leaf)
+        assert view.focus is ancestor
+    # The leaf itself cannot be focused on.
+    assert not view.zoom_in(leaf)
+    assert not view.zoom_in(tree)
+    for ancestor in reversed(ancestors[:-1]):
+        assert view.zoom_out()
+        assert view.focus is ancestor
+    assert not view.zoom_out()
+
+
+def test_zoomed_treemap(tree):
+    """The treemap and the leaves of a zoomed view are those of its
+    focus.
+    """
+    view, leaf = _zoomed(tree)
+    assert view.generate_treemap(RECT) == view.focus.generate_treemap(RECT)
+    for x in range(0, RECT[2], 37):
+        for y in range(0, RECT[3], 29):
+            assert view.leaf_at((x, y), RECT) is \
+                view.focus.leaf_at((x, y), RECT)
+
+
+def test_path_of(tree):
+    """Paths start at the focus."""
+    view, leaf = _zoomed(tree)
+    path = leaf.get_separator()
+    focus_path = view.focus.get_separator()
+    assert view.path_of(leaf) == \
+        str(view.focus._root) + path[len(focus_path):]
+    assert view.path_of(view.focus) == str(view.focus._root)
+    while view.zoom_out():
+        pass
+    assert view.path_of(leaf) == path
+
+
+def test_cache_size(tree):
+    """Only the last cache_size treemaps are kept, most recently used
+    last.
+    """
+    view = ZoomView(tree, cache_size=2)
+    rects = [(0, 0, 400, 300), (0, 0, 500, 300), (0, 0, 600, 300)]
+    first = view.generate_treemap(rects[0])
+    assert view.generate_treemap(rects[0]) is first
+    second = view.generate_treemap(rects[1])
+    # Using the first treemap again makes the second the least recently
+    # used, so it is evicted by the third.
+    assert view.generate_treemap(rects[0]) is first
+    view.generate_treemap(rects[2])
+    assert len(view._cache) == 2
+    assert view.generate_treemap(rects[0]) is first
+    assert view.generate_treemap(rects[1]) is not second
+    assert view.generate_treemap(rects[1]) == second
+
+
+@pytest.mark.parametrize('change', ['delete', 'change_prop'])
+def test_cache_invalidated(tree, change):
+    """Changing a leaf under a zoomed focus lays the focus out again."""
+    view, leaf = _zoomed(tree)
+    before = view.generate_treemap(RECT)
+    view.leaf_at((0, 0), RECT)
+    if change == 'delete':
+        leaf.delete()
+    else:
+        leaf.change_prop(0.5)
+    after = view.generate_treemap(RECT)
+    assert after is not before
+    assert after == view.focus.generate_treemap(RECT)
+    for x in range(0, RECT[2], 37):
+        for y in range(0, RECT[3], 29):
+            found = view.leaf_at((x, y), RECT)
+            assert found is view.focus.leaf_at((x, y), RECT)
+            if change == 'delete':
+                assert found is not leaf
@@ -4,10 +4,41 @@
 This module contains the basic tree interface required by the treemap
 visualiser.
 """
+from collections import OrderedDict
 import os
 from random import randint
 import math
 
+from file_scanner import SCAN_WORKERS, scan
+from layout_engine import slice_and_dice
+from leaf_index import LeafIndex
+from path_index import PathIndex
+
+
+# The LayoutTrace every treemap generated by generate_treemap is written to,
+# or None if layouts are not traced.
+_layout_trace = None
+
+# The layout engine used by generate_treemap and leaf_at; see
+# layout_engine.py.
+_layout_engine = slice_and_dice
+
+# The Profile the time spent in generate_treemap and leaf_at and the nodes
+# they visit are counted in, or None if they are not profiled.
+_profile = None
+
+# Incremented whenever a treemap laid out before may have changed, i.e.,
+# when the size of a tree or the layout engine changes.
+_layout_version = 0
+
+# The number of treemaps a ZoomView keeps, e.g., one per zoom level.
+ZOOM_CACHE_SIZE = 32
+
+# The number of levels of subtrees below the tree generate_treemap is
+# called on that keep their whole treemap, so that only the treemap of the
+# subtree at this depth containing a change has to be walked again.
+FLAT_LAYOUT_DEPTH = 2
+
 
 class AbstractTree:
     """A tree that is compatible with the treemap visualiser.
@@ -29,6 +60,24 @@ class AbstractTree:
     @type _parent_tree: AbstractTree | None
         The parent tree of this tree; i.e., the tree that contains this tree
         as a subtree, or None if this tree is not part of a larger tree.
+    @type _layout_rect: (int, int, int, int) | None
+        The rectangle this tree was last laid out in by generate_treemap.
+    @type _layout_engine: callable | None
+        The layout engine this tree was last laid out with.
+    @type _layout: list[(int, int, int, int)] | None
+        The cached rectangles of the subtrees of this tree in _layout_rect,
+        one per subtree.
+    @type _layout_dirty: bool
+        Whether the data_size of this tree or of one of its descendants
+        changed since _layout was computed, i.e., whether _layout is stale.
+    @type _treemap: ((int, int, int, int), int, callable, list) | None
+        The rectangle, min_area and layout engine of the cached treemap of
+        this tree, and that treemap, pairing each rectangle with its leaf;
+        it is stale if _layout_dirty is. Only the trees generate_treemap or
+        leaf_at is called on and their subtrees in the next
+        FLAT_LAYOUT_DEPTH levels keep one.
+    @type _leaf_index: LeafIndex | None
+        The spatial index used by leaf_at, built from _treemap.
 
     === Representation Invariants ===
     - data_size >= 0
@@ -44,6 +93,16 @@ class AbstractTree:
 
     - if _parent_tree is not empty, then self is in _parent_tree._subtrees
     """
+    # The string get_separator puts between the names of a tree and of its
+    # parent, used by path_index.PathIndex; subclasses should define it.
+    PATH_SEPARATOR = None
+
+    # Trees can have millions of nodes, so they don't get a __dict__.
+    # Subclasses should define __slots__ too.
+    __slots__ = ('_root', '_subtrees', '_parent_tree', 'colour',
+                 'data_size', '_layout_rect', '_layout_engine', '_layout',
+                 '_layout_dirty', '_treemap', '_leaf_index')
+
     def __init__(self, root, subtrees, data_size=0):
         """Initialize a new AbstractTree.
 
@@ -68,6 +127,12 @@ class AbstractTree:
         self._root = root
         self._subtrees = subtrees
         self._parent_tree = None
+        self._layout_rect = None
+        self._layout_engine = None
+        self._layout = None
+        self._layout_dirty = True
+        self._treemap = None
+        self._leaf_index = None
 
         # 1. Initialize self.colour and self.data_size,
         # according to the docstring.
@@ -87,7 +152,7 @@ class AbstractTree:
         """
         return self._root is None
 
-    def generate_treemap(self, rect):
+    def generate_treemap(self, rect, min_area=0):
         """Run the treemap algorithm on this tree and return the rectangles.
 
         Each returned tuple contains a pygame rectangle and a colour:
@@ -95,96 +160,184 @@ class AbstractTree:
 
         One tuple should be returned per non-empty leaf in this tree.
 
+        The rectangles are computed by the layout engine set with
+        set_layout_engine, slice-and-dice by default.
+
+        However, a subtree whose rectangle covers fewer than <min_area>
+        pixels is not laid out: one tuple with the rectangle and the colour
+        of the whole subtree is returned instead. This bounds the work done
+        by the size of the screen rather than by the size of the tree.
+
+        The rectangles of the subtrees of every internal node are cached,
+        so a subtree whose rectangle and size did not change since the
+        previous call is not laid out again, and the whole treemap is kept
+        until a tree changes size.
+
+        If a layout trace was set with set_layout_trace, the rectangles are
+        written to it. If a profile was set with set_profile, the time spent
+        and the nodes visited are counted in its 'layout' phase.
+
         @type self: AbstractTree
         @type rect: (int, int, int, int)
             Input is in the pygame format: (x, y, width, height)
+        @type min_area: int
         @rtype: list[((int, int, int, int), (int, int, int))]
         """
+        profile = _profile
+        if profile is not None:
+            profile.begin('layout')
+        layout = self._generate_layout(rect, min_area)
+        if _layout_trace is not None:
+            _layout_trace.write([leaf_rect for leaf_rect, _ in layout])
+        result = [(leaf_rect, leaf.colour) for leaf_rect, leaf in layout]
+        if profile is not None:
+            profile.end()
+        return result
+
+    def _generate_layout(self, rect, min_area=0):
+        """Return the (possibly cached) treemap of this tree in <rect>.
+
+        This is generate_treemap, except that each rectangle is paired with
+        its leaf (or with the subtree it aggregates) rather than with the
+        leaf's colour.
+
+        The returned list is kept in _treemap, so it must not be mutated.
+
+        @type self: AbstractTree
+        @type rect: (int, int, int, int)
+        @type min_area: int
+        @rtype: list[((int, int, int, int), AbstractTree)]
+        """
+        return self._flat_layout(rect, min_area, FLAT_LAYOUT_DEPTH)
+
+    def _flat_layout(self, rect, min_area, depth):
+        """Return the (possibly cached) treemap of this tree in <rect>,
+        keeping it in _treemap, and likewise for its subtrees in the next
+        <depth> levels.
+
+        Deeper subtrees are walked by _collect_layout, so a change in size
+        only makes the treemap of one subtree at that depth to be walked
+        again, while the memory used by these treemaps is at most about
+        <depth> + 1 times the number of leaves.
+
+        @type self: AbstractTree
+        @type rect: (int, int, int, int)
+        @type min_area: int
+        @type depth: int
+        @rtype: list[((int, int, int, int), AbstractTree)]
+        """
+        if _profile is not None:
+            _profile.visit()
+        subtrees = self._subtrees
         if self.data_size == 0:
             return []
-        elif len(self._subtrees) == 0:
-            return [(rect, self.colour)]
-
-        # The "tuple unpacking assignment" is used to easily extract
-        # coordinates of a rectangle:
-        # x, y, width, height = rect
-        x, y, w, h = rect
+        elif len(subtrees) == 0 or rect[2] * rect[3] < min_area:
+            return [(rect, self)]
+        treemap = self._treemap
+        if not self._layout_dirty and treemap is not None and \
+                treemap[0] == rect and treemap[1] == min_area and \
+                treemap[2] is _layout_engine:
+            return treemap[3]
+
+        rects = self._subtree_rects(rect)
         result = []
-
-        # These 2 variables ensure that the last subtree
-        # fills the rest of the rectangle, since (x, y) may not be
-        # the origin (0, 0).
-        # NOTE: Due to rounding of <local_w> or <local_h>, the
-        #       proportion of the last rectangle may not be truly
-        #       correct.
-        ini_x = x
-        ini_y = y
-
-        # If deletion occured, a tree may be empty.
-        # So, <last_tree> is used to keep track of the last tree with
-        # data_size > 0: (AbstractTree, int, int) -- (tree, index, x or y)
-        last_tree = (None, 0, 0)
-
-        for i in range(len(self._subtrees)):
-            subtree = self._subtrees[i]
-
-            # If width > height, form vertical rectangles;
-            # only width should vary.
-            if w > h:
-                if i < len(self._subtrees) - 1:
-                    local_w = int(subtree.data_size / self.data_size * w)
-                else:
-                    local_w = w - x + ini_x
-                sub_treemap = subtree.generate_treemap((x, y, local_w, h))
-                result.extend(sub_treemap)
-                if sub_treemap:
-                    last_tree = (subtree, len(sub_treemap), x)
-
-                # If the last tree in _subtrees was empty,
-                # this block of code stretches the last valid tree.
-                if i == len(self._subtrees) - 1:
-                    x = last_tree[2]
-                    result = result[:-last_tree[1]]
-                    local_w = w - x + ini_x
-                    sub_treemap = last_tree[0].generate_treemap((x, y,
-                                                                 local_w, h))
-                    result.extend(sub_treemap)
-
-                x += local_w
-
-            # If width <= height, form horizontal rectangles;
-            # only height should vary.
+        for subtree, subtree_rect in zip(subtrees, rects):
+            if depth > 0:
+                result.extend(subtree._flat_layout(subtree_rect, min_area,
+                                                   depth - 1))
             else:
-                if i < len(self._subtrees) - 1:
-                    local_h = int(subtree.data_size / self.data_size * h)
-                else:
-                    local_h = h - y + ini_y
-                sub_treemap = subtree.generate_treemap((x, y, w, local_h))
-                result.extend(sub_treemap)
-                if sub_treemap:
-                    last_tree = (subtree, len(sub_treemap), y)
-
-                # If the last tree in _subtrees was empty,
-                # this block of code stretches the last valid tree.
-                if i == len(self._subtrees) - 1:
-                    y = last_tree[2]
-                    result = result[:-last_tree[1]]
-                    local_h = h - y + ini_y
-                    sub_treemap = last_tree[0].generate_treemap((x, y,
-                                                                 w, local_h))
-                    result.extend(sub_treemap)
-
-                y += local_h
-
-        s = ''
-        for i in result:
-            s += str(i[0]) + '\n'
-        file = open('testingmaterial.txt', 'w')
-        file.write(s)
-        file.close()
-
+                subtree._collect_layout(subtree_rect, min_area, result)
+        self._treemap = (rect, min_area, _layout_engine, result)
         return result
 
+    def _subtree_rects(self, rect):
+        """Return the (possibly cached) rectangles of the subtrees of this
+        tree in <rect>, one per subtree.
+
+        When they are laid out again, the treemap kept in _treemap, which
+        may be stale, is dropped.
+
+        @type self: AbstractTree
+        @type rect: (int, int, int, int)
+        @rtype: list[(int, int, int, int)]
+        """
+        if self._layout_dirty or self._layout_rect != rect or \
+                self._layout_engine is not _layout_engine:
+            sizes = [subtree.data_size for subtree in self._subtrees]
+            self._layout = _layout_engine(rect, sizes, self.data_size)
+            self._layout_rect = rect
+            self._layout_engine = _layout_engine
+            self._layout_dirty = False
+            self._treemap = None
+        return self._layout
+
+    def _collect_layout(self, rect, min_area, result):
+        """Append the treemap of this tree in <rect> to <result>, pairing
+        each rectangle with its leaf, like _generate_layout, but without
+        keeping it.
+
+        Only the rectangles of the subtrees of each internal node are
+        cached, so the memory used grows with the number of nodes, not with
+        the number of leaves times the depth of the tree. Treemaps kept by
+        subtrees are reused.
+
+        @type self: AbstractTree
+        @type rect: (int, int, int, int)
+        @type min_area: int
+        @type result: list[((int, int, int, int), AbstractTree)]
+        @rtype: None
+        """
+        profile = _profile
+        stack = [(self, rect)]
+        while stack:
+            tree, rect = stack.pop()
+            if profile is not None:
+                profile.visit()
+            subtrees = tree._subtrees
+            if tree.data_size == 0:
+                continue
+            elif len(subtrees) == 0 or rect[2] * rect[3] < min_area:
+                result.append((rect, tree))
+                continue
+            treemap = tree._treemap
+            if not tree._layout_dirty and treemap is not None and \
+                    treemap[0] == rect and treemap[1] == min_area and \
+                    treemap[2] is _layout_engine:
+                result.extend(treemap[3])
+                continue
+            # The subtrees are pushed last first, so they are popped in
+            # order.
+            stack.extend(zip(reversed(subtrees),
+                             reversed(tree._subtree_rects(rect))))
+
+    def _zoom_layout(self, rect, min_area):
+        """Return the treemap of this tree in <rect> as ZoomView caches
+        it: the (rectangle, item) pairs its LeafIndex is built from, where
+        _tree_of(item) is the leaf, and the (rectangle, colour) pairs
+        returned by generate_treemap.
+
+        Subclasses that do not keep a Python object per node can override
+        this and _tree_of, so that ZoomView does not create them.
+
+        @type self: AbstractTree
+        @type rect: (int, int, int, int)
+        @type min_area: int
+        @rtype: (list[((int, int, int, int), object)],
+                 list[((int, int, int, int), (int, int, int))])
+        """
+        layout = self._generate_layout(rect, min_area)
+        return layout, [(leaf_rect, leaf.colour) for leaf_rect, leaf in layout]
+
+    def _tree_of(self, item):
+        """Return the leaf paired with <item> in the first list returned by
+        _zoom_layout.
+
+        @type self: AbstractTree
+        @type item: object
+        @rtype: AbstractTree
+        """
+        return item
+
     def get_separator(self):
         """Return the string used to separate nodes in the string
         representation of a path from the tree root to a leaf.
@@ -200,20 +353,28 @@ class AbstractTree:
         """
         raise NotImplementedError
 
-    def leaf_at(self, pos, rect):
+    def leaf_at(self, pos, rect, min_area=0):
         """Return the leaf at the given position
 
         Used by treemap visualiser to return the leaf at
         the cursor's position.
 
-        The algorithm resembles generate_treemap in order to
-        determine which rectangle is the leaf according to <pos>.
-        * -- this asterisk indicates that the block of code is explained
-             in generate_treemap
+        The leaf is looked up in a spatial index of the treemap of this
+        tree in <rect>, which is only rebuilt when that treemap changes.
+        A leaf is at <pos> if its rectangle, as filled by pygame, contains
+        <pos>; return None if there is no such leaf.
+
+        If the treemap was generated with <min_area>, the position may be in
+        the rectangle of a whole subtree, which is then returned; use
+        region_at to tell such subtrees apart from leaves.
+
+        If a profile was set with set_profile, the time spent and the nodes
+        visited are counted in its 'leaf_at' phase.
 
         @type self: AbstractTree
         @type pos: (int, int)
         @type rect: (int, int, int, int)
+        @type min_area: int
         @rtype: AbstractTree | None
 
         >>> fst = FileSystemTree('my-data')
@@ -221,65 +382,32 @@ class AbstractTree:
         >>> leaf.data_size
         8308
         """
-        x, y, w, h = rect
-
-        if self.data_size == 0:
-            return None
-        elif len(self._subtrees) == 0:
-            if x <= pos[0] <= x + w and y <= pos[1] <= y + h:
-                return self
-            else:
-                return None
-
-        # *
-        ini_x = x
-        ini_y = y
-
-        # If deletion occured, a tree may be empty.
-        # So, <last_tree> is used to keep track of the last rectangle
-        # displayed: (AbstractTree, int, int) -- (tree, x, y)
-        last_tree = (None, 0, 0)
-        result = None
-
-        for i in range(len(self._subtrees)):
-            if result:  # Exit this loop if a leaf is found.
-                return result
-            subtree = self._subtrees[i]
-
-            # *
-            if w > h:
-                local_w = int(subtree.data_size / self.data_size * w)
-                if subtree.data_size > 0:
-                    last_tree = (subtree, x, y)
-                    result = subtree.leaf_at(pos, (x, y, local_w, h))
-
-                # If the last tree in _subtrees was empty,
-                # this block of code stretches the last valid tree
-                # checks the position again of this tree.
-                if i == len(self._subtrees) - 1:
-                    local_w = w - last_tree[1] + ini_x
-                    result = last_tree[0].leaf_at(pos,
-                                                  (last_tree[1], last_tree[2],
-                                                   local_w, h))
-                x += local_w
-            # *
-            else:
-                local_h = int(subtree.data_size / self.data_size * h)
-                if subtree.data_size > 0:
-                    last_tree = (subtree, x, y)
-                    result = subtree.leaf_at(pos, (x, y, w, local_h))
-
-                # If the last tree in _subtrees was empty,
-                # this block of code stretches the last valid tree
-                # checks the position again of this tree.
-                if i == len(self._subtrees) - 1:
-                    local_h = h - last_tree[2] + ini_y
-                    result = last_tree[0].leaf_at(pos,
-                                                  (last_tree[1], last_tree[2],
-                                                   w, local_h))
-                y += local_h
+        profile = _profile
+        if profile is not None:
+            profile.begin('leaf_at')
+        layout = self._generate_layout(rect, min_area)
+        if self._leaf_index is None or self._leaf_index.layout is not layout:
+            self._leaf_index = LeafIndex(rect, layout)
+        leaf = self._leaf_index.leaf_at(pos)
+        if profile is not None:
+            profile.end()
+        return leaf
+
+    def region_at(self, pos, rect, min_area=0):
+        """Return the tree drawn at the given position, and whether it is a
+        subtree aggregated into one rectangle by generate_treemap because its
+        rectangle covers fewer than <min_area> pixels.
+
+        Return (None, False) if there is nothing at <pos>.
 
-        return result
+        @type self: AbstractTree
+        @type pos: (int, int)
+        @type rect: (int, int, int, int)
+        @type min_area: int
+        @rtype: (AbstractTree | None, bool)
+        """
+        tree = self.leaf_at(pos, rect, min_area)
+        return tree, tree is not None and len(tree._subtrees) > 0
 
     def delete(self):
         """Remove this tree from its parent by making <self> an empty tree.
@@ -308,7 +436,8 @@ class AbstractTree:
     def update_size(self, size_change):
         """Update this tree's data size according to <size_change> parameter.
 
-        This also affects its ancestors if any.
+        This also affects its ancestors if any, whose cached layouts are
+        marked as stale. Nothing happens if <size_change> is 0.
 
         @type self: AbstractTree
         @type size_change: int
@@ -325,10 +454,29 @@ class AbstractTree:
         >>> leaf.data_size
         6408
         """
+        global _layout_version
+        if size_change == 0:
+            return
+        _layout_version += 1
         self.data_size += size_change
+        self._layout_dirty = True
         if self._parent_tree:
             self._parent_tree.update_size(size_change)
 
+    def _invalidate_layouts(self):
+        """Mark the cached layouts of this tree and of its ancestors as
+        stale, e.g., because its subtrees changed without changing its size.
+
+        @type self: AbstractTree
+        @rtype: None
+        """
+        global _layout_version
+        _layout_version += 1
+        tree = self
+        while tree is not None:
+            tree._layout_dirty = True
+            tree = tree._parent_tree
+
     def change_prop(self, proportion):
         """Change this tree's data size depending on the given proportion.
 
@@ -348,6 +496,15 @@ class AbstractTree:
         >>> leaf.data_size
         6231
         """
+        self.update_size(self._prop_change(proportion))
+
+    def _prop_change(self, proportion):
+        """Return the change in data size made by change_prop(proportion).
+
+        @type self: AbstractTree
+        @type proportion: float
+        @rtype: int
+        """
         if proportion >= 0:  # increase size
             size_change = math.ceil(self.data_size * proportion)
         else:  # decrease size
@@ -356,7 +513,7 @@ class AbstractTree:
         if self.data_size + size_change < 1:
             size_change = self.data_size - 1
 
-        self.update_size(size_change)
+        return size_change
 
 
 class FileSystemTree(AbstractTree):
@@ -370,29 +527,81 @@ class FileSystemTree(AbstractTree):
 
     The data_size attribute for regular files as simply the size of the file,
     as reported by os.path.getsize.
+
+    Symbolic links to folders are not followed, and a file or folder
+    reached through several paths (hard links, bind mounts) is counted only
+    once. A symbolic link to a file counts as a file of the size of its
+    target.
     """
-    def __init__(self, path):
+    PATH_SEPARATOR = os.sep
+    __slots__ = ()
+
+    def __init__(self, path, workers=SCAN_WORKERS, scan_filter=None):
         """Store the file tree structure contained in the given file or folder.
 
+        The folders are listed by file_scanner.scan, using up to <workers>
+        threads at once. The files and folders listed are chosen by
+        <scan_filter>, or by a new one if it is None, which counts those it
+        skips; see file_scanner.ScanFilter.
+
         Precondition: <path> is a valid path for this computer.
 
         @type self: FileSystemTree
         @type path: str
+        @type workers: int
+        @type scan_filter: ScanFilter | None
         @rtype: None
         """
         if os.path.isdir(path):  # if the path is a folder
-            entries = os.listdir(path)
-            tree_list = []
-
-            # Form a FileSystemTree for each entry in this folder
-            for entry in entries:
-                tree_list.append(FileSystemTree(os.path.join(path, entry)))
-            AbstractTree.__init__(self, os.path.basename(path), tree_list)
+            listing = scan(path, workers, scan_filter)
+
+            # Form the subtrees of each folder after those of the folders
+            # inside it; every folder comes after its parent in <listing>,
+            # so they are formed in the reverse order.
+            subtrees = {}
+            for folder in reversed(list(listing)):
+                tree_list = []
+                for name, entry_path, is_folder, size in listing[folder]:
+                    if is_folder:
+                        tree_list.append(FileSystemTree._folder(
+                            name, subtrees.pop(entry_path)))
+                    else:
+                        tree_list.append(FileSystemTree._leaf(name, size))
+                subtrees[folder] = tree_list
+            AbstractTree.__init__(self, os.path.basename(path),
+                                  subtrees[path])
 
         else:  # if the path is a file
             AbstractTree.__init__(self, os.path.basename(path),
                                   [], os.path.getsize(path))
 
+    @classmethod
+    def _leaf(cls, name, size):
+        """Return a new FileSystemTree for a file, without accessing it.
+
+        @type cls: type
+        @type name: str
+        @type size: int
+        @rtype: FileSystemTree
+        """
+        tree = cls.__new__(cls)
+        AbstractTree.__init__(tree, name, [], size)
+        return tree
+
+    @classmethod
+    def _folder(cls, name, subtrees):
+        """Return a new FileSystemTree for a folder containing <subtrees>,
+        without accessing it.
+
+        @type cls: type
+        @type name: str
+        @type subtrees: list[FileSystemTree]
+        @rtype: FileSystemTree
+        """
+        tree = cls.__new__(cls)
+        AbstractTree.__init__(tree, name, subtrees)
+        return tree
+
     def get_separator(self):
         """Return the string used to separate nodes in the string
         representation of a path from the tree root to a leaf.
@@ -409,3 +618,433 @@ class FileSystemTree(AbstractTree):
         else:
             result = os.path.join(self._parent_tree.get_separator(), self._root)
         return result
+
+
+class Batch:
+    """A set of changes to trees whose sizes are propagated all at once.
+
+    Calling update_size, change_prop or delete on a tree updates every
+    ancestor, one call at a time. The same methods of a Batch change the
+    given tree at once, but only add its change in size to the total
+    pending for its parent; commit then updates each ancestor of the changed
+    trees once, from the deepest up, and marks its layout as stale once.
+
+    Once committed, the trees are exactly as if each change had been made
+    directly, in the same order. Until then, the data_size of the ancestors
+    of the changed trees is not up to date; a change to a tree that has
+    subtrees commits the pending changes first, since its size depends on
+    them.
+
+    A Batch can be used as a context manager, which commits it on exit:
+
+        with Batch() as batch:
+            for leaf in leaves:
+                batch.delete(leaf)
+
+    === Private Attributes ===
+    @type _pending: dict[AbstractTree, int]
+        The change in size not yet added to each tree.
+    """
+    def __init__(self):
+        """Initialize a new empty Batch.
+
+        @type self: Batch
+        @rtype: None
+        """
+        self._pending = {}
+
+    def __enter__(self):
+        """Return this Batch.
+
+        @type self: Batch
+        @rtype: Batch
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Commit this Batch, even if an exception was raised, so that the
+        sizes of the trees stay consistent.
+
+        @type self: Batch
+        @rtype: None
+        """
+        self.commit()
+
+    def update_size(self, tree, size_change):
+        """Change the data_size of <tree> like tree.update_size(size_change).
+
+        @type self: Batch
+        @type tree: AbstractTree
+        @type size_change: int
+        @rtype: None
+        """
+        global _layout_version
+        if size_change == 0:
+            return
+        if tree._subtrees:
+            self.commit()
+        _layout_version += 1
+        tree.data_size += size_change
+        tree._layout_dirty = True
+        self._add(tree._parent_tree, size_change)
+
+    def change_prop(self, tree, proportion):
+        """Change the data_size of <tree> like tree.change_prop(proportion).
+
+        @type self: Batch
+        @type tree: AbstractTree
+        @type proportion: float
+        @rtype: None
+        """
+        if tree._subtrees:
+            self.commit()
+        self.update_size(tree, tree._prop_change(proportion))
+
+    def delete(self, tree):
+        """Remove <tree> from its parent like tree.delete().
+
+        @type self: Batch
+        @type tree: AbstractTree
+        @rtype: None
+        """
+        if tree._subtrees:
+            self.commit()
+        tree._root = None
+        self._add(tree._parent_tree, tree.data_size * -1)
+        tree._parent_tree = None
+        tree.data_size = 0
+
+    def commit(self):
+        """Add the pending changes in size to every tree they concern.
+
+        @type self: Batch
+        @rtype: None
+        """
+        global _layout_version
+        if not self._pending:
+            return
+        _layout_version += 1
+
+        # Group the trees by depth, so that each tree is updated after all
+        # of its descendants, once.
+        depths = {}
+        levels = {}
+        for tree in self._pending:
+            depth = _depth(tree, depths)
+            levels.setdefault(depth, []).append(tree)
+
+        pending = self._pending
+        for depth in range(max(levels), -1, -1):
+            for tree in levels.get(depth, []):
+                size_change = pending[tree]
+                tree.data_size += size_change
+                tree._layout_dirty = True
+                parent = tree._parent_tree
+                if parent is not None:
+                    if parent not in pending:
+                        pending[parent] = 0
+                        levels.setdefault(depth - 1, []).append(parent)
+                    pending[parent] += size_change
+        self._pending = {}
+
+    def _add(self, tree, size_change):
+        """Add <size_change> to the change pending for <tree>, if any.
+
+        @type self: Batch
+        @type tree: AbstractTree | None
+        @type size_change: int
+        @rtype: None
+        """
+        if tree is not None:
+            self._pending[tree] = self._pending.get(tree, 0) + size_change
+
+
+class ZoomView:
+    """A view of a tree that is zoomed into one of its subtrees.
+
+    Only the focused subtree is laid out, in the whole rectangle given to
+    generate_treemap, and leaf_at, region_at and path_of are relative to
+    it. zoom_in moves the focus one level down, towards a given tree, and
+    zoom_out moves it back up the same way.
+
+    The treemaps of the last ZOOM_CACHE_SIZE (focus, rectangle, min_area)
+    combinations are kept, together with their spatial index, until a tree
+    changes size or the layout engine changes, i.e., for one version of the
+    layouts. Moving back and forth between zoom levels then costs no layout
+    at all, whereas each tree only caches the rectangles of its subtrees in
+    its last rectangle.
+
+    === Public Attributes ===
+    @type root: AbstractTree
+        The tree this view shows.
+    @type focus: AbstractTree
+        The subtree of root that is laid out.
+    @type paths: PathIndex
+        The index of the paths of root.
+
+    === Private Attributes ===
+    @type _ancestors: list[AbstractTree]
+        The trees focused on before focus, starting with root.
+    @type _cache: OrderedDict
+        The cached treemaps, least recently used first, keyed by (focus,
+        rect, min_area). Each value is a list of the two treemaps returned
+        by focus._zoom_layout, and the LeafIndex of the first or None if
+        it was not built yet.
+    @type _cache_size: int
+        The number of treemaps kept in _cache.
+    @type _version: int
+        The _layout_version the treemaps in _cache were laid out in.
+    """
+    def __init__(self, root, cache_size=ZOOM_CACHE_SIZE):
+        """Initialize a new ZoomView of <root>, focused on <root>.
+
+        @type self: ZoomView
+        @type root: AbstractTree
+        @type cache_size: int
+        @rtype: None
+        """
+        self.root = root
+        self.focus = root
+        self.paths = PathIndex(root)
+        self._ancestors = []
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._version = _layout_version
+
+    def zoom_in(self, tree):
+        """Focus on the subtree of focus that contains <tree>, and return
+        whether the focus changed.
+
+        The focus does not change if <tree> is not a proper descendant of
+        focus, or if that subtree is a leaf.
+
+        @type self: ZoomView
+        @type tree: AbstractTree | None
+        @rtype: bool
+        """
+        while tree is not None and tree._parent_tree is not self.focus:
+            tree = tree._parent_tree
+        if tree is None or not tree._subtrees:
+            return False
+        self._ancestors.append(self.focus)
+        self.focus = tree
+        return True
+
+    def zoom_out(self):
+        """Focus back on the tree focused on before, and return whether the
+        focus changed.
+
+        @type self: ZoomView
+        @rtype: bool
+        """
+        if not self._ancestors:
+            return False
+        self.focus = self._ancestors.pop()
+        return True
+
+    def show(self, tree):
+        """Focus on <tree> if it has subtrees, or else on its parent, so
+        that it is drawn, and return whether the focus changed.
+
+        Zooming out then goes through every ancestor of the new focus. The
+        focus does not change if <tree> is not in root.
+
+        @type self: ZoomView
+        @type tree: AbstractTree
+        @rtype: bool
+        """
+        chain = []
+        node = tree if tree._subtrees else tree._parent_tree
+        while node is not None:
+            chain.append(node)
+            node = node._parent_tree
+        if not chain or chain[-1] is not self.root or \
+                chain[0] is self.focus:
+            return False
+        chain.reverse()
+        self.focus = chain.pop()
+        self._ancestors = chain
+        return True
+
+    def contains(self, tree):
+        """Return whether <tree> is focus or one of its descendants.
+
+        @type self: ZoomView
+        @type tree: AbstractTree
+        @rtype: bool
+        """
+        while tree is not None and tree is not self.focus:
+            tree = tree._parent_tree
+        return tree is not None
+
+    def path_of(self, tree):
+        """Return the path from focus to <tree>, a descendant of focus,
+        like the result of get_separator but starting at focus.
+
+        @type self: ZoomView
+        @type tree: AbstractTree
+        @rtype: str
+        """
+        path = self.paths.path_of(tree)
+        if self.focus._parent_tree is None:
+            return path
+        prefix = self.paths.path_of(self.focus)
+        return str(self.focus._root) + path[len(prefix):]
+
+    def generate_treemap(self, rect, min_area=0):
+        """Return the treemap of focus in <rect>, like
+        AbstractTree.generate_treemap.
+
+        @type self: ZoomView
+        @type rect: (int, int, int, int)
+        @type min_area: int
+        @rtype: list[((int, int, int, int), (int, int, int))]
+            The list is cached, so it must not be mutated.
+        """
+        profile = _profile
+        if profile is not None:
+            profile.begin('layout')
+        entry = self._entry(rect, min_area)
+        if _layout_trace is not None:
+            _layout_trace.write([leaf_rect for leaf_rect, _ in entry[1]])
+        if profile is not None:
+            profile.end()
+        return entry[1]
+
+    def leaf_at(self, pos, rect, min_area=0):
+        """Return the leaf of focus at the given position in the treemap
+        of focus in <rect>, like AbstractTree.leaf_at.
+
+        @type self: ZoomView
+        @type pos: (int, int)
+        @type rect: (int, int, int, int)
+        @type min_area: int
+        @rtype: AbstractTree | None
+        """
+        profile = _profile
+        if profile is not None:
+            profile.begin('leaf_at')
+        entry = self._entry(rect, min_area)
+        if entry[2] is None:
+            entry[2] = LeafIndex(rect, entry[0])
+        leaf = entry[2].leaf_at(pos)
+        if leaf is not None:
+            leaf = self.focus._tree_of(leaf)
+        if profile is not None:
+            profile.end()
+        return leaf
+
+    def region_at(self, pos, rect, min_area=0):
+        """Return the tree drawn at the given position in the treemap of
+        focus in <rect>, like AbstractTree.region_at.
+
+        @type self: ZoomView
+        @type pos: (int, int)
+        @type rect: (int, int, int, int)
+        @type min_area: int
+        @rtype: (AbstractTree | None, bool)
+        """
+        tree = self.leaf_at(pos, rect, min_area)
+        return tree, tree is not None and len(tree._subtrees) > 0
+
+    def _entry(self, rect, min_area):
+        """Return the cache entry of the treemap of focus in <rect>,
+        laying it out if it is not cached.
+
+        @type self: ZoomView
+        @type rect: (int, int, int, int)
+        @type min_area: int
+        @rtype: list
+        """
+        if self._version != _layout_version:
+            self._cache.clear()
+            self._version = _layout_version
+        key = (self.focus, rect, min_area)
+        entry = self._cache.get(key)
+        if entry is not None:
+            self._cache.move_to_end(key)
+            return entry
+
+        layout, treemap = self.focus._zoom_layout(rect, min_area)
+        entry = [layout, treemap, None]
+        self._cache[key] = entry
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return entry
+
+
+def _depth(tree, depths):
+    """Return the number of ancestors of <tree>.
+
+    @type tree: AbstractTree
+    @type depths: dict[AbstractTree, int]
+        The depth of the trees seen so far, which is updated.
+    @rtype: int
+    """
+    path = []
+    while tree is not None and tree not in depths:
+        path.append(tree)
+        tree = tree._parent_tree
+    depth = -1 if tree is None else depths[tree]
+    for tree in reversed(path):
+        depth += 1
+        depths[tree] = depth
+    return depth
+
+
+def layout_version():
+    """Return a number that changes whenever a treemap laid out before may
+    have changed, i.e., when the size of a tree or the layout engine
+    changes.
+
+    @rtype: int
+    """
+    return _layout_version
+
+
+def get_layout_engine():
+    """Return the layout engine used by every treemap; see
+    set_layout_engine.
+
+    @rtype: callable
+    """
+    return _layout_engine
+
+
+def set_layout_engine(engine):
+    """Use <engine> to lay out every treemap from now on.
+
+    This changes both the treemaps returned by AbstractTree.generate_treemap
+    and the leaves found by AbstractTree.leaf_at, so that they always agree.
+
+    @type engine: callable
+        One of the layout engines in layout_engine.py, e.g.,
+        layout_engine.squarified.
+    @rtype: None
+    """
+    global _layout_engine, _layout_version
+    _layout_engine = engine
+    _layout_version += 1
+
+
+def set_layout_trace(trace):
+    """Write every treemap generated by AbstractTree.generate_treemap to
+    <trace>, or stop tracing layouts if <trace> is None.
+
+    @type trace: LayoutTrace | None
+    @rtype: None
+    """
+    global _layout_trace
+    _layout_trace = trace
+
+
+def set_profile(profile):
+    """Count the time spent in AbstractTree.generate_treemap and
+    AbstractTree.leaf_at, and the nodes they visit, in <profile>, or stop
+    profiling them if <profile> is None.
+
+    @type profile: Profile | None
+    @rtype: None
+    """
+    global _profile
+    _profile = profile
@@ -0,0 +1,270 @@
+"""Treemap Export
+
+=== Module Description ===
+This module contains the code to draw treemaps without a display, e.g., to
+produce disk usage reports on a server, and save them as PNG or SVG files.
+
+Treemaps are drawn on an off-screen pygame surface exactly as the treemap
+visualiser draws them, so the pixels of a treemap of a given size are the
+same in both. Treemaps too large to hold in memory at once, such as
+16384 by 16384 pixels, are drawn in horizontal strips by a pool of
+processes, and written to the PNG file one strip at a time.
+
+The treemap of a very large tree can also be laid out by a pool of
+processes, with a parallel_layout.ParallelLayout; the result is the same.
+
+Run it directly to save the treemap of a folder, with --parallel to lay it
+out with a ParallelLayout:
+
+    python treemap_export.py [--parallel] <folder> <output .png or .svg>
+        [width height]
+"""
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import os
+import struct
+import sys
+import zlib
+
+import pygame
+from parallel_layout import ParallelLayout
+from tree_data import FileSystemTree
+from treemap_visualiser import WIDTH, TREEMAP_HEIGHT, MIN_RECT_AREA
+
+
+# Treemaps with more pixels than this are drawn in strips.
+MAX_SURFACE_PIXELS = 4096 * 4096
+
+# The height of each strip, in pixels.
+STRIP_HEIGHT = 1024
+
+
+def render_treemap(tree, size, min_area=MIN_RECT_AREA, layout=None):
+    """Return a new surface of the given size with the treemap of <tree>
+    drawn on it.
+
+    If <layout> is given, the treemap is laid out by its processes.
+
+    @type tree: AbstractTree
+    @type size: (int, int)
+    @type min_area: int
+    @type layout: ParallelLayout | None
+    @rtype: pygame.Surface
+    """
+    surface = pygame.Surface(size)
+    surface.fill(pygame.color.THECOLORS['black'])
+    for rect, colour in _generate_treemap(tree, (0, 0) + tuple(size),
+                                          min_area, layout):
+        surface.fill(colour, rect)
+    return surface
+
+
+def save_png(tree, path, size, min_area=MIN_RECT_AREA, workers=None,
+             layout=None):
+    """Save the treemap of <tree> with the given size as a PNG file at
+    <path>.
+
+    If the treemap has more than MAX_SURFACE_PIXELS pixels, it is drawn in
+    strips of STRIP_HEIGHT pixels by up to <workers> processes (by default,
+    one per CPU). If <layout> is given, the treemap is laid out by its
+    processes.
+
+    @type tree: AbstractTree
+    @type path: str
+    @type size: (int, int)
+    @type min_area: int
+    @type workers: int | None
+    @type layout: ParallelLayout | None
+    @rtype: None
+    """
+    width, height = size
+    if width * height <= MAX_SURFACE_PIXELS:
+        pygame.image.save(render_treemap(tree, size, min_area, layout), path)
+        return
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    strips = _split_strips(_generate_treemap(tree, (0, 0, width, height),
+                                             min_area, layout),
+                           height)
+    with open(path, 'wb') as file, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        file.write(b'\x89PNG\r\n\x1a\n')
+        _write_chunk(file, b'IHDR', struct.pack('>IIBBBBB', width, height,
+                                                8, 2, 0, 0, 0))
+        compressor = zlib.compressobj()
+
+        # Only a few strips are drawn ahead of the one being written, so
+        # memory use does not grow with the height of the treemap.
+        ahead = 2 * workers
+        pending = deque()
+        for top in range(0, height, STRIP_HEIGHT):
+            rects, colours = strips[top // STRIP_HEIGHT]
+            pending.append(pool.submit(
+                _render_strip, width, top, min(STRIP_HEIGHT, height - top),
+                rects, colours))
+            if len(pending) >= ahead:
+                _write_strip(file, compressor, pending.popleft().result(),
+                             width)
+        while pending:
+            _write_strip(file, compressor, pending.popleft().result(), width)
+
+        _write_chunk(file, b'IDAT', compressor.flush())
+        _write_chunk(file, b'IEND', b'')
+
+
+def save_svg(tree, path, size, min_area=MIN_RECT_AREA, layout=None):
+    """Save the treemap of <tree> with the given size as an SVG file at
+    <path>, with one rectangle per rectangle of the treemap.
+
+    If <layout> is given, the treemap is laid out by its processes.
+
+    @type tree: AbstractTree
+    @type path: str
+    @type size: (int, int)
+    @type min_area: int
+    @type layout: ParallelLayout | None
+    @rtype: None
+    """
+    width, height = size
+    with open(path, 'w', buffering=1 << 16) as file:
+        file.write('<svg xmlns="http://www.w3.org/2000/svg" width="{}" '
+                   'height="{}" shape-rendering="crispEdges">\n'
+                   '<rect width="100%" height="100%" fill="#000000"/>\n'
+                   .format(width, height))
+        file.writelines(
+            '<rect x="{}" y="{}" width="{}" height="{}" '
+            'fill="#{:02x}{:02x}{:02x}"/>\n'.format(x, y, w, h, r, g, b)
+            for (x, y, w, h), (r, g, b)
+            in _generate_treemap(tree, (0, 0, width, height), min_area,
+                                 layout)
+            if w > 0 and h > 0)
+        file.write('</svg>\n')
+
+
+def export_file_system(path, output, size=(WIDTH, TREEMAP_HEIGHT),
+                       parallel=False):
+    """Save the treemap of the given path's file structure at <output>, as
+    an SVG file if its name ends with '.svg' or as a PNG file otherwise.
+
+    If <parallel> is True, the treemap is laid out by a ParallelLayout with
+    one process per CPU, which only helps with several CPUs.
+
+    Precondition: <path> is a valid path to a file or folder.
+
+    @type path: str
+    @type output: str
+    @type size: (int, int)
+    @type parallel: bool
+    @rtype: None
+    """
+    tree = FileSystemTree(path)
+    layout = ParallelLayout() if parallel else None
+    try:
+        if output.lower().endswith('.svg'):
+            save_svg(tree, output, size, layout=layout)
+        else:
+            save_png(tree, output, size, layout=layout)
+    finally:
+        if layout is not None:
+            layout.close()
+
+
+def _generate_treemap(tree, rect, min_area, layout):
+    """Return the treemap of <tree> in <rect>, laid out by <layout> if it
+    is given.
+
+    @type tree: AbstractTree
+    @type rect: (int, int, int, int)
+    @type min_area: int
+    @type layout: ParallelLayout | None
+    @rtype: list[((int, int, int, int), (int, int, int))]
+    """
+    if layout is None:
+        return tree.generate_treemap(rect, min_area)
+    return layout.generate_treemap(tree, rect, min_area)
+
+
+def _split_strips(treemap, height):
+    """Return the rectangles and packed colours of <treemap> that overlap
+    each strip of STRIP_HEIGHT rows, as a pair of arrays per strip.
+
+    @type treemap: list[((int, int, int, int), (int, int, int))]
+    @type height: int
+    @rtype: list[(array, array)]
+    """
+    strips = [(array('l'), array('L'))
+              for _ in range(0, height, STRIP_HEIGHT)]
+    for (x, y, w, h), (r, g, b) in treemap:
+        if w <= 0 or h <= 0:
+            continue
+        colour = r << 16 | g << 8 | b
+        for strip in range(y // STRIP_HEIGHT,
+                           min((y + h - 1) // STRIP_HEIGHT + 1, len(strips))):
+            rects, colours = strips[strip]
+            rects.extend((x, y, w, h))
+            colours.append(colour)
+    return strips
+
+
+def _render_strip(width, top, height, rects, colours):
+    """Return the RGB pixels of the rows top to top + height - 1 of a
+    treemap with the given rectangles and packed colours.
+
+    @type width: int
+    @type top: int
+    @type height: int
+    @type rects: array
+    @type colours: array
+    @rtype: bytes
+    """
+    surface = pygame.Surface((width, height))
+    surface.fill(pygame.color.THECOLORS['black'])
+    for i, colour in enumerate(colours):
+        surface.fill((colour >> 16, colour >> 8 & 0xFF, colour & 0xFF),
+                     (rects[4 * i], rects[4 * i + 1] - top,
+                      rects[4 * i + 2], rects[4 * i + 3]))
+    return pygame.image.tostring(surface, 'RGB')
+
+
+def _write_strip(file, compressor, pixels, width):
+    """Compress the rows of RGB <pixels> into the PNG <file>.
+
+    @type file: io.BufferedWriter
+    @type compressor: zlib.Compress
+    @type pixels: bytes
+    @type width: int
+    @rtype: None
+    """
+    stride = 3 * width
+    # Each row starts with its filter type, 0 (none).
+    data = b''.join(b'\0' + pixels[i:i + stride]
+                    for i in range(0, len(pixels), stride))
+    compressed = compressor.compress(data)
+    if compressed:
+        _write_chunk(file, b'IDAT', compressed)
+
+
+def _write_chunk(file, kind, data):
+    """Write a PNG chunk of the given kind and data to <file>.
+
+    @type file: io.BufferedWriter
+    @type kind: bytes
+    @type data: bytes
+    @rtype: None
+    """
+    file.write(struct.pack('>I', len(data)))
+    file.write(kind)
+    file.write(data)
+    file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind))))
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != '--parallel']
+    parallel = len(args) < len(sys.argv) - 1
+    if len(args) == 4:
+        export_file_system(args[0], args[1], (int(args[2]), int(args[3])),
+                           parallel)
+    else:
+        export_file_system(args[0], args[1], parallel=parallel)
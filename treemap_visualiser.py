@@ -6,13 +6,48 @@ It is responsible for initializing an instance of AbstractTree (using a
 concrete subclass, of course), rendering it to the user using pygame,
 and detecting user events like mouse clicks and key presses and responding
 to them.
+
+The display is only redrawn when something changed: the event loop sleeps
+until an event arrives, handles every event waiting at that point before
+drawing once, and only the rectangles that differ from the previous frame
+are filled and sent to the screen.
+
+Clicking with the middle button or pressing Enter zooms into the subtree
+under the mouse, which is then laid out in the whole display; Backspace
+zooms back out.
+
+The window can be resized. While it is being resized, the treemap is
+drawn from a layout computed once in normalized coordinates (see
+unit_layout.py), and it is laid out again for the new size once the
+resizing stops.
+
+Pressing / starts a search: the name typed is looked up when Enter is
+pressed, and the first file or folder whose name contains it is selected
+and zoomed to. Escape cancels the search.
+
+Pressing P shows where the time of each frame goes in the text display: the
+milliseconds spent and nodes visited by each phase (see profiling.py) and
+the number of rectangles drawn out of those in the treemap.
 """
+from functools import lru_cache
+import os
+
 import pygame
-from tree_data import FileSystemTree
+from tree_data import FileSystemTree, ZoomView, layout_version, \
+    set_layout_engine, set_profile
+from layout_engine import slice_and_dice, squarified
 from population import PopulationTree
+from record_tree import load_file
+from archive_tree import read_archive
+from lazy_tree import LazyFileSystemTree, Prefetcher
+from bounded_tree import BoundedFileSystemTree
+from file_scanner import SCAN_WORKERS, ScanFilter
+from scan_cache import scan_with_cache
+from profiling import Profile
+from unit_layout import UnitLayout
 
 
-# Screen dimensions and coordinates
+# Screen dimensions and coordinates, when the window is opened
 ORIGIN = (0, 0)
 WIDTH = 1024
 HEIGHT = 768
@@ -23,67 +58,259 @@ TREEMAP_HEIGHT = HEIGHT - FONT_HEIGHT  # The height of the treemap display.
 # Font to use for the treemap program.
 FONT_FAMILY = 'Consolas'
 
+# Subtrees whose rectangle covers fewer pixels than this are drawn as a
+# single rectangle instead of being laid out. With 1, only subtrees that
+# cannot be seen anyway are merged.
+MIN_RECT_AREA = 1
+
+# The least number of milliseconds between two renders caused by changes
+# made in the background, e.g., by a scan that is still running.
+RENDER_INTERVAL = 250
+
+# If more rectangles than this changed since the last frame, the whole
+# display is updated at once, which is then faster than updating each one.
+DIRTY_LIMIT = 512
+
+# The key repeat delay and interval in milliseconds, so that holding the
+# Delete key keeps deleting leaves.
+KEY_REPEAT = (300, 50)
+
+# The layout engines the Tab key cycles through, starting with the first.
+LAYOUT_ENGINES = (slice_and_dice, squarified)
 
-def run_visualisation(tree):
+
+def run_visualisation(tree, updates=None, progress=None, profile=None):
     """Display an interactive graphical display of the given tree's treemap.
 
+    If <updates> is given, it is called repeatedly while waiting for events,
+    and the display is updated whenever it returns True; see event_loop.
+    If <progress> is given, the text it returns is shown in the text display.
+    If <profile> is given, the visualisation is profiled from the start.
+
     @type tree: AbstractTree
+    @type updates: (((int, int, int, int), AbstractTree) -> bool) | None
+    @type progress: (() -> str) | None
+    @type profile: Profile | None
     @rtype: None
     """
     # Setup pygame
     pygame.init()
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
-
-    # Render the initial display of the static treemap.
-    render_display(screen, tree, '')
+    pygame.key.set_repeat(*KEY_REPEAT)
+    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
 
     # Start an event loop to respond to events.
-    event_loop(screen, tree)
+    event_loop(screen, tree, updates, progress, profile)
+
+
+def render_display(screen, tree, text, arrays=None, previous=None,
+                   profile=None):
+    """Render a treemap and text display to the given screen, and return the
+    treemap that was drawn.
 
+    Use the constant FONT_HEIGHT to divide the screen vertically into the
+    treemap and text comments.
 
-def render_display(screen, tree, text):
-    """Render a treemap and text display to the given screen.
+    <tree> may also be a ZoomView, whose focused subtree is then drawn, or
+    a UnitLayout.
 
-    Use the constants TREEMAP_HEIGHT and FONT_HEIGHT to divide the
-    screen vertically into the treemap and text comments.
+    If <arrays> is given, it is the treemap of <tree> as the (rectangles,
+    colours) pair of arrays returned by numpy_layout.generate_treemap_arrays,
+    and it is drawn instead of running generate_treemap.
+
+    If <previous> is given, it is the treemap returned by the last call, and
+    is still on the screen: only the rectangles that changed since are
+    drawn and updated.
+
+    If <profile> is given, the time spent drawing is counted in its 'fill'
+    phase, and the frame is ended with the number of rectangles drawn.
 
     @type screen: pygame.Surface
-    @type tree: AbstractTree
+    @type tree: AbstractTree | ZoomView | UnitLayout
     @type text: str
         The text to render.
-    @rtype: None
+    @type arrays: (numpy.ndarray, numpy.ndarray) | None
+    @type previous: list[((int, int, int, int), (int, int, int))] | None
+    @type profile: Profile | None
+    @rtype: list[((int, int, int, int), (int, int, int))] | None
+        None if <arrays> was given.
     """
-    # First, clear the screen
-    pygame.draw.rect(screen, pygame.color.THECOLORS['black'],
-                     (0, 0, WIDTH, HEIGHT))
-    treemap = tree.generate_treemap((0, 0, WIDTH, TREEMAP_HEIGHT))
+    width, height = screen.get_size()
+    if arrays is not None:
+        if profile is not None:
+            profile.begin('fill')
+        pygame.draw.rect(screen, pygame.color.THECOLORS['black'],
+                         (0, 0, width, height))
+        # Converting the arrays to lists first is much faster than
+        # reading them one element at a time.
+        for rect, colour in zip(arrays[0].tolist(), arrays[1].tolist()):
+            screen.fill(colour, rect)
+        _render_text(screen, text)
+        pygame.display.flip()
+        if profile is not None:
+            profile.end()
+            profile.end_frame(len(arrays[1]), len(arrays[1]))
+        return None
+
+    treemap = tree.generate_treemap(_treemap_rect(screen), MIN_RECT_AREA)
+    if profile is not None:
+        profile.begin('fill')
+    if previous is None:
+        pygame.draw.rect(screen, pygame.color.THECOLORS['black'],
+                         (0, 0, width, height))
+        for rect, colour in treemap:
+            screen.fill(colour, rect)
+        _render_text(screen, text)
+        pygame.display.flip()
+        if profile is not None:
+            profile.end()
+            profile.end_frame(len(treemap), len(treemap))
+        return treemap
+
+    # Leaves are always laid out in the same order, so everything that
+    # changed lies between the longest common start and end of the two
+    # treemaps. Since their rectangles cover the same area and never
+    # overlap, clearing those that are gone cannot erase one that stays.
+    start = _common_length(previous, treemap)
+    end = _common_length(previous[start:][::-1], treemap[start:][::-1])
+    gone = previous[start:len(previous) - end]
+    added = treemap[start:len(treemap) - end]
+    black = pygame.color.THECOLORS['black']
+    for rect, _ in gone:
+        screen.fill(black, rect)
+    for rect, colour in added:
+        screen.fill(colour, rect)
+    text_rect = _render_text(screen, text)
+
+    if len(gone) + len(added) > DIRTY_LIMIT:
+        pygame.display.flip()
+    else:
+        pygame.display.update([rect for rect, _ in gone] +
+                              [rect for rect, _ in added] + [text_rect])
+    if profile is not None:
+        profile.end()
+        profile.end_frame(len(treemap), len(added))
+    return treemap
+
+
+def _treemap_rect(screen):
+    """Return the area of <screen> the treemap is drawn in, above the text
+    display.
+
+    @type screen: pygame.Surface
+    @rtype: (int, int, int, int)
+    """
+    width, height = screen.get_size()
+    return 0, 0, width, max(height - FONT_HEIGHT, 0)
 
-    for rect in treemap:
-        screen.fill(rect[1], rect[0])
 
-    _render_text(screen, text)
+def _unit_layout(tree, rect):
+    """Return the UnitLayout of <tree> with the shape of <rect>, or None if
+    NumPy is not installed.
 
-    # This must be called *after* all other pygame functions have run.
-    pygame.display.flip()
+    @type tree: AbstractTree
+    @type rect: (int, int, int, int)
+    @rtype: UnitLayout | None
+    """
+    try:
+        return UnitLayout(tree, max(rect[2], 1) / max(rect[3], 1))
+    except ImportError:
+        return None
+
+
+def _common_length(first, second):
+    """Return the length of the longest common prefix of two lists.
+
+    @type first: list
+    @type second: list
+    @rtype: int
+    """
+    # Comparing slices is much faster than comparing items one at a time,
+    # so find the first slice that differs before looking at its items.
+    step = 1024
+    length = 0
+    limit = min(len(first), len(second))
+    while length < limit and \
+            first[length:length + step] == second[length:length + step]:
+        length += step
+    length = min(length, limit)
+    while length < limit and first[length] == second[length]:
+        length += 1
+    return length
 
 
 def _render_text(screen, text):
-    """Render text at the bottom of the display.
+    """Render text at the bottom of the display, and return the area of the
+    screen it covers.
 
     @type screen: pygame.Surface
     @type text: str
-    @rtype: None
+    @rtype: (int, int, int, int)
     """
-    # The font we want to use
-    font = pygame.font.SysFont(FONT_FAMILY, FONT_HEIGHT - 8)
-    text_surface = font.render(text, 1, pygame.color.THECOLORS['white'])
+    width, height = screen.get_size()
+    text_rect = (0, height - FONT_HEIGHT, width, FONT_HEIGHT)
+    screen.fill(pygame.color.THECOLORS['black'], text_rect)
 
     # Where to render the text_surface
-    text_pos = (0, HEIGHT - FONT_HEIGHT + 4)
-    screen.blit(text_surface, text_pos)
+    text_pos = (0, height - FONT_HEIGHT + 4)
+    screen.blit(_text_surface(text), text_pos)
+    return text_rect
+
+
+@lru_cache(maxsize=1)
+def _font():
+    """Return the font used for the text display.
+
+    Looking up a system font is slow, so it is only done once.
+
+    @rtype: pygame.font.Font
+    """
+    return pygame.font.SysFont(FONT_FAMILY, FONT_HEIGHT - 8)
+
+
+@lru_cache(maxsize=64)
+def _text_surface(text):
+    """Return <text> rendered with the font of the text display.
+
+    @type text: str
+    @rtype: pygame.Surface
+    """
+    return _font().render(text, 1, pygame.color.THECOLORS['white'])
+
+
+def _status_text(view, leaf, progress, profile=None):
+    """Return the text to display when <leaf> is selected in <view>.
+
+    The path of <leaf> starts at the focus of <view>, which is shown
+    instead when no leaf is selected and the view is zoomed in.
 
+    If <profile> is given, the summary of its last frame comes first, and
+    the time spent building the text is counted in its 'text' phase.
 
-def event_loop(screen, tree):
+    @type view: ZoomView
+    @type leaf: AbstractTree | None
+    @type progress: (() -> str) | None
+        Returns the progress of a background task, which is added to the
+        text, or the empty string if there is none.
+    @type profile: Profile | None
+    @rtype: str
+    """
+    if profile is not None:
+        profile.begin('text')
+    parts = [profile.summary()] if profile is not None else []
+    if leaf:
+        parts.append(view.path_of(leaf) + " | Size: " + str(leaf.data_size))
+    elif view.focus is not view.root:
+        parts.append(view.focus.get_separator() + " | Size: " +
+                     str(view.focus.data_size))
+    status = progress() if progress is not None else ''
+    if status:
+        parts.append(status)
+    if profile is not None:
+        profile.end()
+    return ' | '.join(parts)
+
+
+def event_loop(screen, tree, updates=None, progress=None, profile=None):
     """Respond to events (mouse clicks, key presses) and update the display.
 
     Note that the event loop is an *infinite loop*: it continually waits for
@@ -91,8 +318,38 @@ def event_loop(screen, tree):
     of the visualisation or the tree itself, updating the display if necessary.
     This loop ends when the user closes the window.
 
+    Only the subtree zoomed into is drawn, and clicks select leaves in it;
+    see ZoomView.
+
+    While the window is being resized, the treemap is drawn from a
+    UnitLayout of that subtree, built at the first resize event, and it is
+    laid out exactly once no resize event came for RENDER_INTERVAL
+    milliseconds.
+
+    Every event waiting when the loop wakes up is handled before the display
+    is rendered, so a burst of scroll or key events costs a single render.
+
+    If <updates> is given, it is called once per iteration with the
+    rectangle the treemap is drawn in and the subtree shown in it (the
+    focus of the zoom), and should change the tree only in that call, e.g.,
+    to add what a background thread found since the last call. It returns
+    True if the tree changed, and the display is then rendered again, at
+    most once every RENDER_INTERVAL milliseconds. The user can keep
+    selecting and deleting meanwhile.
+
+    If <progress> is given, the text it returns is shown after the
+    description of the selected leaf.
+
+    The P key turns profiling on and off. While it is on, generate_treemap,
+    leaf_at and the drawing of each frame are timed in <profile> (or in a
+    new Profile if it is None), and its summary is shown first in the text
+    display. It starts on if <profile> is given.
+
     @type screen: pygame.Surface
     @type tree: AbstractTree
+    @type updates: (((int, int, int, int), AbstractTree) -> bool) | None
+    @type progress: (() -> str) | None
+    @type profile: Profile | None
     @rtype: None
     """
     # We strongly recommend using a variable to keep track of the currently-
@@ -100,109 +357,307 @@ def event_loop(screen, tree):
     # But feel free to remove it, and/or add new variables, to help keep
     # track of the state of the program.
     selected_leaf = None
+    # Whether selected_leaf is a subtree drawn as a single rectangle
+    # (see MIN_RECT_AREA); its size cannot be changed.
+    selected_aggregate = False
+    # The subtree of <tree> that is drawn.
+    view = ZoomView(tree)
+    # The index in LAYOUT_ENGINES of the layout engine in use.
+    engine = 0
+    set_layout_engine(LAYOUT_ENGINES[engine])
+    # The profile the visualisation is timed in, or None if it is not.
+    profiling = profile
+    set_profile(profiling)
+    # The area of the screen the treemap is drawn in.
+    treemap_rect = _treemap_rect(screen)
+    # The layout drawn while the window is being resized, with the focus and
+    # layout version it was built for, and when the window was last resized,
+    # or None if it is not being resized.
+    preview = None
+    preview_key = None
+    resized = None
+    # What the treemap on the screen was drawn from.
+    drawn = view
+    # The name being searched for, or None if no search was started, and
+    # the key whose release ends the search, which is not a command.
+    query = None
+    ignored_key = None
+    # The treemap on the screen, and when it was drawn.
+    treemap = render_display(screen, view,
+                             _status_text(view, None, progress, profiling),
+                             profile=profiling)
+    rendered = pygame.time.get_ticks()
+    # Whether the tree changed in the background since it was drawn, and
+    # whether it did the last time updates was called, in which case there
+    # may be more changes waiting.
+    changed = False
+    busy = False
 
     while True:
-        # Wait for an event
-        event = pygame.event.poll()
-        # Get the states of what keys are pressed;
-        # useful for quick interactions with the visualiser.
-        pressed = pygame.key.get_pressed()
-
-        if event.type == pygame.QUIT:
-            return
-        elif event.type == pygame.KEYUP and event.key == pygame.K_ESCAPE:
-            return
-        # ---------------------------------
-        # --- Left-click: Select a leaf ---
-        # ---------------------------------
-        elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
-            new_leaf = tree.leaf_at(event.pos, (0, 0, WIDTH, TREEMAP_HEIGHT))
-
-            # Either deselect a leaf or select a new leaf
-            # -- if the user clicked on an area with no rectangles,
-            #    there will be no visual changes.
-            if selected_leaf == new_leaf:
-                selected_leaf = None
-                render_display(screen, tree, '')
-            elif new_leaf:
-                selected_leaf = new_leaf
-                render_display(screen, tree, selected_leaf.get_separator()
-                               + " | Size: " + str(selected_leaf.data_size))
-        # ----------------------------------
-        # --- Right-click: Delete a leaf ---
-        # ----------------------------------
-        elif event.type == pygame.MOUSEBUTTONUP and event.button == 3:
-            new_leaf = tree.leaf_at(event.pos, (0, 0, WIDTH, TREEMAP_HEIGHT))
-
-            # If the user clicked on an area with no rectangles,
-            # there will be no visual changes.
-            if selected_leaf == new_leaf and new_leaf:
-                selected_leaf = None
-            if new_leaf:
-                new_leaf.delete()
-
-            if selected_leaf:
-                render_display(screen, tree, selected_leaf.get_separator()
-                               + " | Size: " + str(selected_leaf.data_size))
+        # Wait for an event, but not for longer than it takes to draw
+        # changes made in the background, nor at all while they keep coming.
+        if busy:
+            events = pygame.event.get()
+        elif updates is None and resized is None:
+            events = [pygame.event.wait()]
+        else:
+            events = [pygame.event.wait(RENDER_INTERVAL)]
+        events.extend(pygame.event.get())
+        dirty = False
+
+        for event in events:
+            if event.type == pygame.QUIT:
+                return
+            # -----------------------------------------------
+            # --- Typing during a search: Edit or run it ---
+            # -----------------------------------------------
+            elif query is not None and event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_RETURN:
+                    matches = view.paths.search(query, 1)
+                    if matches:
+                        selected_leaf = matches[0]
+                        selected_aggregate = len(selected_leaf._subtrees) > 0
+                        view.show(selected_leaf)
+                    query = None
+                    ignored_key = event.key
+                elif event.key == pygame.K_ESCAPE:
+                    query = None
+                    ignored_key = event.key
+                elif event.key == pygame.K_BACKSPACE:
+                    query = query[:-1]
+                elif event.unicode and event.unicode.isprintable():
+                    query += event.unicode
+                dirty = True
+            elif event.type == pygame.KEYUP and \
+                    (query is not None or event.key == ignored_key):
+                if event.key == ignored_key:
+                    ignored_key = None
+            elif event.type == pygame.KEYDOWN and \
+                    event.key == pygame.K_SLASH:
+                query = ''
+                dirty = True
+            elif event.type == pygame.KEYUP and \
+                    event.key == pygame.K_ESCAPE:
+                return
+            # ---------------------------------
+            # --- Left-click: Select a leaf ---
+            # ---------------------------------
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                new_leaf, aggregate = drawn.region_at(
+                    event.pos, treemap_rect, MIN_RECT_AREA)
+
+                # Either deselect a leaf or select a new leaf
+                # -- if the user clicked on an area with no rectangles,
+                #    there will be no visual changes.
+                if selected_leaf == new_leaf:
+                    selected_leaf = None
+                    dirty = True
+                elif new_leaf:
+                    selected_leaf = new_leaf
+                    selected_aggregate = aggregate
+                    dirty = True
+            # ----------------------------------
+            # --- Right-click: Delete a leaf ---
+            # ----------------------------------
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 3:
+                new_leaf = drawn.leaf_at(event.pos, treemap_rect,
+                                         MIN_RECT_AREA)
+
+                # If the user clicked on an area with no rectangles,
+                # there will be no visual changes.
+                if selected_leaf == new_leaf and new_leaf:
+                    selected_leaf = None
+                if new_leaf:
+                    new_leaf.delete()
+                dirty = True
+
+            # -----------------------------------------
+            # --- Delete key pressed: Delete a leaf ---
+            # -----------------------------------------
+            # This is a faster alternative to delete a leaf; holding the
+            # key repeats it (see KEY_REPEAT).
+            elif event.type == pygame.KEYDOWN and \
+                    event.key == pygame.K_DELETE:
+                new_leaf = drawn.leaf_at(pygame.mouse.get_pos(),
+                                         treemap_rect, MIN_RECT_AREA)
+
+                if selected_leaf == new_leaf and new_leaf:
+                    selected_leaf = None
+                if new_leaf:
+                    new_leaf.delete()
+                dirty = True
+
+            # ----------------------------------------------
+            # --- Tab key pressed: Change layout engine ---
+            # ----------------------------------------------
+            elif event.type == pygame.KEYUP and event.key == pygame.K_TAB:
+                engine = (engine + 1) % len(LAYOUT_ENGINES)
+                set_layout_engine(LAYOUT_ENGINES[engine])
+                dirty = True
+
+            # ----------------------------------------------------------
+            # --- Middle-click / Enter: Zoom into the subtree clicked ---
+            # ----------------------------------------------------------
+            elif (event.type == pygame.MOUSEBUTTONUP and
+                  event.button == 2) or \
+                    (event.type == pygame.KEYUP and
+                     event.key == pygame.K_RETURN):
+                pos = event.pos if event.type == pygame.MOUSEBUTTONUP \
+                    else pygame.mouse.get_pos()
+                if view.zoom_in(drawn.leaf_at(pos, treemap_rect,
+                                              MIN_RECT_AREA)):
+                    if selected_leaf and not view.contains(selected_leaf):
+                        selected_leaf = None
+                    dirty = True
+
+            # ---------------------------------
+            # --- Backspace: Zoom back out ---
+            # ---------------------------------
+            elif event.type == pygame.KEYUP and \
+                    event.key == pygame.K_BACKSPACE:
+                dirty = view.zoom_out() or dirty
+
+            # ------------------------------------
+            # --- Window resized: Draw preview ---
+            # ------------------------------------
+            elif event.type == pygame.VIDEORESIZE:
+                screen = pygame.display.set_mode(event.size,
+                                                 pygame.RESIZABLE)
+                treemap_rect = _treemap_rect(screen)
+                if preview_key != (view.focus, layout_version()):
+                    preview = _unit_layout(view.focus, treemap_rect)
+                    preview_key = (view.focus, layout_version())
+                resized = pygame.time.get_ticks()
+                treemap = None
+                dirty = True
+
+            # ------------------------------------------
+            # --- P key pressed: Toggle the profiler ---
+            # ------------------------------------------
+            elif event.type == pygame.KEYUP and event.key == pygame.K_p:
+                if profiling is None:
+                    if profile is None:
+                        profile = Profile()
+                    profiling = profile
+                else:
+                    profiling = None
+                set_profile(profiling)
+                dirty = True
+
+            # --------------------------------------------------------------
+            # --- Up key / Down key pressed: Enlarge or shrink rectangle ---
+            # --------------------------------------------------------------
+            elif event.type == pygame.KEYUP and \
+                    event.key in (pygame.K_UP, pygame.K_DOWN):
+                if selected_leaf and not selected_aggregate:
+                    sign = 1 * (event.key == pygame.K_UP) -\
+                           1 * (event.key == pygame.K_DOWN)
+                    change = 0.01
+                    selected_leaf.change_prop(change * sign)
+                    dirty = True
+            # -----------------------------------------------------
+            # --- Scroll Up / Down: Enlarge or shrink rectangle ---
+            # -----------------------------------------------------
+            # This is a faster alternative to changing the rectangle size.
+            elif event.type == pygame.MOUSEBUTTONUP and \
+                    event.button in (4, 5):
+                if selected_leaf and not selected_aggregate:
+                    sign = 1 * (event.button == 4) -\
+                           1 * (event.button == 5)
+                    change = 0.01
+                    selected_leaf.change_prop(change * sign)
+                    dirty = True
+
+        busy = updates is not None and updates(treemap_rect, view.focus)
+        changed = changed or busy
+        if changed and pygame.time.get_ticks() - rendered >= RENDER_INTERVAL:
+            dirty = True
+        if resized is not None and \
+                pygame.time.get_ticks() - resized >= RENDER_INTERVAL:
+            # The resizing stopped, so lay out the treemap for its size.
+            resized = None
+            treemap = None
+            dirty = True
+
+        if dirty:
+            # The preview only stands for the treemap it was built for.
+            if resized is not None and preview is not None and \
+                    preview_key == (view.focus, layout_version()):
+                drawn = preview
             else:
-                render_display(screen, tree, '')
-
-        # -----------------------------------------
-        # --- Delete key pressed: Delete a leaf ---
-        # -----------------------------------------
-        # This is a faster alternative to delete a leaf
-        elif pressed[pygame.K_DELETE]:
-            new_leaf = tree.leaf_at(pygame.mouse.get_pos(),
-                                    (0, 0, WIDTH, TREEMAP_HEIGHT))
-
-            if selected_leaf == new_leaf and new_leaf:
-                selected_leaf = None
-            if new_leaf:
-                new_leaf.delete()
-
-            if selected_leaf:
-                render_display(screen, tree, selected_leaf.get_separator()
-                               + " | Size: " + str(selected_leaf.data_size))
+                drawn = view
+            if query is not None:
+                text = 'Find: ' + query
             else:
-                render_display(screen, tree, '')
-
-        # --------------------------------------------------------------
-        # --- Up key / Down key pressed: Enlarge or shrink rectangle ---
-        # --------------------------------------------------------------
-        elif event.type == pygame.KEYUP:
-            if selected_leaf:
-                sign = 1 * (event.key == pygame.K_UP) -\
-                       1 * (event.key == pygame.K_DOWN)
-                change = 0.01
-                selected_leaf.change_prop(change * sign)
-                render_display(screen, tree, selected_leaf.get_separator()
-                               + " | Size: " + str(selected_leaf.data_size))
-        # -----------------------------------------------------
-        # --- Scroll Up / Down: Enlarge or shrink rectangle ---
-        # -----------------------------------------------------
-        # This is a faster alternative to changing the rectangle size.
-        elif event.type == pygame.MOUSEBUTTONUP:
-            if selected_leaf:
-                sign = 1 * (event.button == 4) -\
-                       1 * (event.button == 5)
-                change = 0.01
-                selected_leaf.change_prop(change * sign)
-                render_display(screen, tree, selected_leaf.get_separator()
-                               + " | Size: " + str(selected_leaf.data_size))
-
-
-def run_treemap_file_system(path):
+                text = _status_text(view, selected_leaf, progress, profiling)
+            treemap = render_display(screen, drawn, text, previous=treemap,
+                                     profile=profiling)
+            changed = False
+            rendered = pygame.time.get_ticks()
+
+
+def run_treemap_file_system(path, cache_path=None, lazy_depth=None,
+                            child_limit=None, one_file_system=False):
     """Run a treemap visualisation for the given path's file structure.
 
+    If <cache_path> is given, the scan of <path> is saved in that file, and
+    the next run for the same folder only lists the folders that changed.
+
+    If <lazy_depth> is given instead, only that many levels of folders are
+    listed before the treemap is shown; the deeper folders are shown with an
+    estimated size and filled in by background threads, starting with the
+    largest ones on the screen, while the progress of the scan is shown.
+    With a <lazy_depth> of 0, the treemap is shown at once.
+
+    If <child_limit> is given instead, each folder only keeps that many of
+    its largest files and folders, and the others are shown as one leaf, so
+    that the scan of a very large volume fits in memory.
+
+    Whichever way it is scanned, symbolic links to folders are not
+    followed, and hard links and folders mounted more than once are counted
+    once; see file_scanner.ScanFilter. If <one_file_system> is True,
+    folders on another file system are skipped too. What was skipped is printed after
+    the scan, or once the visualisation is closed if <lazy_depth> is given.
+
     Precondition: <path> is a valid path to a file or folder.
 
     @type path: str
+    @type cache_path: str | None
+    @type lazy_depth: int | None
+    @type child_limit: int | None
+    @type one_file_system: bool
     @rtype: None
     """
-    file_tree = FileSystemTree(path)
+    scan_filter = ScanFilter(one_file_system)
+    if cache_path is not None and os.path.isdir(path):
+        file_tree = scan_with_cache(path, cache_path, scan_filter).node(0)
+    elif lazy_depth is not None:
+        file_tree = LazyFileSystemTree(path, lazy_depth, scan_filter)
+        prefetcher = Prefetcher(file_tree, SCAN_WORKERS)
+        run_visualisation(file_tree, lambda rect, focus: prefetcher.update(
+            rect, MIN_RECT_AREA, focus), prefetcher.progress)
+        _print_skipped(scan_filter)
+        return
+    elif child_limit is not None:
+        file_tree = BoundedFileSystemTree(path, child_limit, scan_filter)
+    else:
+        file_tree = FileSystemTree(path, SCAN_WORKERS, scan_filter)
+    _print_skipped(scan_filter)
     run_visualisation(file_tree)
 
 
+def _print_skipped(scan_filter):
+    """Print how many files and folders <scan_filter> skipped, if any.
+
+    @type scan_filter: ScanFilter
+    @rtype: None
+    """
+    skipped = scan_filter.skipped()
+    if any(skipped.values()):
+        print('Skipped:', ', '.join('{} {}'.format(count, reason)
+                                    for reason, count in skipped.items()))
+
+
 def run_treemap_population():
     """Run a treemap visualisation for World Bank population data.
 
@@ -212,6 +667,33 @@ def run_treemap_population():
     run_visualisation(pop_tree)
 
 
+def run_treemap_records(path, size_field, **options):
+    """Run a treemap visualisation for the records in the CSV or
+    newline-delimited JSON file at <path>.
+
+    <options> say where each record goes; see record_tree.load_records.
+
+    @type path: str
+    @type size_field: str
+    @rtype: None
+    """
+    run_visualisation(load_file(path, size_field, **options))
+
+
+def run_treemap_archive(path, compressed=False):
+    """Run a treemap visualisation for the files inside the zip or tar
+    archive at <path>, read from its index without extracting it.
+
+    If <compressed> is True, the files of a zip archive are shown with the
+    size of their compressed data.
+
+    @type path: str
+    @type compressed: bool
+    @rtype: None
+    """
+    run_visualisation(read_archive(path, compressed))
+
+
 if __name__ == '__main__':
     # Sample directory pathway:
     #   'C:\\Users\\James\\Documents\\' (Windows) or
@@ -0,0 +1,194 @@
+"""Resolution-Independent Treemap Layout
+
+=== Module Description ===
+This module contains UnitLayout, a treemap laid out once in normalized
+coordinates, which can then be drawn in a rectangle of any size without
+running the layout algorithm again, e.g., while a window is being resized.
+
+The edges of every leaf are kept as fractions of the width and the height
+of the treemap, as computed by the versions of the layout engines in
+layout_engine.EDGE_ENGINES. Projecting them to pixels scales and rounds all
+the edges at once with NumPy; since neighbouring leaves share the same edge
+values, which are rounded the same way, the projected rectangles still
+cover the whole treemap exactly.
+
+The rectangles are not those of AbstractTree.generate_treemap, which
+rounds every level down to whole pixels: a UnitLayout is a fast
+approximation, to be replaced by generate_treemap once the size settles.
+
+NOTE: You'll need NumPy installed to use this module.
+"""
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; see UnitLayout.__init__.
+    np = None
+
+from layout_engine import EDGE_ENGINES
+from tree_data import get_layout_engine
+
+
+class UnitLayout:
+    """The treemap of a tree in normalized coordinates.
+
+    A UnitLayout has the same methods as AbstractTree to draw a treemap and
+    to find a leaf in it, and can be drawn in place of its tree by
+    treemap_visualiser.render_display.
+
+    === Public Attributes ===
+    @type leaves: list[AbstractTree]
+        The non-empty leaves of the tree, in the order of generate_treemap.
+    @type edges: numpy.ndarray
+        The left, top, right and bottom edges of each leaf as an (N, 4)
+        array, as fractions of the width and the height of the treemap.
+    @type aspect: float
+        The ratio of the width to the height of the rectangle the tree was
+        laid out in. Drawing the layout in a rectangle of another shape
+        stretches it.
+
+    === Private Attributes ===
+    @type _colours: list[(int, int, int)]
+        The colour of each leaf.
+    """
+    def __init__(self, tree, aspect):
+        """Lay out <tree> in a rectangle whose width is <aspect> times its
+        height, with the layout engine set with tree_data.set_layout_engine.
+
+        @type self: UnitLayout
+        @type tree: AbstractTree
+        @type aspect: float
+        @rtype: None
+        """
+        if np is None:
+            raise ImportError('NumPy is required for the unit layout')
+
+        self.leaves = []
+        edges = []
+        _layout(tree, (0.0, 0.0, aspect, 1.0),
+                EDGE_ENGINES[get_layout_engine()], self.leaves, edges)
+        self.edges = np.array(edges, dtype=np.float64).reshape(-1, 4)
+        self.edges[:, 0::2] /= aspect
+        self.aspect = aspect
+        self._colours = [leaf.colour for leaf in self.leaves]
+
+    def project(self, rect):
+        """Return the pixel edges of every leaf when this layout is drawn in
+        <rect>, as an (N, 4) array of left, top, right and bottom edges.
+
+        A leaf covers the pixels from its left edge up to (but not
+        including) its right edge, and likewise vertically.
+
+        @type self: UnitLayout
+        @type rect: (int, int, int, int)
+        @rtype: numpy.ndarray
+        """
+        x, y, w, h = rect
+        scale = np.array([w, h, w, h], dtype=np.float64)
+        offset = np.array([x, y, x, y], dtype=np.float64) + 0.5
+        return np.floor(self.edges * scale + offset).astype(np.int64)
+
+    def generate_treemap(self, rect, min_area=0):
+        """Return the rectangles and colours of this layout drawn in <rect>,
+        like AbstractTree.generate_treemap.
+
+        Leaves that cover no pixel are left out; <min_area> is only there
+        for compatibility, since the leaves are never aggregated.
+
+        @type self: UnitLayout
+        @type rect: (int, int, int, int)
+        @type min_area: int
+        @rtype: list[((int, int, int, int), (int, int, int))]
+        """
+        pixels = self.project(rect)
+        sizes = pixels[:, 2:] - pixels[:, :2]
+        shown = np.flatnonzero((sizes[:, 0] > 0) & (sizes[:, 1] > 0))
+        colours = self._colours
+        # Zipping whole columns creates far fewer objects than converting
+        # each row to a list, which matters for the garbage collector.
+        return list(zip(zip(pixels[shown, 0].tolist(),
+                            pixels[shown, 1].tolist(),
+                            sizes[shown, 0].tolist(),
+                            sizes[shown, 1].tolist()),
+                        [colours[i] for i in shown.tolist()]))
+
+    def leaf_at(self, pos, rect, min_area=0):
+        """Return the leaf at <pos> when this layout is drawn in <rect>, or
+        None if there is no such leaf.
+
+        The position is looked up in the normalized edges; only the few
+        leaves found there are projected to check which one covers the
+        pixel, so that the result always agrees with generate_treemap.
+
+        @type self: UnitLayout
+        @type pos: (int, int)
+        @type rect: (int, int, int, int)
+        @type min_area: int
+        @rtype: AbstractTree | None
+        """
+        x, y, w, h = rect
+        px, py = pos
+        if not (x <= px < x + w and y <= py < y + h):
+            return None
+
+        # The centre of the pixel, which the leaf covering it contains up
+        # to rounding errors, hence the margin.
+        u = (px + 0.5 - x) / w
+        v = (py + 0.5 - y) / h
+        margin = 1e-9
+        edges = self.edges
+        candidates = np.flatnonzero(
+            (edges[:, 0] - margin <= u) & (u < edges[:, 2] + margin) &
+            (edges[:, 1] - margin <= v) & (v < edges[:, 3] + margin))
+        if len(candidates) == 0:
+            return None
+
+        scale = np.array([w, h, w, h], dtype=np.float64)
+        offset = np.array([x, y, x, y], dtype=np.float64) + 0.5
+        pixels = np.floor(edges[candidates] * scale + offset)
+        for i, (left, top, right, bottom) in zip(candidates.tolist(),
+                                                 pixels.tolist()):
+            if left <= px < right and top <= py < bottom:
+                return self.leaves[i]
+        return None
+
+    def region_at(self, pos, rect, min_area=0):
+        """Return the leaf at <pos> when this layout is drawn in <rect>,
+        like AbstractTree.region_at; it is never an aggregated subtree.
+
+        @type self: UnitLayout
+        @type pos: (int, int)
+        @type rect: (int, int, int, int)
+        @type min_area: int
+        @rtype: (AbstractTree | None, bool)
+        """
+        return self.leaf_at(pos, rect, min_area), False
+
+
+def _layout(tree, edges, engine, leaves, result):
+    """Append the non-empty leaves of <tree> laid out in <edges> to
+    <leaves>, and their edges to <result>.
+
+    The tree is walked with an explicit stack rather than recursion, so
+    deep trees cannot exceed Python's recursion limit.
+
+    @type tree: AbstractTree
+    @type edges: (float, float, float, float)
+    @type engine: callable
+    @type leaves: list[AbstractTree]
+    @type result: list[float]
+    @rtype: None
+    """
+    stack = [(tree, edges)]
+    while stack:
+        tree, edges = stack.pop()
+        if tree.data_size == 0:
+            continue
+        subtrees = tree._subtrees
+        if not subtrees:
+            leaves.append(tree)
+            result.extend(edges)
+            continue
+        child_edges = engine(edges,
+                             [subtree.data_size for subtree in subtrees],
+                             tree.data_size)
+        # The subtrees are pushed last first, so they are popped in order.
+        stack.extend(zip(reversed(subtrees), reversed(child_edges)))